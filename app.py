@@ -1,76 +1,87 @@
-from flask import Flask, render_template, request
-import pandas as pd
-from edsql_compiler import parser
-from convert_to_edsql import convert_entities_to_edsql
+from flask import Flask, Response, render_template, request, jsonify, url_for
+import json
+from query_cache import is_edsql, parse_query, result_cache
+from executor import run_query, QueryError
+from catalog import Catalog
+from metric_registry import registry as metrics
+from sampling import sample_cache
+from translation import CachingTranslator, EntityTranslator, TranslationCache
+from batch import run_batch, split_statements
+from pagination import (EXPORT_FORMATS, PAGE_SIZE, CursorError, StaleCursor, decode_cursor, export_chunks,
+                        page_size, paginate)
 
 import matplotlib
 matplotlib.use('Agg')  # Use non-GUI backend
-import matplotlib.pyplot as plt
-
-import io
-import base64
+from rendering import renderer, FORMATS as CHART_FORMATS
+from instrumentation import telemetry
 
 # Initialize Flask app
 app = Flask(__name__)
 
-# Load dataset
-df = pd.read_csv("students.csv")
+# Tables named in FROM/JOIN are files in the data directory (students is students.csv),
+# loaded on first use and reloaded (stale cached results dropped) when the file changes
+catalog = Catalog(paths={"students": "students.csv"})
+catalog.on_reload(lambda ds: result_cache.invalidate(catalog.versions()))
+catalog.on_reload(lambda ds: metrics.invalidate(catalog.versions()))
+catalog.on_reload(lambda ds: sample_cache.invalidate(catalog.versions()))
+# The dashboard's most common query, kept up to date from appended rows
+catalog.materialize("students", "class", "grades")
+
+# NL → EDSQL translations, cached in memory and on disk across restarts
+translator = CachingTranslator([EntityTranslator()], TranslationCache(namespace="web"))
 
-def execute_query(parsed_query):
+def execute_query(parsed_query, ds=None):
     """Execute the parsed EDSQL query."""
     try:
-        _, select_list, table, where_clause, group_by_clause, plot_clause, order_clause, limit_clause, _ = parsed_query
+        result, _ = run_query(parsed_query, ds or catalog.dataset_for(parsed_query), cache=result_cache)
     except ValueError:
         return "Invalid parsed query format."
+    except QueryError as e:
+        return str(e)
 
-    result = df.copy()
+    return result
 
-    # WHERE clause
-    if where_clause:
-        try:
-            column, op, value = where_clause[1][1:]
-            if op == '>':
-                result = result[result[column] > value]
-            elif op == '<':
-                result = result[result[column] < value]
-            elif op == '=':
-                result = result[result[column] == value]
-        except Exception as e:
-            return f"Error in WHERE clause: {e}"
+def to_edsql(query):
+    """`query` as EDSQL (natural language is translated), or None if it cannot be."""
+    if not query:
+        return None
+    return query if is_edsql(query) else translator.translate(query)
 
-    # GROUP BY and Aggregation
-    if group_by_clause:
-        try:
-            group_col = group_by_clause[1]
-            if isinstance(select_list[0], tuple) and select_list[0][0] == 'AVG':
-                result = result.groupby(group_col)[select_list[0][1]].mean().reset_index()
-        except Exception as e:
-            return f"Error in GROUP BY clause: {e}"
+def run_statement(statement, ds):
+    """Result DataFrame of the EDSQL `statement`, or an error message."""
+    if not statement:
+        return "Sorry, couldn't understand the query."
+    parsed = parse_query(statement)
+    if not parsed:
+        return "Error parsing the SQL query."
+    return execute_query(parsed, ds)
 
-    # ORDER BY
-    if order_clause:
-        try:
-            _, order_col, order_dir = order_clause
-            result = result.sort_values(by=order_col, ascending=(order_dir.upper() == 'ASC'))
-        except Exception as e:
-            return f"Error in ORDER BY clause: {e}"
+def statement_dataset(statement):
+    """Dataset `statement` runs against; the default table if it does not parse."""
+    parsed = parse_query(statement) if statement else None
+    return catalog.dataset_for(parsed) if parsed else catalog.default()
 
-    # LIMIT
-    if limit_clause:
-        try:
-            _, limit_val = limit_clause
-            result = result.head(int(limit_val))
-        except Exception as e:
-            return f"Error in LIMIT clause: {e}"
+def open_cursor(token):
+    """(Cursor, dataset of its statement); raises CursorError, or StaleCursor if the data changed."""
+    ds = statement_dataset(decode_cursor(token).statement)
+    return decode_cursor(token, ds.version), ds
 
-    # Column Selection
-    try:
-        columns = [sel if isinstance(sel, str) else sel[1] for sel in select_list]
-        result = result[columns]
-    except Exception as e:
-        return f"Error selecting columns: {e}"
+def table_page(result, statement, version, offset=0, size=PAGE_SIZE):
+    """(HTML table of one page of `result`, pager links for the template).
 
-    return result
+    Only the page is rendered, so the HTML stays small however many rows the
+    result has; the pager links to the neighbouring pages and to full exports.
+    """
+    page = paginate(result, statement, version, offset, size)
+    pager = {
+        "first": offset + 1 if len(page.rows) else 0,
+        "last": offset + len(page.rows),
+        "total": page.total,
+        "next": url_for("index", cursor=page.next_cursor) if page.next_cursor else None,
+        "prev": url_for("index", cursor=page.prev_cursor) if page.prev_cursor else None,
+        "exports": {fmt: url_for("export", query=statement, format=fmt) for fmt in EXPORT_FORMATS},
+    }
+    return page.rows.to_html(classes="table table-bordered"), pager
 
 @app.route("/", methods=["GET", "POST"])
 def index():
@@ -78,17 +89,38 @@ def index():
     sql_query = ""
     output = None
     graph = None
+    graph_svg = None
+    chart_spec = None
+    pager = None
+
+    if request.method == "GET" and request.args.get("cursor"):
+        # Another page of a table result; the cursor names the statement
+        try:
+            cursor, ds = open_cursor(request.args["cursor"])
+        except CursorError as e:
+            return render_template("index.html", query=query, sql_query=sql_query, output=str(e), graph=graph)
+        sql_query = cursor.statement
+        result = run_statement(sql_query, ds)
+        if isinstance(result, str):
+            output = result
+        else:
+            output, pager = table_page(result, sql_query, ds.version, cursor.offset, cursor.page_size)
+        return render_template("index.html", query=query, sql_query=sql_query, output=output, pager=pager)
 
     if request.method == "POST":
         query = request.form.get("query", "").strip()
+        # png (default), svg, or json for client-side rendering
+        chart_format = request.form.get("chart_format", "png").lower()
+        if chart_format not in CHART_FORMATS:
+            chart_format = "png"
 
         if not query:
             output = "Please enter a valid query."
             return render_template("index.html", query=query, sql_query=sql_query, output=output, graph=graph)
 
         # Convert NLP to EDSQL if necessary
-        if "select" not in query.lower():
-            sql_query = convert_entities_to_edsql(query)
+        if not is_edsql(query):
+            sql_query = translator.translate(query)
             if not sql_query:
                 output = "Sorry, couldn't understand the NLP."
                 return render_template("index.html", query=query, sql_query=sql_query, output=output, graph=graph)
@@ -97,53 +129,146 @@ def index():
 
         # Parse and execute
         try:
-            parsed = parser.parse(sql_query)
+            parsed = parse_query(sql_query)
             if not parsed:
                 output = "Error parsing the SQL query."
                 return render_template("index.html", query=query, sql_query=sql_query, output=output, graph=graph)
 
-            result = execute_query(parsed)
+            # Rendered output (HTML table or chart) is cached per dataset version and chart format
+            ds = catalog.dataset_for(parsed)
+            render_key = f"render:{chart_format}"
+            rendered = result_cache.get(render_key, ds.version, parsed)
+            if rendered is not None:
+                output, graph, graph_svg, chart_spec, pager = rendered
+                return render_template("index.html", query=query, sql_query=sql_query, output=output,
+                                       graph=graph, graph_svg=graph_svg, chart_spec=chart_spec, pager=pager)
+
+            result = execute_query(parsed, ds)
 
             # Check for errors in result
             if isinstance(result, str):
                 output = result
                 return render_template("index.html", query=query, sql_query=sql_query, output=output, graph=graph)
 
-            # Plot generation
-            plot_clause = parsed[5]
+            # Plot generation (thread-safe Figure API on the shared render pool)
+            plot_clause = parsed[5] if parsed[0] == 'QUERY' else None
             if plot_clause:
+                chart_id, future = renderer.start(result, plot_clause[1], chart_format)
+                if not future.done():
+                    # Don't hold the request for matplotlib: the page fetches the chart from /chart
+                    chart_pending = {"url": url_for("chart", chart_id=chart_id), "format": chart_format}
+                    return render_template("index.html", query=query, sql_query=sql_query, output=output,
+                                           chart_pending=chart_pending)
                 try:
-                    plot_type = plot_clause[1]
-                    fig, ax = plt.subplots()
-
-                    if plot_type == "BAR":
-                        result.plot(kind="bar", x=result.columns[0], y=result.columns[1], ax=ax)
-                    elif plot_type == "LINE":
-                        result.plot(kind="line", x=result.columns[0], y=result.columns[1], ax=ax)
-                    elif plot_type == "PIE":
-                        if result.shape[1] >= 2:
-                            data = result.set_index(result.columns[0])[result.columns[1]]
-                        else:
-                            data = result[result.columns[0]].value_counts()
-                        data.plot(kind="pie", ax=ax, autopct='%1.1f%%')
-                        ax.set_ylabel("")
-
-                    buf = io.BytesIO()
-                    plt.savefig(buf, format="png")
-                    buf.seek(0)
-                    graph = base64.b64encode(buf.getvalue()).decode()
-                    buf.close()
-                    plt.close(fig)
+                    chart = future.result()
+                    if chart_format == "png":
+                        graph = chart
+                    elif chart_format == "svg":
+                        graph_svg = chart
+                    else:
+                        chart_spec = chart
                 except Exception as e:
                     output = f"Error generating graph: {e}"
                     return render_template("index.html", query=query, sql_query=sql_query, output=output, graph=None)
             else:
-                output = result.to_html(classes="table table-bordered")
+                output, pager = table_page(result, sql_query, ds.version)
+
+            if parsed[0] == 'QUERY':  # ANALYZE runs every time
+                result_cache.put(render_key, ds.version, parsed, (output, graph, graph_svg, chart_spec, pager))
 
         except Exception as e:
             output = f"Unexpected error: {e}"
 
-    return render_template("index.html", query=query, sql_query=sql_query, output=output, graph=graph)
+    return render_template("index.html", query=query, sql_query=sql_query, output=output,
+                           graph=graph, graph_svg=graph_svg, chart_spec=chart_spec, pager=pager)
+
+@app.route("/chart/<chart_id>")
+def chart(chart_id):
+    """A chart started by `index`: 202 while it renders, then its payload as JSON."""
+    try:
+        payload = renderer.poll(chart_id)
+    except KeyError:
+        return jsonify({"status": "unknown"}), 404
+    except Exception as e:
+        return jsonify({"status": "error", "error": str(e)}), 500
+    if payload is None:
+        return jsonify({"status": "pending"}), 202
+    return jsonify({"status": "done", "payload": payload})
+
+@app.route("/results")
+def results():
+    """One page of a query result as JSON.
+
+    Start with `?query=...` (EDSQL or NL) and an optional `page_size`, then
+    follow `next_cursor` with `?cursor=...`. A cursor outlives neither a
+    reload of the data (410) nor a change of statement.
+    """
+    token = request.args.get("cursor")
+    try:
+        if token:
+            cursor, ds = open_cursor(token)
+            statement, offset, size = cursor.statement, cursor.offset, cursor.page_size
+        else:
+            statement = to_edsql(request.args.get("query", "").strip())
+            offset, size = 0, page_size(request.args.get("page_size"))
+            ds = statement_dataset(statement)
+    except StaleCursor as e:
+        return jsonify({"error": str(e)}), 410
+    except CursorError as e:
+        return jsonify({"error": str(e)}), 400
+
+    result = run_statement(statement, ds)
+    if isinstance(result, str):
+        return jsonify({"error": result}), 400
+    page = paginate(result, statement, ds.version, offset, size)
+    table = json.loads(page.rows.to_json(orient="split", index=False))
+    return jsonify({"statement": statement, "columns": table["columns"], "data": table["data"],
+                    "offset": page.offset, "total_rows": page.total,
+                    "next_cursor": page.next_cursor, "prev_cursor": page.prev_cursor})
+
+@app.route("/export")
+def export():
+    """Download a query result (`?query=...&format=csv|ndjson`), streamed in chunks."""
+    fmt = request.args.get("format", "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown export format: {fmt}"}), 400
+    statement = to_edsql(request.args.get("query", "").strip())
+    result = run_statement(statement, statement_dataset(statement))
+    if isinstance(result, str):
+        return jsonify({"error": result}), 400
+    headers = {"Content-Disposition": f"attachment; filename=result.{fmt}"}
+    return Response(export_chunks(result, fmt), mimetype=EXPORT_FORMATS[fmt], headers=headers)
+
+@app.route("/batch", methods=["POST"])
+def batch():
+    """Run many EDSQL statements at once.
+
+    The body is a JSON list of statements, a JSON object with "statements"
+    (a list) or "script" (text), or a plain-text .edsql script.
+    """
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        statements = body.get("statements") or split_statements(body.get("script", ""))
+    elif isinstance(body, list):
+        statements = body
+    else:
+        statements = split_statements(request.get_data(as_text=True))
+    if not statements or not all(isinstance(s, str) for s in statements):
+        return jsonify({"error": "Expected a list of EDSQL statements or a script."}), 400
+
+    results = []
+    for item in run_batch(statements, catalog.default(), cache=result_cache):
+        entry = {"statement": item.statement, "plot": item.plot, "error": item.error}
+        if item.result is not None:
+            table = json.loads(item.result.to_json(orient="split", index=False))
+            entry.update(columns=table["columns"], data=table["data"])
+        results.append(entry)
+    return jsonify({"results": results})
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Stage and query latency histograms of this process, for Prometheus to scrape."""
+    return Response(telemetry.render(), mimetype="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     app.run(debug=True)
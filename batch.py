@@ -0,0 +1,115 @@
+"""Run many EDSQL statements against one dataset snapshot.
+
+A batch is a list of statements, e.g. an `.edsql` report script split by
+`split_statements`. Each table the statements name (see catalog.py) is
+resolved once, so all of them see the same snapshot of it, and the statements
+over one table share an `executor.SharedWork`, so work they have in common is
+done once:
+
+- identical sets of WHERE conditions resolve to row positions once,
+- identical GROUP BY keys over the same rows are factorized once,
+- each metric column is evaluated once,
+- identical statements run once.
+
+Distinct statements run concurrently on a thread pool.
+"""
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from catalog import joined_tables, resolve, statement_table
+from executor import QueryError, SharedWork, run_query
+from query_cache import canonical_ast, parse_query
+
+StatementResult = namedtuple("StatementResult", "statement result plot error")
+
+# ------------------ Scripts ------------------
+
+def split_statements(text):
+    """Semicolon-terminated statements of a script, in order.
+
+    Semicolons inside string literals do not end a statement, and `--` starts
+    a comment that runs to the end of the line.
+    """
+    statements, current = [], []
+    in_string = in_comment = False
+    for i, char in enumerate(text):
+        if in_comment:
+            if char == "\n":
+                in_comment = False
+                current.append(char)
+            continue
+        if char == '"':
+            in_string = not in_string
+        elif not in_string and text.startswith("--", i):
+            in_comment = True
+            continue
+        current.append(char)
+        if char == ";" and not in_string:
+            statements.append("".join(current).strip())
+            current = []
+    rest = "".join(current).strip()
+    if rest:
+        statements.append(rest)  # no final ';': reported as a parse error
+    return [statement for statement in statements if statement != ";"]
+
+
+def load_script(path):
+    with open(path) as f:
+        return split_statements(f.read())
+
+# ------------------ Execution ------------------
+
+def run_batch(statements, ds, cache=None, workers=None, shared=None):
+    """Run `statements` against `ds`; returns a StatementResult per statement, in order.
+
+    Statements over other tables of `ds`'s catalog run against those. Parse
+    and execution errors are reported per statement and do not stop the
+    batch. Results may be shared between identical statements: do not mutate
+    them. Pass a `SharedWork` to inspect (or extend) what was shared over `ds`.
+    """
+    shared = shared if shared is not None else SharedWork()
+    parsed = [parse_query(text) for text in statements]
+
+    # One execution per distinct statement
+    distinct = {}
+    for tree in parsed:
+        if tree:
+            distinct.setdefault(canonical_ast(tree), tree)
+
+    # (dataset, SharedWork) per set of tables read
+    targets = {}
+    for tree in distinct.values():
+        key = (statement_table(tree), tuple(joined_tables(tree)))
+        if key not in targets:
+            try:
+                target = resolve(tree, ds)
+            except KeyError:
+                target = ds  # run_query reports the unknown table
+            targets[key] = (target, shared if target is ds else SharedWork())
+
+    def execute(tree):
+        target, work = targets[(statement_table(tree), tuple(joined_tables(tree)))]
+        try:
+            return run_query(tree, target, cache=cache, shared=work), None
+        except QueryError as e:
+            return None, str(e)
+
+    workers = workers or min(8, os.cpu_count() or 1)
+    if len(distinct) > 1 and workers > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool:
+            outcomes = dict(zip(distinct, pool.map(execute, distinct.values())))
+    else:
+        outcomes = {key: execute(tree) for key, tree in distinct.items()}
+
+    results = []
+    for text, tree in zip(statements, parsed):
+        if not tree:
+            results.append(StatementResult(text, None, None, "Parsing failed."))
+            continue
+        outcome, error = outcomes[canonical_ast(tree)]
+        if error:
+            results.append(StatementResult(text, None, None, error))
+        else:
+            results.append(StatementResult(text, outcome[0], outcome[1], None))
+    return results
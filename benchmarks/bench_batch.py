@@ -0,0 +1,54 @@
+"""Report time for N statements built from a few distinct WHERE / GROUP BY operations.
+
+Statements are run one by one with `run_query`, then as one `run_batch`.
+Run from the repository root:
+
+    python -m benchmarks.bench_batch --rows 1000000 --statements 12 48 96
+"""
+import argparse
+import itertools
+
+from batch import run_batch
+from dataset import Dataset
+from executor import run_query
+from query_cache import parse_query
+
+from benchmarks.bench_parallel import best_of, synthetic_students
+
+WHERES = ['WHERE attendance > 60', 'WHERE section = "B"', 'WHERE grades < 40']
+REPORTS = [
+    'SELECT AVG(grades) FROM students {where} GROUP BY class;',
+    'SELECT AVG(attendance) FROM students {where} GROUP BY class;',
+    'SELECT AVG(PERFORMANCE_SCORE) FROM students {where} GROUP BY class;',
+    'SELECT name, grades FROM students {where} ORDER BY grades DESC LIMIT 10;',
+]
+
+
+def report(n):
+    """`n` statements cycling through len(WHERES) * len(REPORTS) distinct ones."""
+    templates = itertools.cycle(itertools.product(REPORTS, WHERES))
+    return [template.format(where=where) for template, where in itertools.islice(templates, n)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--statements", type=int, nargs="+", default=[12, 48, 96])
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    # No version: nothing is served from the result cache or the metric memo
+    ds = Dataset(synthetic_students(args.rows))
+    print(f"{args.rows:,} rows, {len(WHERES)} distinct WHERE clauses")
+    for n in args.statements:
+        statements = report(n)
+        parsed = [parse_query(text) for text in statements]
+        one_by_one = best_of(lambda: [run_query(tree, ds) for tree in parsed], args.repeat)
+        batched = best_of(lambda: run_batch(statements, ds, workers=args.workers), args.repeat)
+        print(f"  {n:>4} statements: one by one {one_by_one * 1000:8.1f} ms   "
+              f"batch {batched * 1000:8.1f} ms   ({one_by_one / batched:5.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
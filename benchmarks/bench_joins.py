@@ -0,0 +1,83 @@
+"""Report time for hash JOINs (joins.py) vs pandas merge, and for a JOIN query.
+
+Students are joined with an exams table a few times their size (the large
+right side is probed) and with a small per-class lookup table (the small
+right side is the build side). Rows are compared with `merge`. Run from the
+repository root:
+
+    python -m benchmarks.bench_joins --rows 1000000
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from dataset import Dataset
+from executor import run_query
+from joins import hash_join
+from query_cache import parse_query
+
+from benchmarks.bench_parallel import best_of, synthetic_students
+
+
+def synthetic_exams(students, per_student=3, seed=1):
+    rng = np.random.default_rng(seed)
+    rows = len(students) * per_student
+    return pd.DataFrame({
+        "student": students["name"].to_numpy()[rng.integers(0, len(students), rows)],
+        "subject": np.array(["math", "bio", "art"], dtype=object)[rng.integers(0, 3, rows)],
+        "score": rng.integers(0, 101, rows),
+    })
+
+
+def class_teachers(students):
+    classes = np.sort(students["class"].unique())
+    return pd.DataFrame({"class": classes, "teacher": [f"teacher{i}" for i in range(len(classes))]})
+
+
+def same_rows(joined, merged):
+    left = joined.sort_values(list(joined.columns)).reset_index(drop=True)
+    right = merged[list(joined.columns)].sort_values(list(joined.columns)).reset_index(drop=True)
+    return left.astype(str).equals(right.astype(str))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    students = synthetic_students(args.rows)
+    exams = synthetic_exams(students)
+    teachers = class_teachers(students)
+    cases = [
+        ("exams (large right)", exams, "name", "student", ["name", "score"]),
+        ("teachers (small right)", teachers, "class", "class", ["name", "teacher"]),
+    ]
+    mismatches = 0
+    print(f"{args.rows:,} students")
+    for label, right, left_key, right_key, read in cases:
+        table = label.split()[0]
+        joined = hash_join(students, right, left_key, right_key, table)
+        if not same_rows(joined, students.merge(right, left_on=left_key, right_on=right_key)):
+            mismatches += 1
+            print(f"  mismatch: {label}", file=sys.stderr)
+        hashed = best_of(lambda: hash_join(students, right, left_key, right_key, table), args.repeat)
+        # As in a query, where only the columns read above the join are gathered
+        pruned = best_of(lambda: hash_join(students, right, left_key, right_key, table, read), args.repeat)
+        merged = best_of(lambda: students.merge(right, left_on=left_key, right_on=right_key), args.repeat)
+        print(f"  {label:24} {len(joined):>12,} rows   hash_join {hashed * 1000:8.1f} ms   "
+              f"({', '.join(read)}) {pruned * 1000:8.1f} ms   merge {merged * 1000:8.1f} ms")
+
+    ds = Dataset(students)
+    ds.joined = {"exams": Dataset(exams, index=False), "teachers": Dataset(teachers, index=False)}
+    query = parse_query('SELECT AVG(score), teacher FROM students JOIN exams ON name = student '
+                        'JOIN teachers ON class = class WHERE grades > 50 GROUP BY teacher;')
+    elapsed = best_of(lambda: run_query(query, ds), args.repeat)
+    print(f"  two-JOIN GROUP BY query {elapsed * 1000:8.1f} ms")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""Microbenchmark for the single-pass NL matcher.
+
+`matcher_utils.analyze` replaced a chain of substring tests and regex
+searches in `extract_entities` and `classify_intent`. This script
+
+- checks the matcher against the reference copy below on randomly
+  generated queries (tests/test_matcher.py checks it against the golden
+  outputs in tests/nl_golden.json),
+- times the reference implementation, `analyze` and `analyze_batch`.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_matcher --fuzz 20000 --repeat 5
+
+`--write-golden` rebuilds the golden file from the reference implementation.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+from matcher_utils import analyze, analyze_batch, detect_intent
+
+GOLDEN = os.path.join(os.path.dirname(__file__), os.pardir, "tests", "nl_golden.json")
+
+# ------------------ Reference implementation ------------------
+# extract_entities / classify_intent as they were before the single-pass matcher
+
+def reference_extract_entities(nl_query):
+    query = nl_query.lower()
+    entities = {
+        "column": None, "operator": None, "value": None, "aggregation": None, "group_by": None,
+        "plot": None, "x": None, "y": None, "custom_metric": None, "order": None, "limit": None,
+    }
+    for col in ["grades", "attendance", "name", "class", "section"]:
+        if col in query:
+            entities["column"] = col
+            break
+    if "performance score" in query:
+        entities["custom_metric"] = "PERFORMANCE_SCORE"
+        entities["column"] = "PERFORMANCE_SCORE"
+    for phrase, symbol in [("greater than", ">"), ("more than", ">"), ("less than", "<"), ("fewer than", "<"), ("equal to", "=")]:
+        if phrase in query:
+            entities["operator"] = symbol
+            match = re.search(rf"{phrase} (\d+)", query)
+            if match:
+                entities["value"] = int(match.group(1))
+            break
+    for agg in ["average", "avg", "sum", "total", "max", "maximum", "min", "minimum"]:
+        if agg in query:
+            if "average" in query or "avg" in query:
+                entities["aggregation"] = "AVG"
+            elif "sum" in query or "total" in query:
+                entities["aggregation"] = "SUM"
+            elif "max" in query or "maximum" in query:
+                entities["aggregation"] = "MAX"
+            elif "min" in query or "minimum" in query:
+                entities["aggregation"] = "MIN"
+            break
+    for group_col in ["class", "section"]:
+        if f"group by {group_col}" in query or f"by {group_col}" in query:
+            entities["group_by"] = group_col
+            break
+    match = re.search(r"(top|highest) (\d+)", query)
+    if match:
+        entities["order"] = "DESC"
+        entities["limit"] = int(match.group(2))
+    match = re.search(r"(bottom|lowest) (\d+)", query)
+    if match:
+        entities["order"] = "ASC"
+        entities["limit"] = int(match.group(2))
+    if ("top" in query or "highest" in query) and entities["limit"] is None:
+        entities["order"] = "DESC"
+        entities["limit"] = 1
+    elif ("bottom" in query or "lowest" in query) and entities["limit"] is None:
+        entities["order"] = "ASC"
+        entities["limit"] = 1
+    for kind, code in [("bar graph", "BAR"), ("bar", "BAR"), ("line chart", "LINE"), ("line", "LINE"), ("pie chart", "PIE"), ("pie", "PIE")]:
+        if kind in query:
+            entities["plot"] = code
+            break
+    if "by" in query:
+        parts = query.split("by")
+        if len(parts) == 2:
+            entities["y"] = parts[0].strip().split()[-1]
+            entities["x"] = parts[1].strip().split()[0]
+    else:
+        entities["x"] = "name"
+        entities["y"] = entities["column"]
+    return entities
+
+
+def reference_classify_intent(nl_query):
+    nl_query = nl_query.lower()
+    if re.search(r'\b(average|mean)\b.*\b(grade|score)\b', nl_query):
+        return "average_query"
+    elif re.search(r'\bperformance score\b', nl_query):
+        return "performance_query"
+    elif re.search(r'\b(bar (graph|chart))\b', nl_query):
+        return "plot_bar"
+    elif re.search(r'\b(line (graph|chart))\b', nl_query):
+        return "plot_line"
+    elif re.search(r'\b(pie chart|distribution|proportion)\b', nl_query):
+        return "plot_pie"
+    elif re.search(r'\btop\s+\d+|\bbest\b', nl_query):
+        return "top_n_query"
+    elif re.search(r'\b(filter|greater than|less than|above|below|more than|under)\b', nl_query):
+        return "conditional_query"
+    else:
+        return "unknown"
+
+
+def reference_analyze(nl_query):
+    try:
+        entities = reference_extract_entities(nl_query)
+    except IndexError:
+        entities = "IndexError"
+    return reference_classify_intent(nl_query), entities
+
+# ------------------ Queries ------------------
+
+FRAGMENTS = [
+    "show", "me", "the", "students", "student", "with", "whose", "grades", "grade", "attendance", "name",
+    "names", "class", "classes", "section", "performance score", "score", "greater than", "more than",
+    "less than", "fewer than", "equal to", "above", "below", "under", "filter", "average", "avg", "mean",
+    "meaning", "sum", "total", "max", "maximum", "min", "minimum", "group by", "by", "by class",
+    "by section", "top", "highest", "bottom", "lowest", "best", "stop", "laptop", "bar", "bar graph",
+    "bar chart", "line", "line chart", "line graph", "online", "pie", "pie chart", "distribution",
+    "proportion", "of", "in", "and", "for", "each", "per", "plot", "draw", "list", "5", "10", "80", "3",
+    "75.5", "?", ".", "GRADES", "Top", "Bar Graph", "\n", "  ", "_top", "grade_",
+]
+
+HAND_WRITTEN = [
+    "show students with grades greater than 80",
+    "average grades by class",
+    "average grade of students",
+    "what is the mean score",
+    "performance score of all students",
+    "students with performance score greater than 75",
+    "top 5 students by performance score",
+    "bottom 3 students by attendance",
+    "highest attendance",
+    "lowest grades",
+    "plot a bar graph of grades by name",
+    "draw a line chart of attendance by name",
+    "pie chart of class distribution",
+    "proportion of students per section",
+    "grades by class",
+    "by class",
+    "list names of students with attendance less than 60",
+    "students with grades equal to 100",
+    "total grades by section",
+    "maximum attendance by class",
+    "minimum grades group by section",
+    "top 10 best students",
+    "filter students under 50",
+    "who is the best",
+    "average\ngrade",
+    "top  7 students",
+    "grades more than eighty",
+    "",
+]
+
+
+def random_queries(n, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 9))) for _ in range(n)]
+
+
+def golden_queries():
+    return HAND_WRITTEN + random_queries(500, seed=13)
+
+# ------------------ Checks ------------------
+
+def _new(query):
+    try:
+        return analyze(query)
+    except IndexError:
+        return detect_intent(query), "IndexError"
+
+
+def check_fuzz(n, seed):
+    bad = [q for q in random_queries(n, seed) if _new(q) != reference_analyze(q)]
+    for query in bad[:5]:
+        print("fuzz mismatch:", repr(query), _new(query), reference_analyze(query), file=sys.stderr)
+    return len(bad)
+
+
+def write_golden():
+    cases = [
+        dict(zip(("query", "intent", "entities"), (q, *reference_analyze(q))))
+        for q in golden_queries()
+    ]
+    with open(GOLDEN, "w") as f:
+        json.dump(cases, f, indent=1)
+        f.write("\n")
+    print(f"wrote {len(cases)} cases to {GOLDEN}")
+
+# ------------------ Timing ------------------
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _safe(fn):
+    def run(query):
+        try:
+            return fn(query)
+        except IndexError:
+            return None
+    return run
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--fuzz", type=int, default=20_000, help="random queries compared with the reference")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--write-golden", action="store_true")
+    args = ap.parse_args()
+
+    if args.write_golden:
+        write_golden()
+        return
+
+    fuzz_bad = check_fuzz(args.fuzz, args.seed)
+    print(f"fuzz: {args.fuzz - fuzz_bad}/{args.fuzz} match")
+
+    reference, single = _safe(reference_analyze), _safe(analyze)
+    workloads = {
+        "random": random_queries(args.fuzz, args.seed),
+        # Users repeat the same questions; analyze_batch analyzes each distinct one once
+        "repeated": [q for q in HAND_WRITTEN if single(q) is not None] * 200,
+    }
+    for label, queries in workloads.items():
+        queries = [q for q in queries if single(q) is not None]
+        n = len(queries)
+        old = best_of(lambda: [reference(q) for q in queries], args.repeat)
+        new = best_of(lambda: [single(q) for q in queries], args.repeat)
+        batch = best_of(lambda: analyze_batch(queries), args.repeat)
+        print(f"\n{label} ({n} queries)")
+        print(f"  reference     {old / n * 1e6:7.2f} us/query")
+        print(f"  analyze       {new / n * 1e6:7.2f} us/query  ({old / new:.2f}x)")
+        print(f"  analyze_batch {batch / n * 1e6:7.2f} us/query  ({old / batch:.2f}x)")
+    sys.exit(1 if fuzz_bad else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Report memory and filter / GROUP BY time of `read_csv` dtypes vs compact dtypes.
+
+Prints `schema.memory_report` for the dataset as `pd.read_csv` loads it and
+as `compact_dtypes` stores it, then times an equality filter and a GROUP BY
+on both and checks that they return the same rows. Run from the repository
+root, on a CSV file or on synthetic rows:
+
+    python -m benchmarks.bench_memory --csv students.csv
+    python -m benchmarks.bench_memory --rows 1000000
+"""
+import argparse
+import sys
+
+import pandas as pd
+
+from dataset import Dataset
+from executor import run_query
+from query_cache import parse_query
+from schema import compact_dtypes, memory_report
+
+from benchmarks.bench_parallel import best_of, synthetic_students
+
+QUERIES = [
+    'SELECT name, grades FROM students WHERE class = "{value}";',
+    'SELECT name FROM students WHERE section IN ("A", "C") AND grades > 50;',
+    'SELECT AVG(grades) FROM students GROUP BY class;',
+]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--csv", default=None, help="CSV file to load (default: synthetic rows)")
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    raw = pd.read_csv(args.csv) if args.csv else synthetic_students(args.rows)
+    compact = compact_dtypes(raw)
+    with pd.option_context("display.width", 120):
+        print(memory_report(raw, compact).to_string(index=False))
+
+    value = raw["class"].iloc[0]
+    mismatches = 0
+    print(f"\n{len(raw):,} rows (no indexes, so every filter scans)")
+    for template in QUERIES:
+        parsed = parse_query(template.format(value=value))
+        before, after = Dataset(raw, index=False), Dataset(compact, index=False)
+        old, new = run_query(parsed, before)[0], run_query(parsed, after)[0]
+        if not old.reset_index(drop=True).astype(object).equals(new.reset_index(drop=True).astype(object)):
+            mismatches += 1
+            print(f"  mismatch: {template}", file=sys.stderr)
+        old_time = best_of(lambda: run_query(parsed, before), args.repeat)
+        new_time = best_of(lambda: run_query(parsed, after), args.repeat)
+        print(f"  {template.format(value=value)}\n    read_csv dtypes {old_time * 1000:8.1f} ms   "
+              f"compact {new_time * 1000:8.1f} ms   ({old_time / new_time:5.2f}x)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Speedup of the parallel GROUP BY / filter path against partition count.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_parallel --rows 5000000 --partitions 1 2 4 8 16 32
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataset import Dataset
+from executor import run_query
+from query_cache import parse_query
+import parallel
+
+QUERIES = {
+    "group_by_avg": 'SELECT AVG(grades) FROM students WHERE attendance > 60 GROUP BY class;',
+    "filter": 'SELECT name, grades FROM students WHERE section = "B";',
+}
+
+
+def synthetic_students(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    classes = np.array([f"{g}{s}" for g in range(6, 13) for s in "ABCD"])
+    return pd.DataFrame({
+        "name": np.char.add("student", np.arange(rows).astype(str)).astype(object),
+        "class": classes[rng.integers(0, len(classes), rows)].astype(object),
+        "section": np.array(list("ABC"))[rng.integers(0, 3, rows)].astype(object),
+        "grades": rng.integers(0, 101, rows),
+        "attendance": rng.integers(0, 101, rows),
+    })
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=5_000_000)
+    ap.add_argument("--partitions", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    ds = Dataset(synthetic_students(args.rows), index=False)
+    print(f"{args.rows:,} rows")
+    for label, text in QUERIES.items():
+        parsed = parse_query(text)
+        parallel.parallel_executor = None
+        serial = best_of(lambda: run_query(parsed, ds), args.repeat)
+        print(f"\n{label}: serial {serial * 1000:.1f} ms")
+        for n in args.partitions:
+            runner = parallel.ParallelExecutor(workers=n, min_rows=0, partitions=n)
+            parallel.parallel_executor = runner
+            run_query(parsed, ds)  # warm up the pool and publish the shared columns
+            elapsed = best_of(lambda: run_query(parsed, ds), args.repeat)
+            runner.shutdown()
+            print(f"  {n:>3} partitions: {elapsed * 1000:8.1f} ms  speedup {serial / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Chart render time and payload size with and without downsampling.
+
+Renders a LINE, a BAR and a PIE chart of `--rows` result rows with every
+point (budget 0) and with the default budgets of downsampling.py, and
+reports time and payload size for each format. Run from the repository
+root:
+
+    python -m benchmarks.bench_plots --rows 20000 --formats png json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+import downsampling
+import rendering
+
+FORMATS = {"png": rendering.render_png, "svg": rendering.render_svg, "json": rendering.chart_spec}
+
+
+def results(rows, seed=0):
+    """Result frames shaped like `SELECT name, grades ... PLOT <type> GRAPH` returns them."""
+    rng = np.random.default_rng(seed)
+    names = np.char.add("student", np.arange(rows).astype(str)).astype(object)
+    series = pd.DataFrame({"name": names, "grades": np.clip(50 + np.cumsum(rng.normal(size=rows)), 0, 100)})
+    classes = pd.DataFrame({"class": rng.zipf(1.3, rows).astype(str)})
+    return {"LINE": series, "BAR": series, "PIE": classes}
+
+
+def timed(fn):
+    start = time.perf_counter()
+    payload = fn()
+    return time.perf_counter() - start, len(payload if isinstance(payload, str) else json.dumps(payload))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=20_000)
+    ap.add_argument("--formats", nargs="+", default=["png", "json"], choices=sorted(FORMATS))
+    args = ap.parse_args()
+
+    defaults = dict(downsampling.BUDGETS)
+    for plot_type, result in results(args.rows).items():
+        for fmt in args.formats:
+            downsampling.BUDGETS[plot_type] = 0
+            full_time, full_size = timed(lambda: FORMATS[fmt](result, plot_type))
+            downsampling.BUDGETS[plot_type] = defaults[plot_type]
+            time_, size = timed(lambda: FORMATS[fmt](result, plot_type))
+            print(f"{plot_type:<4} {fmt:<4} all points {full_time * 1000:9.1f} ms {full_size:>10,} B   "
+                  f"budget {defaults[plot_type]:>5} {time_ * 1000:8.1f} ms {size:>9,} B   "
+                  f"({full_time / time_:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Result delivery: whole-table `to_html` vs one page and chunked exports.
+
+Runs one broad query over synthetic rows and reports, for each way of
+delivering its result, the time to the first byte, the total time and the
+largest string held at once. Run from the repository root:
+
+    python -m benchmarks.bench_results --rows 1000000
+"""
+import argparse
+import time
+
+from dataset import Dataset
+from executor import run_query
+from pagination import export_chunks, paginate
+from query_cache import parse_query
+
+from benchmarks.bench_parallel import synthetic_students
+
+QUERY = 'SELECT name, class, grades, attendance FROM students WHERE grades > 20;'
+
+
+def single(render):
+    """One chunk, produced when it is first asked for (so `measure` times it)."""
+    yield render()
+
+
+def measure(chunks):
+    """(seconds to the first chunk, total seconds, largest chunk length) of an iterable of strings."""
+    start = time.perf_counter()
+    first, largest = None, 0
+    for chunk in chunks:
+        if first is None:
+            first = time.perf_counter() - start
+        largest = max(largest, len(chunk))
+    return first or 0.0, time.perf_counter() - start, largest
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    result, _ = run_query(parse_query(QUERY), Dataset(synthetic_students(args.rows)))
+    print(f"{QUERY}\n{len(result):,} result rows\n")
+    cases = {
+        "whole to_html": lambda: single(lambda: result.to_html(classes="table table-bordered")),
+        "first page": lambda: single(lambda: paginate(result, QUERY, "v").rows.to_html(classes="table table-bordered")),
+        "export csv": lambda: export_chunks(result, "csv"),
+        "export ndjson": lambda: export_chunks(result, "ndjson"),
+    }
+    for label, chunks in cases.items():
+        first, total, largest = measure(chunks())
+        print(f"  {label:<14} first byte {first * 1000:9.1f} ms   total {total * 1000:9.1f} ms   "
+              f"largest string {largest / 2**20:8.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Cold start-up time of the web app and of an EDSQL-only CLI run.
+
+Each case runs in a fresh interpreter. Besides wall time, the report lists
+which heavy NLP/LLM modules ended up imported; structured EDSQL should load
+none of them. Run from the repository root:
+
+    python -m benchmarks.bench_startup --repeat 5 --budget 2.0
+
+Exits with status 1 if a case imports a heavy module or its best time is over
+`--budget` seconds.
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ["spacy", "google.generativeai"]
+
+# Prints the heavy modules the case imported, one per line, after running it
+_REPORT = "import sys; print('\\n'.join(m for m in {heavy!r} if m in sys.modules))"
+
+CASES = {
+    "import app": "import app",
+    "import main": "import main",
+    "cli edsql": (
+        "import builtins, main; "
+        "builtins.input = lambda prompt='': 'SELECT name, grades FROM students WHERE grades > 90 LIMIT 3;'; "
+        "main.main()"
+    ),
+}
+
+
+def run_case(code):
+    """(seconds, heavy modules imported) for one fresh interpreter running `code`."""
+    script = f"{code}\n{_REPORT.format(heavy=HEAVY_MODULES)}"
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed")
+    loaded = [line for line in proc.stdout.splitlines() if line in HEAVY_MODULES]
+    return elapsed, loaded
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--budget", type=float, default=None, help="fail if a case takes longer (seconds)")
+    args = ap.parse_args()
+
+    ok = True
+    for label, code in CASES.items():
+        times, loaded = [], []
+        for _ in range(args.repeat):
+            elapsed, loaded = run_case(code)
+            times.append(elapsed)
+        best = min(times)
+        over = args.budget is not None and best > args.budget
+        ok &= not loaded and not over
+        heavy = ", ".join(loaded) or "none"
+        print(f"{label:<12} best {best * 1000:8.1f} ms  median {sorted(times)[len(times) // 2] * 1000:8.1f} ms"
+              f"  heavy modules: {heavy}{'  OVER BUDGET' if over else ''}")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
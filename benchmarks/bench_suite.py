@@ -0,0 +1,238 @@
+"""Fixed EDSQL workload over seeded synthetic `students` tables, compared to a baseline.
+
+For each table size (1k to 10M rows of name, class, section, grades and
+attendance from `synthetic_students`), the workload below runs `--repeat`
+times after one warm-up. It covers every clause of the grammar: compound
+WHERE, GROUP BY AVG, ORDER BY + LIMIT, CUSTOM_METRIC, SAMPLE and each PLOT
+type. It also covers the natural-language path through `EntityTranslator`.
+Reported per statement: p50/p95/p99 latency of each stage (translate,
+parse, execute, render). Reported per size: statements per second over
+the measured work and the peak RSS of the process.
+
+Each size runs in its own process so its peak RSS is its own. Results are
+printed as JSON (or written to `--output`) and compared with
+`benchmarks/baseline.json`: a stage whose p50 grew by more than
+`--tolerance` (and by more than `--min-ms`) is reported as a regression and
+makes the exit status 1. Baselines are machine-specific; rebuild one with
+`--save-baseline` on the machine that compares against it. Run from the
+repository root:
+
+    python -m benchmarks.bench_suite --rows 1000 100000 1000000
+    python -m benchmarks.bench_suite --rows 10000000 --repeat 3 --output results.json
+    python -m benchmarks.bench_suite --save-baseline
+
+`--csv students.csv --rows 2000` writes a seeded table for the app instead.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import rendering
+from column_stats import analyze
+from dataset import Dataset
+from edsql_compiler import parser
+from executor import run_query
+from query_cache import normalize_query
+from schema import compact_dtypes
+from translation import EntityTranslator
+
+from benchmarks.bench_parallel import synthetic_students
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+SIZES = [1_000, 100_000, 1_000_000]
+
+WORKLOAD = {
+    "where_compound": 'SELECT name, grades FROM students WHERE grades > 60 AND attendance < 40 AND section = "B";',
+    "where_in_between": 'SELECT name FROM students WHERE class IN ("6A", "9C") AND grades BETWEEN 40 AND 60;',
+    "where_or_not": 'SELECT name FROM students WHERE NOT grades <= 50 AND (section = "A" OR attendance >= 90);',
+    "group_by_avg": 'SELECT AVG(grades) FROM students WHERE attendance > 60 GROUP BY class;',
+    "order_limit": 'SELECT name, grades FROM students ORDER BY grades DESC LIMIT 10;',
+    "custom_metric": 'SELECT name, CUSTOM_METRIC(PERFORMANCE_SCORE, grades, attendance) FROM students '
+                     'WHERE PERFORMANCE_SCORE > 75;',
+    "custom_metric_top": 'SELECT CUSTOM_METRIC(PERFORMANCE_SCORE, grades, attendance) FROM students '
+                         'ORDER BY PERFORMANCE_SCORE DESC LIMIT 5;',
+    "sample": 'SELECT name, grades FROM students WHERE grades > 50 SAMPLE 10 PERCENT;',
+    "plot_bar": 'SELECT class, grades FROM students WHERE section = "A" AND attendance > 95 PLOT BAR GRAPH;',
+    "plot_line": 'SELECT name, attendance FROM students WHERE class = "10A" PLOT LINE GRAPH;',
+    "plot_pie": 'SELECT class FROM students WHERE grades > 90 PLOT PIE CHART;',
+}
+
+# Questions EntityTranslator turns into EDSQL (see nl_golden.json)
+NL_WORKLOAD = {
+    "nl_filter": "show students with grades greater than 80",
+    "nl_group_by": "average grades by class",
+    "nl_metric_filter": "students with performance score greater than 75",
+    "nl_top": "bottom 3 students by attendance",
+    "nl_plot": "draw a line chart of attendance by name",
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+def students(rows, seed=0):
+    """The synthetic table as the app stores it: compact dtypes, indexes and statistics."""
+    frame = compact_dtypes(synthetic_students(rows, seed))
+    ds = Dataset(frame, version=f"synthetic-{rows}-{seed}")
+    ds.stats = analyze(frame)
+    return ds
+
+
+def peak_rss_mib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 2**20 if sys.platform == "darwin" else peak / 2**10, 1)  # bytes on macOS, KiB elsewhere
+
+
+def summarize(samples):
+    """Latency percentiles and mean, in milliseconds."""
+    ms = np.asarray(samples) * 1000
+    summary = {f"p{q}": round(float(np.percentile(ms, q)), 4) for q in PERCENTILES}
+    summary["mean"] = round(float(ms.mean()), 4)
+    return summary
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    value = fn(*args)
+    return value, time.perf_counter() - start
+
+
+def run_statement(text, ds, translator):
+    """Run one workload entry through every stage; returns (stage seconds, result rows)."""
+    seconds = {}
+    if translator is not None:
+        text, seconds["translate"] = timed(translator.translate, text)
+    # The parser itself, not the parse cache: a cached parse would measure a dict lookup
+    parsed, seconds["parse"] = timed(parser.parse, normalize_query(text))
+    if not parsed:
+        raise ValueError(f"Statement did not parse: {text}")
+    (result, plot), seconds["execute"] = timed(run_query, parsed, ds)
+    if plot:
+        _, seconds["render"] = timed(rendering.render_png, result, plot)
+    return seconds, len(result)
+
+
+def run_size(rows, seed, repeat):
+    """Results for one table size (run in a fresh process for a meaningful peak RSS)."""
+    ds, setup = timed(students, rows, seed)
+    translator = EntityTranslator()
+    entries = [(name, text, None) for name, text in WORKLOAD.items()]
+    entries += [(name, text, translator) for name, text in NL_WORKLOAD.items()]
+    statements, total = {}, 0.0
+    for name, text, nl in entries:
+        _, result_rows = run_statement(text, ds, nl)  # warm-up: metric memos, lazy indexes
+        samples = {}
+        for _ in range(repeat):
+            seconds, _ = run_statement(text, ds, nl)
+            for stage, value in seconds.items():
+                samples.setdefault(stage, []).append(value)
+            total += sum(seconds.values())
+        statements[name] = {"statement": text, "result_rows": result_rows,
+                            **{f"{stage}_ms": summarize(values) for stage, values in samples.items()}}
+    return {
+        "rows": rows,
+        "setup_seconds": round(setup, 3),
+        "statements_per_second": round(len(entries) * repeat / total, 2),
+        "peak_rss_mib": peak_rss_mib(),
+        "statements": statements,
+    }
+
+
+def run_isolated(rows, args):
+    command = [sys.executable, "-m", "benchmarks.bench_suite", "--in-process", "--no-compare",
+               "--rows", str(rows), "--seed", str(args.seed), "--repeat", str(args.repeat)]
+    out = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(out)["sizes"][str(rows)]
+
+
+def environment(args):
+    return {
+        "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+        "platform": platform.platform(), "cpus": os.cpu_count(),
+        "seed": args.seed, "repeat": args.repeat,
+    }
+
+
+def compare(results, baseline, tolerance, min_ms):
+    """(label, baseline p50, current p50) for every stage slower than the baseline allows."""
+    regressions = []
+    for size, current in results["sizes"].items():
+        before = baseline.get("sizes", {}).get(size)
+        if before is None:
+            continue
+        for name, stages in current["statements"].items():
+            for stage, summary in stages.items():
+                old = before["statements"].get(name, {}).get(stage)
+                if not stage.endswith("_ms") or old is None:
+                    continue
+                if summary["p50"] > old["p50"] * (1 + tolerance) and summary["p50"] - old["p50"] > min_ms:
+                    regressions.append((f"{size} rows {name} {stage[:-3]}", old["p50"], summary["p50"]))
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, nargs="+", default=SIZES)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--output", default=None, help="write the JSON results here (default: stdout)")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    ap.add_argument("--no-compare", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.5, help="allowed p50 growth (0.5 = 50%%)")
+    ap.add_argument("--min-ms", type=float, default=1.0, help="ignore p50 growth smaller than this")
+    ap.add_argument("--in-process", action="store_true", help="run every size in this process")
+    ap.add_argument("--csv", default=None, help="only write a synthetic table of --rows[0] rows to this CSV")
+    args = ap.parse_args()
+
+    if args.csv:
+        synthetic_students(args.rows[0], args.seed).to_csv(args.csv, index=False)
+        print(f"Wrote {args.rows[0]:,} rows to {args.csv}", file=sys.stderr)
+        return 0
+
+    sizes = {}
+    for rows in sorted(args.rows):
+        if not (args.in_process and len(args.rows) == 1):
+            print(f"{rows:,} rows...", file=sys.stderr)
+        sizes[str(rows)] = (run_size(rows, args.seed, args.repeat) if args.in_process or len(args.rows) == 1
+                            else run_isolated(rows, args))
+    results = {"environment": environment(args), "sizes": sizes}
+
+    text = json.dumps(results, indent=1)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(text + "\n")
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+        return 0
+
+    if args.no_compare or not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.min_ms)
+    for label, old, new in regressions:
+        print(f"REGRESSION {label}: p50 {old:.3f} ms -> {new:.3f} ms ({new / old:.2f}x)", file=sys.stderr)
+    print(f"{len(regressions)} regressions against {args.baseline}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Report time for compound WHERE predicates vs intersecting single-condition queries.
+
+Before compound predicates, a filter like `a AND b AND c` ran as one query per
+condition with the name lists intersected by the client. Both ways are timed
+(without secondary indexes, with them, and with them plus column statistics)
+and their rows compared. Run from the repository root:
+
+    python -m benchmarks.bench_where --rows 1000000
+"""
+import argparse
+import sys
+
+from column_stats import analyze
+from dataset import Dataset
+from executor import run_query
+from query_cache import parse_query
+
+from benchmarks.bench_parallel import best_of, synthetic_students
+
+# (compound WHERE, its conditions as single-condition queries can express them)
+CASES = [
+    ('grades > 60 AND attendance < 40 AND section = "B"',
+     ['grades > 60', 'attendance < 40', 'section = "B"']),
+    ('attendance < 10 AND grades > 50 AND class = "9C"',
+     ['attendance < 10', 'grades > 50', 'class = "9C"']),
+]
+OTHERS = [
+    'grades BETWEEN 40 AND 60 AND (section = "A" OR attendance >= 90.5)',
+    'class IN ("6A", "7B", "12D") AND NOT grades <= 50',
+]
+
+
+def names(where, ds):
+    result, _ = run_query(parse_query(f'SELECT name FROM students WHERE {where};'), ds)
+    return result['name']
+
+
+def intersected(conditions, ds):
+    """The client-side workaround: one query per condition, then set intersection."""
+    keep = set(names(conditions[0], ds))
+    for condition in conditions[1:]:
+        keep &= set(names(condition, ds))
+    return keep
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    frame = synthetic_students(args.rows)
+    with_stats = Dataset(frame)
+    with_stats.stats = analyze(frame)
+    mismatches = 0
+    datasets = [("no index", Dataset(frame, index=False)), ("indexed", Dataset(frame)), ("indexed + stats", with_stats)]
+    for label, ds in datasets:
+        print(f"{args.rows:,} rows, {label}")
+        for where, conditions in CASES:
+            if set(names(where, ds)) != intersected(conditions, ds):
+                mismatches += 1
+                print(f"  mismatch: {where}", file=sys.stderr)
+            compound = best_of(lambda: names(where, ds), args.repeat)
+            client = best_of(lambda: intersected(conditions, ds), args.repeat)
+            print(f"  {where}\n    compound {compound * 1000:8.1f} ms   "
+                  f"intersected {client * 1000:8.1f} ms   ({client / compound:5.2f}x)")
+        for where in OTHERS:
+            elapsed = best_of(lambda: names(where, ds), args.repeat)
+            print(f"  {where}\n    {elapsed * 1000:8.1f} ms")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Per-worker start-up time and private memory: parsing the CSV vs attaching to the published copy.
+
+Writes synthetic rows to a temporary CSV, publishes its columnar copy once
+(storage.py), then starts `--workers` fresh processes at the same time for
+each way of loading a `DatasetSource`:
+
+- `parse csv`: every worker parses the file, builds its indexes and analyzes it;
+- `attach`: every worker maps the published columns, indexes and statistics.
+
+Each worker reports its load time and its private memory (Linux only, from
+/proc/self/smaps_rollup; pages shared through the page cache are not
+counted), and the first rows of a filter, which must agree. Run from the
+repository root:
+
+    python -m benchmarks.bench_workers --rows 1000000 --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_parallel import synthetic_students
+
+QUERY = 'SELECT name, grades FROM students WHERE section = "B" AND grades > 90 LIMIT 5;'
+
+
+def private_bytes():
+    """Private (unshared) resident bytes of this process, or None where unavailable."""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None
+    return sum(int(fields[key].split()[0]) * 1024 for key in ("Private_Clean", "Private_Dirty") if key in fields)
+
+
+def worker(path, attach, results):
+    from dataset import DatasetSource, load_csv_dataset
+    from executor import run_query
+    from query_cache import parse_query
+
+    start = time.perf_counter()
+    source = DatasetSource(path) if attach else DatasetSource(path, loader=load_csv_dataset)
+    elapsed = time.perf_counter() - start
+    rows = run_query(parse_query(QUERY), source.current())[0]
+    results.put((elapsed, private_bytes(), rows["name"].tolist()))
+
+
+def run(path, attach, workers):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    procs = [context.Process(target=worker, args=(path, attach, results)) for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    reports = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    return reports
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args()
+
+    import storage
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "students.csv")
+        synthetic_students(args.rows).to_csv(path, index=False)
+        start = time.perf_counter()
+        storage.publish(path)
+        print(f"published {args.rows:,} rows in {time.perf_counter() - start:.2f} s\n")
+
+        answers = set()
+        for label, attach in (("parse csv", False), ("attach", True)):
+            reports = run(path, attach, args.workers)
+            times = [elapsed for elapsed, _, _ in reports]
+            memory = [size for _, size, _ in reports if size is not None]
+            answers.update(tuple(names) for _, _, names in reports)
+            private = f"{sum(memory) / len(memory) / 2**20:8.1f} MiB private" if memory else "private memory n/a"
+            print(f"{label:<10} {args.workers} workers   load max {max(times) * 1000:8.1f} ms   "
+                  f"mean {sum(times) / len(times) * 1000:8.1f} ms   {private} per worker")
+    if len(answers) != 1:
+        print("  workers disagree on the query result", file=sys.stderr)
+    sys.exit(0 if len(answers) == 1 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""Table catalog: FROM and JOIN names resolved to data files, loaded on first use.
+
+The table `exams` is `exams.csv` in the catalog's data directory
+(EDSQL_DATA_DIR, default `data/`), unless a path is registered for the name
+(e.g. `students` -> `students.csv`). Nothing is read until a statement names
+a table. Each table is then a `DatasetSource`, so it reloads when its file
+changes and is stored in the columnar format of storage.py.
+
+Loaded tables are kept in an LRU bounded by their in-memory size
+(EDSQL_CATALOG_MB, default 1024). When a load takes the total past the
+budget, the least recently used other tables are dropped. Statements already
+running keep the snapshot they resolved, and a dropped table is loaded again
+the next time it is named.
+
+`resolve` picks the Dataset a parsed statement runs against. A statement
+with JOINs gets a view of its FROM table that carries the joined tables'
+snapshots. The view's version combines all of their versions, so cached
+results are keyed on every table involved.
+"""
+import copy
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from dataset import DatasetSource, load_dataset
+from query_cache import estimate_size
+
+DATA_DIR = os.environ.get("EDSQL_DATA_DIR", "data")
+DEFAULT_MAXBYTES = int(os.environ.get("EDSQL_CATALOG_MB", "1024")) * 1024 * 1024
+
+_TABLE_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def statement_table(parsed_query):
+    """FROM table of a parsed statement, or None (e.g. a bare ANALYZE)."""
+    if parsed_query[0] == 'EXPLAIN':
+        return statement_table(parsed_query[2])
+    if parsed_query[0] == 'ANALYZE':
+        return parsed_query[1]
+    return parsed_query[2]
+
+
+def joined_tables(parsed_query):
+    """Names of the tables a parsed statement JOINs, in order."""
+    if parsed_query[0] == 'EXPLAIN':
+        return joined_tables(parsed_query[2])
+    if parsed_query[0] != 'QUERY' or len(parsed_query) <= 10 or not parsed_query[10]:
+        return []
+    return [join[1] for join in parsed_query[10]]
+
+
+def join_version(versions):
+    """Version of a view over several tables: None if any of them has none."""
+    if any(version is None for version in versions):
+        return None
+    return "+".join(versions)
+
+
+def resolve(parsed_query, ds):
+    """The Dataset `parsed_query` runs against, given `ds` (any table of a catalog).
+
+    A Dataset that is not in a catalog answers every FROM name, as a single
+    table always did. Raises KeyError for an unknown table.
+    """
+    catalog = ds.catalog
+    if catalog is None:
+        return ds
+    name = statement_table(parsed_query) or catalog.default_name
+    joined = joined_tables(parsed_query)
+    if name == ds.name and all(table in ds.joined for table in joined):
+        return ds  # already resolved for this statement
+    target = catalog.table(name)
+    if not joined:
+        return target
+    view = copy.copy(target)
+    view.joined = {table: catalog.table(table) for table in joined}
+    view.version = join_version([target.version] + [view.joined[table].version for table in joined])
+    return view
+
+
+class Catalog:
+    def __init__(self, data_dir=DATA_DIR, paths=None, default="students", maxbytes=DEFAULT_MAXBYTES,
+                 loader=load_dataset, check_interval=0.0):
+        self.data_dir = data_dir
+        self.paths = dict(paths or {})
+        self.default_name = default
+        self.maxbytes = maxbytes
+        self.loader = loader
+        self.check_interval = check_interval
+        self._sources = OrderedDict()  # name -> DatasetSource, least recently used first
+        self._sizes = {}  # name -> (version, bytes) of the loaded frame
+        self._versions = {}  # name -> version of the last load
+        self._listeners = []
+        self._materialized = []  # (table, group_col, column)
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def path(self, name):
+        """File of table `name`; raises KeyError if there is none."""
+        if name in self.paths:
+            return self.paths[name]
+        if _TABLE_NAME.match(name):
+            path = os.path.join(self.data_dir, f"{name}.csv")
+            if os.path.isfile(path):
+                return path
+        raise KeyError(f"Unknown table: {name}")
+
+    def names(self):
+        """Every table name the catalog can resolve."""
+        names = set(self.paths)
+        if os.path.isdir(self.data_dir):
+            names.update(entry[:-4] for entry in os.listdir(self.data_dir)
+                         if entry.endswith(".csv") and _TABLE_NAME.match(entry[:-4]))
+        return sorted(names)
+
+    def on_reload(self, callback):
+        """Call `callback(dataset)` whenever a loaded table's data changes."""
+        with self._lock:
+            self._listeners.append(callback)
+            sources = list(self._sources.values())
+        for source in sources:
+            source.on_reload(callback)
+
+    def materialize(self, table, group_col, column):
+        """Maintain GROUP BY `group_col` AVG(`column`) of `table` (see materialized.py)."""
+        with self._lock:
+            self._materialized.append((table, group_col, column))
+            source = self._sources.get(table)
+        if source is not None:
+            source.materialize(group_col, column)
+
+    def source(self, name):
+        """The DatasetSource of table `name`, created (not loaded) on first use."""
+        with self._lock:
+            source = self._sources.get(name)
+            if source is not None:
+                self._sources.move_to_end(name)
+                return source
+            source = DatasetSource(self.path(name), loader=partial(self._load, name),
+                                   check_interval=self.check_interval, lazy=True)
+            for callback in self._listeners:
+                source.on_reload(callback)
+            for table, group_col, column in self._materialized:
+                if table == name:
+                    source.materialize(group_col, column)
+            self._sources[name] = source
+            return source
+
+    def _load(self, name, path):
+        dataset = self.loader(path)
+        dataset.name, dataset.catalog = name, self
+        with self._lock:
+            self._versions[name] = dataset.version
+            self.loads += 1
+        return dataset
+
+    def table(self, name):
+        """The current Dataset of table `name`, loading it if needed."""
+        dataset = self.source(name).current()
+        self._account(name, dataset)
+        return dataset
+
+    def default(self):
+        return self.table(self.default_name)
+
+    def resolve(self, parsed_query):
+        """The Dataset `parsed_query` runs against (see `resolve`); KeyError for an unknown table."""
+        return resolve(parsed_query, self.table(statement_table(parsed_query) or self.default_name))
+
+    def dataset_for(self, parsed_query):
+        """Like `resolve`, but the default table for an unknown one (running the statement reports it)."""
+        try:
+            return self.resolve(parsed_query)
+        except KeyError:
+            return self.default()
+
+    def _account(self, name, dataset):
+        """Record the size of `name`'s frame and drop other tables past the memory budget."""
+        known = self._sizes.get(name)
+        if known is not None and known[0] == dataset.version:
+            return
+        size = estimate_size(dataset.frame)
+        with self._lock:
+            if name not in self._sources:
+                return  # dropped while it was measured
+            self._sizes[name] = (dataset.version, size)
+            total = sum(size for _, size in self._sizes.values())
+            for other in list(self._sources):
+                if total <= self.maxbytes:
+                    break
+                if other == name:
+                    continue
+                del self._sources[other]
+                self._versions.pop(other, None)
+                total -= self._sizes.pop(other, (None, 0))[1]
+                self.evictions += 1
+
+    def versions(self):
+        """Versions of the loaded tables: what cache invalidation keeps (see query_cache.is_current)."""
+        with self._lock:
+            return frozenset(self._versions.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "tables": {name: {"path": source.path, "bytes": self._sizes.get(name, (None, None))[1],
+                                  "version": self._versions.get(name)}
+                           for name, source in self._sources.items()},
+                "bytes": sum(size for _, size in self._sizes.values()),
+                "maxbytes": self.maxbytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
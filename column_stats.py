@@ -0,0 +1,288 @@
+"""Per-column statistics for cost-based decisions in the executor.
+
+`analyze(frame)` computes, for every column: row and null counts, min/max,
+the number of distinct values, an equi-depth histogram (numeric columns) and
+the most common values (other columns). `TableStats.leaf_selectivity`
+turns them into the estimated fraction of rows a WHERE leaf keeps (see
+expressions.py), which orders conjuncts and decides between an index probe
+and a scan.
+
+Distinct counts of numeric columns are exact for small tables and
+HyperLogLog estimates for big ones; other columns are counted exactly from
+their distinct values.
+
+`refresh(stats, frame)` extends existing statistics with the rows appended
+since they were computed instead of starting over (distinct counts then come
+from the merged sketches). Appends are recognized by a hash of a few probe
+rows, so edits to existing rows that miss the probes go unnoticed until the
+next `ANALYZE`.
+
+`TableStats.to_dict` / `from_dict` round-trip statistics through JSON, so the
+columnar copy (see storage.py) can carry them and loading processes skip the
+analysis.
+"""
+import numpy as np
+import pandas as pd
+
+BUCKETS = 32
+MCV_SIZE = 32
+EXACT_ROWS = 100_000  # up to this many rows, rebuild with exact distinct counts
+PROBES = 64
+HLL_PRECISION = 12
+
+# ------------------ HyperLogLog ------------------
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch (2**precision one-byte registers)."""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, values):
+        hashes = pd.util.hash_array(np.asarray(values, dtype=object) if values.dtype.kind == 'O' else values)
+        hashes = hashes.astype(np.uint64, copy=False)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        rest = hashes << np.uint64(self.precision)
+        # Rank of the first set bit among the remaining 64 - precision bits
+        bits = 64 - self.precision
+        rank = np.full(len(rest), bits + 1, dtype=np.uint8)
+        nonzero = rest != 0
+        rank[nonzero] = (64 - np.floor(np.log2(rest[nonzero].astype(np.float64)))).astype(np.uint8)
+        np.maximum.at(self.registers, index, np.minimum(rank, bits + 1))
+        return self
+
+    def merge(self, other):
+        merged = HyperLogLog(self.precision)
+        merged.registers = np.maximum(self.registers, other.registers)
+        return merged
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(estimate))
+
+# ------------------ Columns ------------------
+
+def _cdf_points(bounds, n):
+    """(values, cumulative counts) of an equi-depth histogram over `n` values."""
+    return np.asarray(bounds, dtype=np.float64), np.linspace(0.0, n, len(bounds))
+
+
+def _merge_bounds(a, a_n, b, b_n):
+    """Equi-depth bounds of the union of two histograms (piecewise-linear CDFs added up)."""
+    points = np.union1d(a, b)
+    total = np.zeros(len(points))
+    for bounds, n in ((a, a_n), (b, b_n)):
+        xs, cum = _cdf_points(bounds, n)
+        total += np.interp(points, xs, cum, left=0.0, right=n)
+    targets = np.linspace(0.0, a_n + b_n, BUCKETS + 1)
+    return np.interp(targets, total, points)
+
+
+class ColumnStats:
+    def __init__(self, name, numeric, rows=0, nulls=0, minimum=None, maximum=None,
+                 distinct=0, sketch=None, bounds=None, mcv=None):
+        self.name = name
+        self.numeric = numeric
+        self.rows = rows
+        self.nulls = nulls
+        self.min = minimum
+        self.max = maximum
+        self.distinct = distinct
+        self.sketch = sketch
+        self.bounds = bounds  # equi-depth histogram bounds (numeric columns)
+        self.mcv = mcv or {}  # most common values -> count (other columns)
+
+    @classmethod
+    def build(cls, series, exact=False):
+        values = series.dropna()
+        numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+        stats = cls(series.name, numeric, len(series), len(series) - len(values))
+        if numeric:
+            if len(values):
+                stats.min, stats.max = values.min(), values.max()
+                stats.bounds = np.quantile(values.to_numpy(dtype=np.float64), np.linspace(0, 1, BUCKETS + 1))
+            stats.sketch = HyperLogLog().add(values.to_numpy())
+            stats.distinct = int(values.nunique()) if exact else stats.sketch.count()
+            return stats
+        # Everything else is counted exactly from its distinct values
+        codes, uniques = pd.factorize(values)  # categoricals factorize from their codes
+        uniques = np.asarray(uniques, dtype=object)
+        counts = np.bincount(codes, minlength=len(uniques))
+        top = np.argsort(-counts, kind='stable')[:MCV_SIZE]
+        stats.mcv = {uniques[i]: int(counts[i]) for i in top}
+        if len(uniques):
+            try:
+                distinct = pd.Series(uniques)
+                stats.min, stats.max = distinct.min(), distinct.max()
+            except TypeError:
+                pass  # mixed types have no order
+        stats.sketch = HyperLogLog().add(np.asarray(uniques, dtype=object))
+        stats.distinct = len(uniques)
+        return stats
+
+    def to_dict(self):
+        return {"name": self.name, "numeric": self.numeric, "rows": self.rows, "nulls": self.nulls,
+                "min": _plain(self.min), "max": _plain(self.max), "distinct": self.distinct,
+                "sketch": self.sketch.registers.tolist() if self.sketch is not None else None,
+                "bounds": self.bounds.tolist() if self.bounds is not None else None,
+                "mcv": [[_plain(value), count] for value, count in self.mcv.items()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = None
+        if data["sketch"] is not None:
+            sketch = HyperLogLog()
+            sketch.registers = np.asarray(data["sketch"], dtype=np.uint8)
+        bounds = np.asarray(data["bounds"], dtype=np.float64) if data["bounds"] is not None else None
+        return cls(data["name"], data["numeric"], data["rows"], data["nulls"], data["min"], data["max"],
+                   data["distinct"], sketch, bounds, {value: count for value, count in data["mcv"]})
+
+    def merge(self, other):
+        """Statistics of this column's rows followed by `other`'s."""
+        merged = ColumnStats(self.name, self.numeric, self.rows + other.rows, self.nulls + other.nulls)
+        mins = [v for v in (self.min, other.min) if v is not None]
+        maxs = [v for v in (self.max, other.max) if v is not None]
+        merged.min = min(mins) if mins else None
+        merged.max = max(maxs) if maxs else None
+        merged.sketch = self.sketch.merge(other.sketch)
+        merged.distinct = merged.sketch.count()
+        if self.bounds is None or other.bounds is None:
+            merged.bounds = self.bounds if other.bounds is None else other.bounds
+        else:
+            merged.bounds = _merge_bounds(self.bounds, self.rows - self.nulls,
+                                          other.bounds, other.rows - other.nulls)
+        counts = dict(self.mcv)
+        for value, count in other.mcv.items():
+            counts[value] = counts.get(value, 0) + count
+        merged.mcv = dict(sorted(counts.items(), key=lambda item: -item[1])[:MCV_SIZE])
+        return merged
+
+    # ------------------ Selectivity ------------------
+
+    def _fraction_le(self, x):
+        """Fraction of non-null values <= x, from the histogram."""
+        b = self.bounds
+        if x < b[0]:
+            return 0.0
+        if x >= b[-1]:
+            return 1.0
+        i = int(np.searchsorted(b, x, side='right')) - 1
+        lo, hi = b[i], b[i + 1]
+        within = (x - lo) / (hi - lo) if hi > lo else 1.0
+        return (i + within) / (len(b) - 1)
+
+    def _fraction_eq(self, value):
+        """Fraction of non-null values equal to `value`."""
+        non_null = self.rows - self.nulls
+        if not non_null or self.min is None:
+            return 0.0
+        if self.numeric:
+            if isinstance(value, str) or value < self.min or value > self.max:
+                return 0.0
+            # A value repeated across bucket bounds is at least that heavy
+            repeated = np.count_nonzero(self.bounds == value)
+            return max(1.0 / max(self.distinct, 1), (repeated - 1) / BUCKETS if repeated > 1 else 0.0)
+        if value in self.mcv:
+            return self.mcv[value] / non_null
+        rest = non_null - sum(self.mcv.values())
+        others = self.distinct - len(self.mcv)
+        return rest / non_null / others if rest > 0 and others > 0 else 0.0
+
+    def selectivity(self, op, value):
+        """Estimated fraction of all rows satisfying `column op value`, or None if unknown."""
+        if not self.rows:
+            return None
+        non_null = (self.rows - self.nulls) / self.rows
+        if op == '=':
+            return non_null * self._fraction_eq(value)
+        if op == '!=':
+            return non_null * (1.0 - self._fraction_eq(value))
+        if op == 'IN':
+            return min(1.0, non_null * sum(self._fraction_eq(item) for item in set(value)))
+        if not self.numeric or self.bounds is None:
+            return None
+        values = value if op == 'BETWEEN' else (value,)
+        if any(isinstance(item, str) for item in values):
+            return None
+        if op == 'BETWEEN':
+            low, high = value
+            if high < low:
+                return 0.0
+            return non_null * max(0.0, self._fraction_le(high) - self._fraction_le(low) + self._fraction_eq(low))
+        le = self._fraction_le(value)
+        lt = max(0.0, le - self._fraction_eq(value))
+        fraction = {'<=': le, '<': lt, '>': 1.0 - le, '>=': 1.0 - lt}.get(op)
+        return None if fraction is None else non_null * fraction
+
+def _plain(value):
+    """`value` as a JSON-serializable Python scalar."""
+    return value.item() if isinstance(value, np.generic) else value
+
+# ------------------ Tables ------------------
+
+def _probe_positions(rows):
+    return np.unique(np.linspace(0, rows - 1, min(rows, PROBES)).astype(np.intp)) if rows else np.empty(0, np.intp)
+
+
+def _probe_hash(frame, rows):
+    sample = frame.iloc[_probe_positions(rows)]
+    return int(pd.util.hash_pandas_object(sample, index=False).sum())
+
+
+class TableStats:
+    def __init__(self, columns, rows, probe):
+        self.columns = columns
+        self.rows = rows
+        self.probe = probe  # hash of the probe rows, to recognize appends
+
+    def get(self, column):
+        return self.columns.get(column)
+
+    def leaf_selectivity(self, condition):
+        """Estimated selectivity of a ('CONDITION', col, op, value) leaf, or None."""
+        _, column, op, value = condition
+        stats = self.columns.get(column)
+        return None if stats is None else stats.selectivity(op, value)
+
+    def to_dict(self):
+        return {"rows": self.rows, "probe": self.probe,
+                "columns": [stats.to_dict() for stats in self.columns.values()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        columns = {item["name"]: ColumnStats.from_dict(item) for item in data["columns"]}
+        return cls(columns, data["rows"], data["probe"])
+
+    def summary(self):
+        """One row per column, as reported by ANALYZE."""
+        return pd.DataFrame([
+            {"column": s.name, "rows": s.rows, "nulls": s.nulls, "distinct": s.distinct,
+             "min": s.min, "max": s.max}
+            for s in self.columns.values()
+        ])
+
+
+def analyze(frame):
+    """Statistics of every column of `frame`, from scratch."""
+    exact = len(frame) <= EXACT_ROWS
+    columns = {name: ColumnStats.build(frame[name], exact) for name in frame.columns}
+    return TableStats(columns, len(frame), _probe_hash(frame, len(frame)))
+
+
+def refresh(stats, frame):
+    """Statistics of `frame`, extending `stats` if `frame` only appended rows to what it covers."""
+    if (stats is None or len(frame) < stats.rows or len(frame) <= EXACT_ROWS
+            or list(frame.columns) != list(stats.columns)
+            or _probe_hash(frame, stats.rows) != stats.probe):
+        return analyze(frame)
+    if len(frame) == stats.rows:
+        return stats
+    appended = analyze(frame.iloc[stats.rows:])
+    columns = {name: stats.columns[name].merge(appended.columns[name]) for name in stats.columns}
+    return TableStats(columns, len(frame), _probe_hash(frame, len(frame)))
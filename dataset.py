@@ -0,0 +1,166 @@
+"""The queryable dataset: a DataFrame plus the structures built when it is loaded."""
+import hashlib
+import io
+import os
+import threading
+import time
+
+import pandas as pd
+
+import column_stats
+from indexes import IndexSet, build_indexes
+from materialized import AggregateStore
+from schema import compact_dtypes
+from storage import ensure_columnar, read_columnar, read_indexes, read_stats
+
+
+class Dataset:
+    def __init__(self, frame, path=None, version=None, index=True, indexes=None):
+        self.path = path
+        self.frame = frame
+        # Identifies the data the frame was built from; result caches key on it
+        self.version = version
+        # Short-lived frames (e.g. streamed chunks) are not worth indexing;
+        # `indexes` passes prebuilt ones (e.g. memory-mapped from storage.py)
+        if indexes is None:
+            indexes = build_indexes(frame) if index else IndexSet()
+        self.indexes = indexes
+        # Materialized GROUP BY state for this file (see materialized.py), if any
+        self.aggregates = None
+        # Column statistics (see column_stats.py), if any
+        self.stats = None
+        # Set by catalog.py: the table's FROM name, its catalog and, when a
+        # statement JOINs other tables, the snapshots of those it resolved
+        self.name = None
+        self.catalog = None
+        self.joined = {}
+
+    def __len__(self):
+        return len(self.frame)
+
+
+def file_signature(path):
+    """Cheap change detector for `path`: (mtime_ns, size)."""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def load_csv_dataset(path="students.csv"):
+    """Parse the CSV text directly into compact dtypes; the version is the content hash."""
+    with open(path, "rb") as f:
+        data = f.read()
+    version = hashlib.sha1(data).hexdigest()[:16]
+    return Dataset(compact_dtypes(pd.read_csv(io.BytesIO(data))), path, version)
+
+
+def load_dataset(path="students.csv", columnar=True):
+    """Load `path`, by default through its memory-mapped columnar copy (see storage.py).
+
+    The columnar copy carries the indexes and statistics too, so they are
+    attached rather than rebuilt.
+    """
+    if not columnar:
+        return load_csv_dataset(path)
+    for _ in range(2):
+        try:
+            manifest = ensure_columnar(path)
+            frame, version = read_columnar(path, manifest)
+            dataset = Dataset(frame, path, version, indexes=read_indexes(path, manifest, frame))
+            dataset.stats = read_stats(path, manifest)
+            return dataset
+        except FileNotFoundError:
+            continue  # a concurrent conversion replaced the current version; retry once
+        except OSError:
+            break  # e.g. read-only data directory: no place for the columnar copy
+    return load_csv_dataset(path)
+
+
+class DatasetSource:
+    """A dataset that reloads itself when its file changes on disk.
+
+    `current()` stats the file (at most once per `check_interval` seconds) and
+    reloads it when mtime or size moved. The version is the content hash, so
+    touching the file without changing it keeps existing cache entries valid.
+    Callbacks registered with `on_reload` receive the new Dataset.
+
+    With `lazy=True` nothing is loaded until the first `current()` call, so
+    code paths that never touch the in-memory table (e.g. streaming) skip it.
+
+    Aggregates declared with `materialize` are refreshed from the appended
+    tail of the file on every reload and attached to the loaded Dataset, as
+    are column statistics (extended from the previous load when rows were
+    only appended, unless the loader supplied them).
+    """
+
+    def __init__(self, path="students.csv", loader=load_dataset, check_interval=0.0, lazy=False):
+        self.path = path
+        self.loader = loader
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._last_check = 0.0
+        self._signature = None
+        self._dataset = None
+        self.aggregates = AggregateStore(path)
+        if not lazy:
+            self.reload()
+
+    def on_reload(self, callback):
+        self._listeners.append(callback)
+
+    def materialize(self, group_col, column):
+        """Maintain GROUP BY `group_col` AVG(`column`) incrementally (see materialized.py)."""
+        self.aggregates.declare(group_col, column)
+        with self._lock:
+            if self._dataset is not None:
+                self._attach_aggregates(self._dataset)
+
+    def _attach_aggregates(self, dataset):
+        try:
+            self.aggregates.refresh(dataset.version)
+        except (OSError, ValueError, KeyError):
+            return  # e.g. a declared column is missing; queries scan as usual
+        dataset.aggregates = self.aggregates
+
+    def current(self):
+        if self._dataset is None:
+            with self._lock:
+                if self._dataset is None:
+                    return self._load(file_signature(self.path))
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return self._dataset
+        self._last_check = now
+        try:
+            signature = file_signature(self.path)
+        except OSError:
+            return self._dataset  # file briefly missing during a replace; keep serving
+        if signature == self._signature:
+            return self._dataset
+        with self._lock:
+            if signature == self._signature:
+                return self._dataset  # another thread already reloaded
+            return self._load(signature)
+
+    def reload(self):
+        """Reload unconditionally."""
+        with self._lock:
+            return self._load(file_signature(self.path))
+
+    def _load(self, signature):
+        dataset = self.loader(self.path)
+        if self.aggregates.declared:
+            self._attach_aggregates(dataset)
+        if dataset.stats is None:
+            previous = self._dataset.stats if self._dataset is not None else None
+            dataset.stats = column_stats.refresh(previous, dataset.frame)
+        changed = self._dataset is not None and dataset.version != self._dataset.version
+        self._dataset, self._signature = dataset, signature
+        if changed:
+            for callback in self._listeners:
+                callback(dataset)
+        return dataset
+
+    @property
+    def version(self):
+        return self.current().version
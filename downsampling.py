@@ -0,0 +1,127 @@
+"""Reduce chart data to a fixed point budget before it is drawn.
+
+Drawing cost grows with the number of points, and past a few hundred bars
+or slices a chart is unreadable anyway, so plots are reduced first:
+
+- LINE: Largest-Triangle-Three-Buckets keeps the first and last points and,
+  from each bucket in between, the point that spans the largest triangle
+  with its neighbours. Peaks and dips survive; flat stretches thin out.
+- BAR: the largest bars (by magnitude) stay in result order, followed by
+  one "other" bar holding the mean of the rest.
+- PIE: the slices past the largest ones (or, within the budget, those under
+  `MIN_SLICE_FRACTION` of the total) are summed into one "other" slice.
+
+Budgets default to `BUDGETS` (overridable with EDSQL_PLOT_POINTS,
+EDSQL_PLOT_BARS and EDSQL_PLOT_SLICES); a budget of 0 disables the reduction.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+BUDGETS = {
+    "LINE": int(os.environ.get("EDSQL_PLOT_POINTS", "1000")),
+    "BAR": int(os.environ.get("EDSQL_PLOT_BARS", "40")),
+    "PIE": int(os.environ.get("EDSQL_PLOT_SLICES", "12")),
+}
+MIN_SLICE_FRACTION = 0.01
+OTHER = "other"
+
+
+def lttb(values, budget):
+    """Positions of at most `budget` points of `values` that preserve the line's shape."""
+    n = len(values)
+    if n <= budget or budget <= 0:
+        return np.arange(n)
+    if budget < 3:
+        return np.linspace(0, n - 1, budget).astype(np.intp)
+    y = np.asarray(values, dtype=np.float64)
+    every = (n - 2) / (budget - 2)
+    # Bucket i covers rows bounds[i]:bounds[i + 1]; the final point is a bucket of its own
+    bounds = np.append((np.arange(budget - 1) * every).astype(np.intp) + 1, n)
+    missing = np.isnan(y)
+    sums = np.add.reduceat(np.where(missing, 0.0, y), bounds[:-1])
+    counts = np.add.reduceat(~missing, bounds[:-1])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts  # NaN for all-missing buckets
+    centers = (bounds[:-1] + bounds[1:] - 1) / 2
+
+    selected = np.empty(budget, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(budget - 2):
+        # Triangle with the previous pick and the average of the next bucket
+        start, end = bounds[i], bounds[i + 1]
+        avg_x, avg_y = centers[i + 1], means[i + 1]
+        area = np.abs((a - avg_x) * (y[start:end] - y[a]) - (a - np.arange(start, end)) * (avg_y - y[a]))
+        area[np.isnan(area)] = -1.0
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def _stride(n, budget):
+    """Evenly spaced positions, for values LTTB cannot measure (e.g. strings)."""
+    return np.unique(np.linspace(0, n - 1, budget).astype(np.intp))
+
+
+def top_bars(labels, values, budget):
+    """(labels, values): the `budget - 1` largest bars in order, then an "other" bar."""
+    if len(values) <= budget or budget <= 1:
+        return labels, values
+    magnitude = np.nan_to_num(np.abs(np.asarray(values, dtype=np.float64)), nan=-1.0)
+    keep = np.zeros(len(values), dtype=bool)
+    keep[np.argsort(-magnitude, kind='stable')[:budget - 1]] = True
+    rest = np.asarray(values, dtype=np.float64)[~keep]
+    other = f"{OTHER} ({len(rest)} more, mean)"
+    return (np.append(np.asarray(labels, dtype=object)[keep], other),
+            np.append(np.asarray(values, dtype=np.float64)[keep], np.nanmean(rest) if (~np.isnan(rest)).any() else np.nan))
+
+
+def collapse_slices(labels, values, budget, min_fraction=MIN_SLICE_FRACTION):
+    """(labels, values) with the slices past the `budget - 1` largest summed into "other".
+
+    Within the budget, slices under `min_fraction` of the total are summed instead.
+    """
+    shares = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    total = shares.sum()
+    if budget > 1 and len(shares) > budget:
+        small = np.zeros(len(shares), dtype=bool)
+        small[np.argsort(-shares, kind='stable')[budget - 1:]] = True
+    else:
+        small = shares < min_fraction * total if total > 0 else np.zeros(len(shares), dtype=bool)
+    if np.count_nonzero(small) < 2:
+        return labels, values  # folding a single slice into "other" only renames it
+    return (np.append(np.asarray(labels, dtype=object)[~small], f"{OTHER} ({np.count_nonzero(small)})"),
+            np.append(shares[~small], shares[small].sum()))
+
+
+def downsample(labels, values, plot_type, budget=None):
+    """(positions, labels, values) of the points to draw for `plot_type`.
+
+    `positions` are the x coordinates: row positions in the full result for
+    LINE (so the kept points keep their spacing), 0..k-1 otherwise.
+    """
+    budget = BUDGETS.get(plot_type, 0) if budget is None else budget
+    if plot_type == "LINE":
+        n = len(values)
+        try:
+            keep = lttb(values, budget)
+        except (TypeError, ValueError):
+            keep = _stride(n, budget) if 0 < budget < n else np.arange(n)
+        if len(keep) < n:
+            labels = np.asarray(labels, dtype=object)[keep]
+            values = np.asarray(values)[keep]
+        return keep, labels, values
+    if plot_type == "BAR":
+        labels, values = top_bars(labels, values, budget)
+    elif plot_type == "PIE":
+        labels, values = collapse_slices(labels, values, budget if budget > 0 else len(values) + 1,
+                                         MIN_SLICE_FRACTION if budget > 0 else 0.0)
+    return np.arange(len(values)), labels, values
+
+
+def downsample_frame(frame, x, y, plot_type, budget=None):
+    """`frame[[x, y]]` reduced by `downsample`, for `DataFrame.plot`."""
+    _, labels, values = downsample(frame[x].to_numpy(), frame[y].to_numpy(), plot_type, budget)
+    return pd.DataFrame({x: labels, y: values})
@@ -1,14 +1,15 @@
 import ply.lex as lex
 import ply.yacc as yacc
 import pandas as pd
-import matplotlib.pyplot as plt
 
 # ------------------ Lexical Analysis ------------------
 tokens = (
     'SELECT', 'FROM', 'WHERE', 'PLOT', 'BAR', 'GRAPH', 'LINE', 'PIE', 'CHART',
     'IDENTIFIER', 'NUMBER', 'STRING', 'COMMA', 'GREATER_THAN', 'LESS_THAN', 'EQUALS','ASTERISK', 'SEMICOLON',
     'LPAREN', 'RPAREN', 'AVG', 'GROUP', 'BY', 'ORDER', 'LIMIT', 'ASC', 'DESC',
-    'CUSTOM_METRIC'
+    'CUSTOM_METRIC', 'SAMPLE', 'PERCENT',
+    'AND', 'OR', 'NOT', 'IN', 'BETWEEN', 'GREATER_EQUAL', 'LESS_EQUAL', 'NOT_EQUALS',
+    'ANALYZE', 'EXPLAIN', 'JOIN', 'ON'
 )
 
 reserved = {
@@ -17,7 +18,9 @@ reserved = {
     'LINE': 'LINE', 'PIE': 'PIE', 'CHART': 'CHART',
     'AVG': 'AVG', 'GROUP': 'GROUP', 'BY': 'BY',
     'ORDER': 'ORDER', 'LIMIT': 'LIMIT', 'ASC': 'ASC', 'DESC': 'DESC',
-    'CUSTOM_METRIC': 'CUSTOM_METRIC'
+    'CUSTOM_METRIC': 'CUSTOM_METRIC', 'SAMPLE': 'SAMPLE', 'PERCENT': 'PERCENT',
+    'AND': 'AND', 'OR': 'OR', 'NOT': 'NOT', 'IN': 'IN', 'BETWEEN': 'BETWEEN',
+    'ANALYZE': 'ANALYZE', 'EXPLAIN': 'EXPLAIN', 'JOIN': 'JOIN', 'ON': 'ON'
 }
 
 t_SELECT = r'SELECT'
@@ -37,7 +40,21 @@ t_LIMIT = r'LIMIT'
 t_ASC = r'ASC'
 t_DESC = r'DESC'
 t_CUSTOM_METRIC = r'CUSTOM_METRIC'
+t_SAMPLE = r'SAMPLE'
+t_PERCENT = r'PERCENT'
 t_COMMA = r','
+t_AND = r'AND'
+t_OR = r'OR'
+t_NOT = r'NOT'
+t_IN = r'IN'
+t_BETWEEN = r'BETWEEN'
+t_ANALYZE = r'ANALYZE'
+t_EXPLAIN = r'EXPLAIN'
+t_JOIN = r'JOIN'
+t_ON = r'ON'
+t_GREATER_EQUAL = r'>='
+t_LESS_EQUAL = r'<='
+t_NOT_EQUALS = r'!=|<>'
 t_GREATER_THAN = r'>'
 t_LESS_THAN = r'<'
 t_EQUALS = r'='
@@ -58,11 +75,16 @@ def t_STRING(t):
     return t
 
 def t_NUMBER(t):
-    r'\d+'
-    t.value = int(t.value)
+    r'\d+(\.\d+)?'
+    t.value = float(t.value) if '.' in t.value else int(t.value)
     return t
 
+# Lexing and syntax errors of the parse in progress; query_cache.ParseCache
+# serializes parses and clears this before each one
+errors = []
+
 def t_error(t):
+    errors.append(f"Illegal character: {t.value[0]}")
     print(f"Illegal character: {t.value[0]}")
     t.lexer.skip(1)
 
@@ -70,9 +92,39 @@ lexer = lex.lex()
 
 # ------------------ Parser ------------------
 
+start = 'statement'
+
+def p_statement(p):
+    '''statement : query
+                 | analyze
+                 | explain'''
+    p[0] = p[1]
+
+def p_explain(p):
+    '''explain : EXPLAIN query
+               | EXPLAIN ANALYZE query'''
+    # ('EXPLAIN', analyze, query): ANALYZE runs the query and reports what each step did
+    p[0] = ('EXPLAIN', len(p) == 4, p[len(p) - 1])
+
+def p_analyze(p):
+    '''analyze : ANALYZE SEMICOLON
+               | ANALYZE IDENTIFIER SEMICOLON'''
+    # Rebuilds the column statistics; the table name is optional
+    p[0] = ('ANALYZE', p[2] if len(p) == 4 else None)
+
 def p_query(p):
-    '''query : SELECT select_list FROM IDENTIFIER where_clause group_by_clause plot_clause order_clause limit_clause SEMICOLON'''
-    p[0] = ('QUERY', p[2], p[4], p[5], p[6], p[7], p[8], p[9], p[10])
+    '''query : SELECT select_list FROM IDENTIFIER join_clause where_clause group_by_clause plot_clause order_clause limit_clause sample_clause SEMICOLON'''
+    # SAMPLE and JOIN go last so the positions of the older clauses are unchanged
+    p[0] = ('QUERY', p[2], p[4], p[6], p[7], p[8], p[9], p[10], p[12], p[11], p[5])
+
+def p_join_clause(p):
+    '''join_clause : JOIN IDENTIFIER ON IDENTIFIER EQUALS IDENTIFIER join_clause
+                   | empty'''
+    # A list of ('JOIN', table, left column, right column), or None
+    if len(p) == 8:
+        p[0] = [('JOIN', p[2], p[4], p[6])] + (p[7] or [])
+    else:
+        p[0] = None
 
 def p_select_list(p):
     '''select_list : ASTERISK
@@ -119,12 +171,62 @@ def p_where_clause(p):
                     | empty'''
     p[0] = ('WHERE', p[2]) if len(p) == 3 else None
 
+precedence = (
+    ('left', 'OR'),
+    ('left', 'AND'),
+    ('right', 'NOT'),
+)
+
 def p_condition(p):
-    '''condition : IDENTIFIER GREATER_THAN NUMBER
-                 | IDENTIFIER LESS_THAN NUMBER
-                 | IDENTIFIER EQUALS STRING'''
+    '''condition : condition OR condition
+                 | condition AND condition
+                 | NOT condition
+                 | LPAREN condition RPAREN
+                 | predicate'''
+    if len(p) == 2:
+        p[0] = p[1]
+    elif p[1] == '(':
+        p[0] = p[2]
+    elif len(p) == 3:
+        p[0] = ('NOT', p[2])
+    else:
+        p[0] = (p[2].upper(), p[1], p[3])
+
+def p_predicate(p):
+    '''predicate : IDENTIFIER comparison literal'''
     p[0] = ('CONDITION', p[1], p[2], p[3])
 
+def p_predicate_in(p):
+    '''predicate : IDENTIFIER IN LPAREN literal_list RPAREN
+                 | IDENTIFIER NOT IN LPAREN literal_list RPAREN'''
+    condition = ('CONDITION', p[1], 'IN', tuple(p[len(p) - 2]))
+    p[0] = ('NOT', condition) if len(p) == 7 else condition
+
+def p_predicate_between(p):
+    '''predicate : IDENTIFIER BETWEEN literal AND literal
+                 | IDENTIFIER NOT BETWEEN literal AND literal'''
+    condition = ('CONDITION', p[1], 'BETWEEN', (p[len(p) - 3], p[len(p) - 1]))
+    p[0] = ('NOT', condition) if len(p) == 7 else condition
+
+def p_comparison(p):
+    '''comparison : GREATER_THAN
+                  | LESS_THAN
+                  | EQUALS
+                  | GREATER_EQUAL
+                  | LESS_EQUAL
+                  | NOT_EQUALS'''
+    p[0] = '!=' if p[1] == '<>' else p[1]
+
+def p_literal(p):
+    '''literal : NUMBER
+               | STRING'''
+    p[0] = p[1]
+
+def p_literal_list(p):
+    '''literal_list : literal COMMA literal_list
+                    | literal'''
+    p[0] = [p[1]] + p[3] if len(p) == 4 else [p[1]]
+
 
 def p_group_by_clause(p):
     '''group_by_clause : GROUP BY IDENTIFIER
@@ -152,6 +254,11 @@ def p_limit_clause(p):
     else:
         p[0] = None
 
+def p_sample_clause(p):
+    '''sample_clause : SAMPLE NUMBER PERCENT
+                     | empty'''
+    p[0] = ('SAMPLE', p[2]) if len(p) == 4 else None
+
 def p_plot_clause(p):
     '''plot_clause : PLOT BAR GRAPH
                    | PLOT LINE GRAPH
@@ -164,6 +271,7 @@ def p_empty(p):
     p[0] = None
 
 def p_error(p):
+    errors.append(p)
     if p:
         print(f"Syntax error at token {p.type} ('{p.value}')")
     else:
@@ -0,0 +1,563 @@
+"""Physical execution of `planner` plans over a `dataset.Dataset`.
+
+Shared by the CLI (`main.py`) and the Flask app (`app.py`). The source
+DataFrame is never modified: filters, metrics and sorts directly above the
+Scan work on row positions (from the dataset's secondary indexes or the
+memoized metric columns where one applies, otherwise from a boolean mask)
+and only the surviving rows of the pruned columns are materialized.
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import column_stats
+import parallel
+from catalog import resolve
+from expressions import compare, evaluate, is_leaf, predicate_rank
+from instrumentation import explain, explain_analyze, finish, note, produced, profiling, span, telemetry
+from joins import hash_join, oriented_keys, right_names
+from metric_registry import registry
+from sampling import estimate_means, sample_cache
+
+from planner import (
+    Scan, Join, Filter, Derive, Aggregate, Sort, TopK, Limit, Project, Plot, Values,
+    find_node, plan_query,
+)
+
+
+class QueryError(Exception):
+    """Raised when a plan cannot be executed; the message names the failing clause."""
+
+
+# Above this estimated selectivity, scanning a numeric column beats sorting the
+# positions a range probe returns
+INDEX_MAX_SELECTIVITY = 0.2
+
+# ------------------ Shared work ------------------
+
+_MISSING = object()
+
+class SharedWork:
+    """Intermediate results shared by plans executed against the same dataset.
+
+    Keys name a piece of work (a set of WHERE conditions, a metric column, a
+    GROUP BY key over filtered rows). The first plan that needs it computes it;
+    concurrent plans asking for the same key wait for that result. Values are
+    shared and must not be modified.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key):
+        value = self._values.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+        return value
+
+    def get(self, key, compute):
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                return value
+            key_lock = self._pending.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                value = self._lookup(key)
+            if value is _MISSING:
+                value = compute()
+                with self._lock:
+                    self._values[key] = value
+                    self._pending.pop(key, None)
+                    self.misses += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._values), "hits": self.hits, "misses": self.misses}
+
+# ------------------ Row sources ------------------
+
+def _scan_columns(df, scan):
+    if scan.columns is None:
+        return list(df.columns)
+    return [col for col in df.columns if col in scan.columns]
+
+
+def _row_source(node):
+    """(scan, filters, derives) if `node` is a chain of Filters/Derives ending at the Scan, else None.
+
+    Over the base table, a Derive is a memoized virtual column (see metric_registry),
+    so the whole chain can be answered with row positions.
+    """
+    filters, derives = [], []
+    while isinstance(node, (Filter, Derive)):
+        (filters if isinstance(node, Filter) else derives).append(node)
+        node = node.child
+    if isinstance(node, Scan):
+        return node, filters, derives
+    return None
+
+
+def _derived_columns(derives, ds, shared=None):
+    derived = {}
+    for node in derives:
+        compute = lambda: check_clause(node, lambda: registry.derived(ds, node.name, node.inputs))
+        with span(node, len(ds.frame)) as step:
+            derived[node.name] = compute() if shared is None else shared.get(("metric", node.name, tuple(node.inputs)), compute)
+        step.rows_out = len(ds.frame)
+    return derived
+
+
+def _where_key(filters, derives):
+    """Order-independent identity of a set of WHERE conditions (metric bindings included)."""
+    bindings = {node.name: node.inputs for node in derives}
+    return tuple(sorted(
+        repr((node.condition, [bindings.get(column) for column in node.columns])) for node in filters
+    ))
+
+
+def _filter_positions(filters, derived, ds, shared=None, derives=()):
+    """Row positions of the base table passing every filter, or None for all rows.
+
+    With `shared`, positions for the same set of conditions are computed once.
+    """
+    if shared is None or not filters:
+        return _match_positions(filters, derived, ds)
+    key = ("where", _where_key(filters, derives))
+    return shared.get(key, lambda: _match_positions(filters, derived, ds))
+
+
+def _derived_index(derived):
+    def index(column):
+        return derived[column].index if column in derived else None
+    return index
+
+
+def _condition_mask(node, ds, derived, positions):
+    """Mask of `node.condition` over the rows at `positions` (None for all rows)."""
+    df = ds.frame
+    if is_leaf(node.condition):
+        _, column, op, value = node.condition
+        if column in derived:
+            values = derived[column].values
+            values = values if positions is None else values[positions]
+        else:
+            values = df[column] if positions is None else df[column].iloc[positions]
+        return compare(values, op, value)
+    # Only the columns the condition reads, restricted to the surviving rows
+    base = [col for col in node.columns if col not in derived]
+    if positions is None:
+        frame = df[base]
+    else:
+        frame = df.iloc[positions, df.columns.get_indexer(base)]
+    extra = [col for col in node.columns if col in derived]
+    if extra:
+        frame = frame.copy(deep=False)
+        for column in extra:
+            values = derived[column].values
+            frame[column] = values if positions is None else values[positions]
+    return evaluate(frame, node.condition)
+
+
+def _worth_probing(condition, stats, positions, n_rows):
+    """Whether an index probe should answer `condition` rather than a scan.
+
+    Without statistics every index is used. With them, numeric range probes
+    are skipped when they would return a large share of the table, and any
+    probe is skipped when it would return far more rows than already survive.
+    """
+    if stats is None or not is_leaf(condition):
+        return True
+    column = stats.get(condition[1])
+    selectivity = stats.leaf_selectivity(condition)
+    if column is None or selectivity is None:
+        return True
+    if positions is not None and selectivity * n_rows > 4 * len(positions):
+        return False
+    return not column.numeric or selectivity <= INDEX_MAX_SELECTIVITY
+
+
+def _match_positions(filters, derived, ds):
+    """`_filter_positions` without sharing.
+
+    Conjuncts are taken cheapest and most selective first (estimated from the
+    dataset's column statistics when it has them). Index lookups (on base
+    columns or derived metric columns) run first; the remaining conjuncts are
+    then evaluated in that order, each only on the rows the previous ones let
+    through.
+    """
+    stats = ds.stats
+    estimate = stats.leaf_selectivity if stats is not None else None
+    filters = sorted(filters, key=lambda node: predicate_rank(node.condition, estimate))
+    n_rows = len(ds.frame)
+    positions = None
+    pending = []
+    for node in filters:
+        rows_in = n_rows if positions is None else len(positions)
+        with span(node) as step:
+            found = None
+            if _worth_probing(node.condition, stats, positions, n_rows):
+                found = ds.indexes.lookup(node.condition, _derived_index(derived))
+            if found is None:
+                pending.append(node)
+            elif positions is None:
+                positions = found
+            else:
+                positions = np.intersect1d(positions, found, assume_unique=True)
+        if found is not None:
+            step.rows_in, step.rows_out, step.detail = rows_in, len(positions), "index"
+
+    runner = parallel.parallel_executor
+    if (pending and positions is None and runner is not None and runner.applies(ds)
+            and not any(column in derived for node in pending for column in node.columns)):
+        with span(pending[0], n_rows) as step:
+            found = runner.filter_positions(ds, [node.condition for node in pending])
+        if found is not None:
+            step.rows_out, step.detail = len(found), f"parallel, {len(pending)} conjuncts"
+            return found
+
+    for node in pending:
+        with span(node, n_rows if positions is None else len(positions)) as step:
+            mask = check_clause(node, lambda: _condition_mask(node, ds, derived, positions))
+            mask = np.asarray(mask, dtype=bool)
+            positions = np.flatnonzero(mask) if positions is None else positions[mask]
+        step.rows_out, step.detail = len(positions), "scan"
+    return positions
+
+
+def _take(ds, scan, positions, derived=None):
+    df = ds.frame
+    columns = _scan_columns(df, scan)
+    if positions is None:
+        frame = df[columns]
+    else:
+        frame = df.iloc[positions, df.columns.get_indexer(columns)]
+    if derived:
+        # The shallow copy detaches the frame from df before adding derived columns
+        frame = frame.copy(deep=False)
+        for name, column in derived.items():
+            frame[name] = column.values if positions is None else column.values[positions]
+    return frame
+
+
+def _source_rows(source, ds, order_by=None, shared=None):
+    """Materialize a row source, optionally ordered by `order_by` = (column, ascending, k)."""
+    scan, filters, derives = source
+    derived = _derived_columns(derives, ds, shared)
+    positions = _filter_positions(filters, derived, ds, shared, derives)
+    produced(scan, len(ds.frame) if positions is None else len(positions))
+    if order_by is not None:
+        column, ascending, k = order_by
+        if column in derived:
+            index = derived[column].index
+        else:
+            index = ds.indexes.sorted_index(column)
+        if index is None:
+            return None
+        positions = index.ordered(ascending, positions, len(ds.frame))
+        if k is not None:
+            positions = positions[:k]
+    with span(scan, len(ds.frame)) as step:
+        frame = _take(ds, scan, positions, derived)
+    step.rows_out = len(frame)
+    return frame
+
+# ------------------ Operators ------------------
+
+def _exec_scan(node, ds, shared=None):
+    return _take(ds, node, None)
+
+
+def _exec_values(node, ds, shared=None):
+    return node.frame
+
+
+def _joined_table(ds, name):
+    table = ds.joined.get(name)
+    if table is None and ds.catalog is not None:
+        table = ds.catalog.table(name)
+    if table is None:
+        raise KeyError(f"Unknown table: {name}")
+    return table
+
+
+def _join_schema(node, ds):
+    """Every column name the rows below Join `node` have, before column pruning."""
+    if not isinstance(node.child, Join):
+        return list(ds.frame.columns)
+    child = node.child
+    left = _join_schema(child, ds)
+    right = _joined_table(ds, child.table).frame.columns
+    left_key, right_key = oriented_keys(left, right, child.left_key, child.right_key)
+    return left + list(right_names(left, right, left_key, right_key, child.table).values())
+
+
+def _exec_join(node, ds, shared=None):
+    left = _execute(node.child, ds, shared)
+    right = check_clause(node, lambda: _joined_table(ds, node.table)).frame
+    schema = _join_schema(node, ds)
+    note(node, f"build on {node.table if len(right) <= len(left) else 'left'}")
+    return check_clause(node, lambda: hash_join(left, right, node.left_key, node.right_key, node.table,
+                                                node.columns, schema))
+
+
+def _exec_filter(node, ds, shared=None):
+    source = _row_source(node)
+    if source:
+        return _source_rows(source, ds, shared=shared)
+
+    frame = _execute(node.child, ds, shared)
+    return check_clause(node, lambda: frame[evaluate(frame, node.condition)])
+
+
+def _indexed_order(node, ds, k=None, shared=None):
+    """Ordered base-table rows for a Sort/TopK straight over a row source, using a sorted index."""
+    source = _row_source(node.child)
+    if not source:
+        return None
+    result = _source_rows(source, ds, order_by=(node.column, node.ascending, k), shared=shared)
+    if result is not None:
+        note(node, "sorted index")
+    return result
+
+
+def _exec_derive(node, ds, shared=None):
+    source = _row_source(node)
+    if source:
+        return _source_rows(source, ds, shared=shared)
+
+    frame = _execute(node.child, ds, shared)
+    frame = frame.copy(deep=False)
+    frame[node.name] = check_clause(node, lambda: registry.evaluate(frame, node.name, node.inputs))
+    return frame
+
+
+def _exec_aggregate(node, ds, shared=None):
+    if node.confidence:
+        # Over a sample: the estimate comes with its confidence interval
+        frame = _execute(node.child, ds, shared)
+        scan = find_node(node, Scan)
+        return check_clause(node, lambda: estimate_means(
+            frame, node.group_col, node.column, scan.sample / 100, node.confidence))
+    source = _row_source(node.child)
+    if source and not source[1] and not source[2] and ds is not None and ds.aggregates is not None:
+        # Whole-table GROUP BY maintained incrementally (see materialized.py)
+        result = ds.aggregates.answer(node.group_col, node.column, ds.version)
+        if result is not None:
+            note(node, "materialized")
+            return result
+    runner = parallel.parallel_executor
+    if source and not source[2] and runner is not None and runner.applies(ds):
+        conditions = [f.condition for f in source[1]]
+        result = runner.aggregate(ds, conditions, node.group_col, node.column)
+        if result is not None:
+            note(node, "parallel")
+            return result
+    if source and shared is not None:
+        result = _shared_aggregate(node, source, ds, shared)
+        if result is not None:
+            note(node, "shared group codes")
+            return result
+
+    frame = _execute(node.child, ds, shared)
+    return check_clause(
+        node, lambda: frame.groupby(node.group_col, observed=True)[node.column].mean().reset_index()
+    )
+
+
+def _shared_aggregate(node, source, ds, shared):
+    """GROUP BY AVG over a row source, with the group codes of (WHERE, key) shared.
+
+    Returns None (use the regular path) for columns it does not handle.
+    """
+    scan, filters, derives = source
+    derived = _derived_columns(derives, ds, shared)
+    positions = _filter_positions(filters, derived, ds, shared, derives)
+
+    def rows(column):
+        if column in derived:
+            values = derived[column].values
+        elif column in ds.frame.columns:
+            values = ds.frame[column].to_numpy()
+        else:
+            return None
+        return values if positions is None else values[positions]
+
+    values = rows(node.column)
+    if values is None or values.dtype.kind not in 'iuf':
+        return None
+    if node.group_col not in derived and node.group_col not in ds.frame.columns:
+        return None
+
+    def group_codes():
+        column = ds.frame[node.group_col] if node.group_col not in derived else None
+        if (column is not None and isinstance(column.dtype, pd.CategoricalDtype)
+                and column.cat.categories.is_monotonic_increasing):
+            # Already dictionary encoded with sorted categories (see schema.py): group on the codes
+            codes = np.asarray(column.cat.codes)
+            return (codes if positions is None else codes[positions]), np.asarray(column.cat.categories)
+        return pd.factorize(rows(node.group_col), sort=True)
+
+    bindings = {d.name: tuple(d.inputs) for d in derives}
+    key = ("group", _where_key(filters, derives), node.group_col, bindings.get(node.group_col))
+    codes, uniques = shared.get(key, group_codes)
+    # Missing keys (code -1) are dropped, like groupby; the mean itself is pandas'
+    keep = codes >= 0
+    means = pd.Series(values[keep]).groupby(codes[keep]).mean()
+    return pd.DataFrame({
+        node.group_col: np.asarray(uniques)[means.index.to_numpy()],
+        node.column: means.to_numpy(),
+    })
+
+
+def _exec_sort(node, ds, shared=None):
+    result = _indexed_order(node, ds, shared=shared)
+    if result is not None:
+        return result
+    frame = _execute(node.child, ds, shared)
+    # Stable, so ties keep row order as on the indexed path (see indexes.SortedIndex.ordered)
+    return check_clause(node, lambda: frame.sort_values(by=node.column, ascending=node.ascending, kind='stable'))
+
+
+def top_k(frame, column, ascending, k):
+    try:
+        if ascending:
+            return frame.nsmallest(k, column)
+        return frame.nlargest(k, column)
+    except TypeError:
+        # nlargest/nsmallest only handle numeric columns
+        return frame.sort_values(by=column, ascending=ascending, kind='stable').head(k)
+
+
+def _exec_top_k(node, ds, shared=None):
+    result = _indexed_order(node, ds, node.k, shared)
+    if result is not None:
+        return result
+    frame = _execute(node.child, ds, shared)
+    return check_clause(node, lambda: top_k(frame, node.column, node.ascending, node.k))
+
+
+def _exec_limit(node, ds, shared=None):
+    return _execute(node.child, ds, shared).head(node.n)
+
+
+def _exec_project(node, ds, shared=None):
+    frame = _execute(node.child, ds, shared)
+    columns = []
+    for col in node.columns:
+        columns.extend(frame.columns if col == '*' else [col])
+    return check_clause(node, lambda: frame[columns])
+
+
+def _exec_plot(node, ds, shared=None):
+    # Rendering is left to the caller (plt.show in the CLI, PNG in the web app)
+    return _execute(node.child, ds, shared)
+
+
+_EXECUTORS = {
+    Scan: _exec_scan,
+    Join: _exec_join,
+    Filter: _exec_filter,
+    Derive: _exec_derive,
+    Aggregate: _exec_aggregate,
+    Sort: _exec_sort,
+    TopK: _exec_top_k,
+    Limit: _exec_limit,
+    Project: _exec_project,
+    Plot: _exec_plot,
+    Values: _exec_values,
+}
+
+
+def check_clause(node, fn):
+    try:
+        return fn()
+    except QueryError:
+        raise
+    except Exception as e:
+        raise QueryError(f"Error in {node.clause} clause: {e}") from e
+
+
+def _execute(node, ds, shared=None):
+    with span(node) as step:
+        frame = _EXECUTORS[type(node)](node, ds, shared)
+    finish(step, frame)
+    return frame
+
+
+def execute_plan(plan, ds, shared=None):
+    """Run `plan` against the dataset `ds` and return the result DataFrame.
+
+    Plans executed with the same `SharedWork` (and dataset) compute common
+    filters, metric columns and group keys once. A plan whose Scan has a
+    SAMPLE runs against the cached sample of `ds` instead (see sampling.py).
+    """
+    scan = find_node(plan, Scan)
+    if scan is not None and scan.sample is not None:
+        if not 0 < scan.sample <= 100:
+            raise QueryError(f"Error in SAMPLE clause: percent must be greater than 0 and at most 100, got {scan.sample}")
+        ds = check_clause(scan, lambda: sample_cache.sample(ds, scan.sample, scan.strata))
+        shared = None  # shared positions and group codes refer to the full table's rows
+    return _execute(plan, ds, shared)
+
+
+def analyze_dataset(ds):
+    """ANALYZE: rebuild the column statistics of `ds` from scratch; returns their summary."""
+    ds.stats = column_stats.analyze(ds.frame)
+    return ds.stats.summary()
+
+
+def explain_query(parsed_query, ds):
+    """EXPLAIN [ANALYZE]: the plan of the wrapped query, optionally run and profiled."""
+    _, analyze, query = parsed_query
+    if not analyze:
+        return explain(plan_query(query), ds)
+    with profiling(memory=True) as profile:
+        with profile.stage("plan"):
+            plan = plan_query(query)
+        with profile.stage("execute"):
+            execute_plan(plan, ds)
+    return explain_analyze(plan, ds, profile)
+
+
+def run_query(parsed_query, ds, cache=None, shared=None):
+    """Plan and execute a parsed query; returns (result, plot_type or None).
+
+    With a `query_cache.ResultCache`, results are reused for as long as the
+    dataset version stays the same. Cached results are shared: do not mutate them.
+    Executions are profiled into `instrumentation.telemetry`.
+    """
+    try:
+        ds = resolve(parsed_query, ds)
+    except KeyError as e:
+        raise QueryError(f"Error in FROM clause: {e}") from e
+    if parsed_query[0] == 'ANALYZE':
+        return analyze_dataset(ds), None
+    if parsed_query[0] == 'EXPLAIN':
+        return explain_query(parsed_query, ds), None
+    if cache is not None and ds.version is not None:
+        hit = cache.get('result', ds.version, parsed_query)
+        if hit is not None:
+            return hit
+    start = time.perf_counter()
+    with profiling() as profile:
+        try:
+            with profile.stage("plan"):
+                plan = plan_query(parsed_query)
+            result = execute_plan(plan, ds, shared)
+        except Exception as e:
+            telemetry.count_error(type(e).__name__)
+            raise
+    telemetry.observe_query(plan, profile, time.perf_counter() - start)
+    plot = find_node(plan, Plot)
+    outcome = result, (plot.kind if plot else None)
+    if cache is not None and ds.version is not None:
+        cache.put('result', ds.version, parsed_query, outcome)
+    return outcome
@@ -0,0 +1,171 @@
+"""WHERE predicates: boolean expression trees over column comparisons.
+
+The parser produces leaves `('CONDITION', column, op, value)` with `op` one of
+`> < = >= <= !=` (value a literal), `IN` (value a tuple of literals) or
+`BETWEEN` (value a `(low, high)` pair, inclusive), combined by `('AND', a, b)`,
+`('OR', a, b)` and `('NOT', a)`.
+
+The planner splits the top-level AND into one Filter per conjunct. A leaf is
+evaluated with a single vectorized comparison; a compound conjunct (OR / NOT
+trees) compiles to one `DataFrame.eval` expression, which numexpr fuses into
+a single pass over the data when it is installed. `eval` cannot order
+unordered categoricals, so leaves on categorical columns are evaluated with
+`compare` first and enter the expression as boolean masks.
+"""
+import numpy as np
+import pandas as pd
+
+COMPARISONS = ('>', '<', '=', '>=', '<=', '!=')
+
+# Rough fraction of rows a leaf keeps, used until the dataset has statistics
+DEFAULT_SELECTIVITY = {
+    '=': 0.1, '!=': 0.9, '>': 1 / 3, '<': 1 / 3, '>=': 1 / 3, '<=': 1 / 3, 'BETWEEN': 0.25,
+}
+
+
+def is_leaf(condition):
+    return condition[0] == 'CONDITION'
+
+
+def leaves(condition):
+    if is_leaf(condition):
+        yield condition
+    else:
+        for child in condition[1:]:
+            yield from leaves(child)
+
+
+def condition_columns(condition):
+    """Columns read by `condition`, in order of first appearance."""
+    return list(dict.fromkeys(leaf[1] for leaf in leaves(condition)))
+
+
+def conjuncts(condition):
+    """The operands of a top-level chain of ANDs."""
+    if condition[0] == 'AND':
+        return conjuncts(condition[1]) + conjuncts(condition[2])
+    return [condition]
+
+
+def format_condition(condition):
+    kind = condition[0]
+    if kind == 'CONDITION':
+        _, column, op, value = condition
+        if op == 'IN':
+            return f"{column} IN ({', '.join(map(repr, value))})"
+        if op == 'BETWEEN':
+            return f"{column} BETWEEN {value[0]!r} AND {value[1]!r}"
+        return f"{column} {op} {value!r}"
+    if kind == 'NOT':
+        return f"NOT ({format_condition(condition[1])})"
+    return f"({format_condition(condition[1])} {kind} {format_condition(condition[2])})"
+
+# ------------------ Evaluation ------------------
+
+def _compare_categorical(values, op, value):
+    """`compare` for a categorical: test each category once, then pick by code."""
+    categorical = values.array if isinstance(values, pd.Series) else values
+    per_code = np.asarray(compare(np.asarray(categorical.categories, dtype=object), op, value), dtype=bool)
+    # Code -1 (missing) picks the trailing entry: only != holds for a missing value
+    per_code = np.append(per_code, op == '!=')
+    return per_code[np.asarray(categorical.codes)]
+
+
+def compare(values, op, value):
+    """Boolean mask of `values` (array or Series) against one leaf's `op` and `value`.
+
+    Categorical columns are compared through their integer codes.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return _compare_categorical(values, op, value)
+    if op == '>':
+        return values > value
+    elif op == '<':
+        return values < value
+    elif op == '=':
+        return values == value
+    elif op == '>=':
+        return values >= value
+    elif op == '<=':
+        return values <= value
+    elif op == '!=':
+        return values != value
+    elif op == 'IN':
+        series = values if isinstance(values, pd.Series) else pd.Series(values, copy=False)
+        return series.isin(value).to_numpy()
+    elif op == 'BETWEEN':
+        low, high = value
+        return (values >= low) & (values <= high)
+    raise ValueError(f"Unsupported operator: {op}")
+
+
+def _eval_source(condition, params, frame):
+    """`DataFrame.eval` text for `condition` over `frame`; literals are bound through `params`."""
+    kind = condition[0]
+    if kind == 'AND' or kind == 'OR':
+        symbol = '&' if kind == 'AND' else '|'
+        left, right = _eval_source(condition[1], params, frame), _eval_source(condition[2], params, frame)
+        return f"({left}) {symbol} ({right})"
+    if kind == 'NOT':
+        return f"~({_eval_source(condition[1], params, frame)})"
+
+    _, column, op, value = condition
+    def bind(literal):
+        name = f"v{len(params)}"
+        params[name] = literal
+        return f"@{name}"
+    if column in frame.columns and isinstance(frame[column].dtype, pd.CategoricalDtype):
+        return bind(np.asarray(compare(frame[column], op, value), dtype=bool))
+    column = f"`{column}`"
+    if op == 'IN':
+        return f"{column} in {bind(list(value))}"
+    if op == 'BETWEEN':
+        return f"({column} >= {bind(value[0])}) & ({column} <= {bind(value[1])})"
+    if op not in COMPARISONS:
+        raise ValueError(f"Unsupported operator: {op}")
+    return f"{column} {'==' if op == '=' else op} {bind(value)}"
+
+
+def evaluate(frame, condition):
+    """Boolean mask of the rows of `frame` satisfying `condition`."""
+    if is_leaf(condition):
+        _, column, op, value = condition
+        return np.asarray(compare(frame[column], op, value), dtype=bool)
+    params = {}
+    source = _eval_source(condition, params, frame)
+    return np.asarray(frame.eval(source, local_dict=params), dtype=bool)
+
+# ------------------ Ordering ------------------
+
+def estimate_selectivity(condition, leaf_estimate=None):
+    """Estimated fraction of rows satisfying `condition`.
+
+    `leaf_estimate(leaf)` may supply a better estimate for a leaf (or None to
+    fall back to the defaults).
+    """
+    kind = condition[0]
+    if kind == 'AND':
+        return estimate_selectivity(condition[1], leaf_estimate) * estimate_selectivity(condition[2], leaf_estimate)
+    if kind == 'OR':
+        a = estimate_selectivity(condition[1], leaf_estimate)
+        b = estimate_selectivity(condition[2], leaf_estimate)
+        return a + b - a * b
+    if kind == 'NOT':
+        return 1.0 - estimate_selectivity(condition[1], leaf_estimate)
+    estimate = leaf_estimate(condition) if leaf_estimate is not None else None
+    if estimate is not None:
+        return estimate
+    _, _, op, value = condition
+    if op == 'IN':
+        return min(1.0, DEFAULT_SELECTIVITY['='] * len(value))
+    return DEFAULT_SELECTIVITY.get(op, 1.0)
+
+
+def predicate_rank(condition, leaf_estimate=None):
+    """Sort key for conjuncts: selective, cheap ones first.
+
+    Classic predicate ordering by (selectivity - 1) / cost, with the number of
+    comparisons as the cost.
+    """
+    cost = sum(1 for _ in leaves(condition))
+    return (estimate_selectivity(condition, leaf_estimate) - 1.0) / cost
@@ -0,0 +1,196 @@
+"""Secondary indexes over the columns of a loaded dataset.
+
+String columns get a `HashIndex` for equality lookups (a `DictionaryIndex`
+when they are dictionary encoded), numeric columns a `SortedIndex` (argsort +
+searchsorted) for range lookups and ordered scans. Lookups return sorted
+arrays of row positions, so their cost scales with the number of matching
+rows rather than with the size of the table.
+
+`SortedIndex` and `DictionaryIndex` are plain arrays, so they can also be
+built once, saved next to the columnar copy and attached through memory maps
+(`from_arrays`, see storage.py) instead of being rebuilt by every process.
+"""
+import numpy as np
+import pandas as pd
+
+
+class HashIndex:
+    def __init__(self, column, values):
+        self.column = column
+        positions = pd.Series(np.arange(len(values)))
+        self.buckets = positions.groupby(np.asarray(values), sort=False).indices
+
+    def lookup(self, op, value):
+        if op == 'IN' and all(isinstance(item, str) for item in value):
+            found = [self.buckets[item] for item in set(value) if item in self.buckets]
+            return np.sort(np.concatenate(found)) if found else np.empty(0, dtype=np.intp)
+        if op != '=' or not isinstance(value, str):
+            return None
+        return self.buckets.get(value, np.empty(0, dtype=np.intp))
+
+
+class DictionaryIndex:
+    """Equality lookups on a dictionary-encoded string column.
+
+    `values` is the sorted dictionary; `order` holds the row positions sorted
+    by code (missing values first) and `offsets[i]:offsets[i + 1]` is the
+    slice of `order` holding the rows of `values[i]`, in row order.
+    """
+
+    def __init__(self, column, values, codes):
+        codes = np.asarray(codes)
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=len(values))
+        offsets = np.concatenate([[len(codes) - int(counts.sum())], counts]).cumsum()
+        self._attach(column, values, order, offsets)
+
+    @classmethod
+    def from_arrays(cls, column, values, order, offsets):
+        index = cls.__new__(cls)
+        index._attach(column, values, order, offsets)
+        return index
+
+    def _attach(self, column, values, order, offsets):
+        self.column = column
+        self.values = np.asarray(values, dtype=object)
+        self.order = order
+        self.offsets = offsets
+
+    def _rows(self, value):
+        i = int(np.searchsorted(self.values, value))
+        if i < len(self.values) and self.values[i] == value:
+            return self.order[self.offsets[i]:self.offsets[i + 1]]
+        return np.empty(0, dtype=self.order.dtype)
+
+    def lookup(self, op, value):
+        if op == 'IN' and all(isinstance(item, str) for item in value):
+            found = [self._rows(item) for item in set(value)]
+            return np.sort(np.concatenate(found)) if found else np.empty(0, dtype=np.intp)
+        if op != '=' or not isinstance(value, str):
+            return None
+        return self._rows(value)
+
+
+class SortedIndex:
+    def __init__(self, column, values):
+        values = np.asarray(values)
+        # NaNs sort to the end; they never satisfy a comparison
+        order = np.argsort(values, kind='stable')
+        self._attach(column, order, values[order], len(values) - int(pd.isna(values).sum()))
+
+    @classmethod
+    def from_arrays(cls, column, order, sorted_values, n_valid):
+        index = cls.__new__(cls)
+        index._attach(column, order, sorted_values, n_valid)
+        return index
+
+    def _attach(self, column, order, sorted_values, n_valid):
+        self.column = column
+        self.order = order
+        self.sorted_values = sorted_values
+        self.n_valid = n_valid
+        self._descending = None
+
+    def _range(self, op, value):
+        """(lo, hi) such that sorted positions lo:hi satisfy `op value`, or None."""
+        valid = self.sorted_values[:self.n_valid]
+        if op == '>':
+            return np.searchsorted(valid, value, side='right'), self.n_valid
+        elif op == '>=':
+            return np.searchsorted(valid, value, side='left'), self.n_valid
+        elif op == '<':
+            return 0, np.searchsorted(valid, value, side='left')
+        elif op == '<=':
+            return 0, np.searchsorted(valid, value, side='right')
+        elif op == '=':
+            return np.searchsorted(valid, value, side='left'), np.searchsorted(valid, value, side='right')
+        elif op == 'BETWEEN':
+            low, high = value
+            return np.searchsorted(valid, low, side='left'), np.searchsorted(valid, high, side='right')
+        return None
+
+    def lookup(self, op, value):
+        values = value if op in ('IN', 'BETWEEN') else (value,)
+        if any(isinstance(item, str) for item in values):
+            return None
+        if op == 'IN':
+            found = [self.lookup('=', item) for item in set(value)]
+            return np.sort(np.concatenate(found)) if found else np.empty(0, dtype=np.intp)
+        bounds = self._range(op, value)
+        if bounds is None:
+            return None
+        lo, hi = bounds
+        return np.sort(self.order[lo:max(lo, hi)])
+
+    def descending(self):
+        """Valid row positions by descending value; equal values keep their row order."""
+        if self._descending is None:
+            valid = self.order[:self.n_valid]
+            values = self.sorted_values[:self.n_valid]
+            # Rank of each distinct value; ties share a rank (avoids negating unsigned data)
+            ranks = np.cumsum(np.r_[False, values[1:] != values[:-1]])
+            self._descending = valid[np.lexsort((valid, -ranks))]
+        return self._descending
+
+    def ordered(self, ascending=True, positions=None, n_rows=None):
+        """Row positions in sort order, optionally restricted to `positions`.
+
+        NaNs come last in both directions, like `DataFrame.sort_values`.
+        """
+        valid = self.order[:self.n_valid] if ascending else self.descending()
+        order = np.concatenate([valid, self.order[self.n_valid:]])
+        if positions is None:
+            return order
+        keep = np.zeros(n_rows if n_rows is not None else len(order), dtype=bool)
+        keep[positions] = True
+        return order[keep[order]]
+
+
+class IndexSet:
+    def __init__(self, indexes=None):
+        self.indexes = indexes or {}
+
+    def get(self, column):
+        return self.indexes.get(column)
+
+    def lookup(self, condition, extra=None):
+        """Row positions satisfying ('CONDITION', col, op, value), or None if no index applies.
+
+        Compound conditions are left to the evaluator: uniting the positions of
+        broad OR operands costs more than testing the surviving rows.
+        `extra(column)` may supply indexes for columns outside the set (e.g.
+        derived metric columns).
+        """
+        if condition[0] != 'CONDITION':
+            return None
+        _, column, op, value = condition
+        index = extra(column) if extra is not None else None
+        if index is None:
+            index = self.indexes.get(column)
+        if index is None:
+            return None
+        return index.lookup(op, value)
+
+    def sorted_index(self, column):
+        index = self.indexes.get(column)
+        return index if isinstance(index, SortedIndex) else None
+
+    def __contains__(self, column):
+        return column in self.indexes
+
+
+def build_indexes(df):
+    indexes = {}
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categorical = series.array
+            if categorical.categories.is_monotonic_increasing:
+                indexes[column] = DictionaryIndex(column, categorical.categories, categorical.codes)
+            else:
+                indexes[column] = HashIndex(column, series.to_numpy())
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            indexes[column] = SortedIndex(column, series.to_numpy())
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            indexes[column] = HashIndex(column, series.to_numpy())
+    return IndexSet(indexes)
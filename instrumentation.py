@@ -0,0 +1,353 @@
+"""Per-step execution profiles, EXPLAIN output and Prometheus metrics.
+
+Every query runs under a `Profile`. The executor opens a `span` around each
+plan operator it runs (and around the steps of a fused row source: metric
+columns, each WHERE conjunct, the final take), recording rows in and out and
+wall time exclusive of nested spans. Outside EXPLAIN ANALYZE that costs a
+few clock reads per operator, so it is always on. After each query the
+times are added to latency histograms per stage (parse, plan, each operator
+type, render) and per query shape, which `/metrics` serves in the
+Prometheus text format. Each process keeps its own histograms, so scrape
+every worker.
+
+EXPLAIN ANALYZE also traces allocations (`tracemalloc`) to report the peak
+memory of each step. Plain EXPLAIN runs nothing. It prints the plan with
+row estimates from the column statistics (see column_stats.py).
+"""
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+from expressions import estimate_selectivity
+
+_local = threading.local()
+
+# ------------------ Profiles ------------------
+
+class Step:
+    """What one plan operator did during a query (summed if it ran more than once)."""
+
+    __slots__ = ("node", "seconds", "rows_in", "rows_out", "peak_bytes", "detail")
+
+    def __init__(self, node):
+        self.node = node
+        self.seconds = 0.0
+        self.rows_in = None
+        self.rows_out = None
+        self.peak_bytes = None
+        self.detail = None
+
+
+class Profile:
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.steps = {}  # id(node) -> Step
+        self.stages = {}  # stage name -> seconds
+        self.outputs = {}  # id(node) -> rows handed to the node's parent
+        self._stack = []  # [seconds spent in nested spans, peak bytes seen in them] per open span
+
+    def step(self, node):
+        step = self.steps.get(id(node))
+        if step is None:
+            step = self.steps[id(node)] = Step(node)
+        return step
+
+    @contextmanager
+    def span(self, node, rows_in=None):
+        step = self.step(node)
+        if rows_in is not None and step.rows_in is None:
+            step.rows_in = rows_in
+        if self.memory:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        frame = [0.0, 0]
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield step
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            step.seconds += elapsed - frame[0]
+            peak = None
+            if self.memory:
+                peak = max(tracemalloc.get_traced_memory()[1], frame[1])
+                step.peak_bytes = max(step.peak_bytes or 0, peak - base)
+            if self._stack:
+                parent = self._stack[-1]
+                parent[0] += elapsed
+                if peak is not None:
+                    parent[1] = max(parent[1], peak)
+
+    @contextmanager
+    def stage(self, name):
+        """Time a phase that is not a plan operator (e.g. planning)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+
+class _Idle:
+    """Stand-in for a Step when no profile is active: reads give None, writes are dropped."""
+
+    node = seconds = rows_in = rows_out = peak_bytes = detail = None
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_IDLE = _Idle()
+
+
+@contextmanager
+def _no_span():
+    yield _IDLE
+
+
+def current():
+    return getattr(_local, "profile", None)
+
+
+def span(node, rows_in=None):
+    """Context manager timing `node` in the active profile; yields its Step."""
+    profile = current()
+    if profile is None:
+        return _no_span()
+    return profile.span(node, rows_in)
+
+
+def note(node, detail):
+    """Say how `node` was executed (e.g. "index"), if a profile is active."""
+    profile = current()
+    if profile is not None:
+        profile.step(node).detail = detail
+
+
+def produced(node, rows):
+    """Record that `node` handed `rows` rows to its parent, if a profile is active."""
+    profile = current()
+    if profile is not None:
+        profile.outputs[id(node)] = rows
+
+
+def finish(step, frame):
+    """Record the rows `step` produced and took in (from the nearest descendant that produced any)."""
+    profile = current()
+    if profile is None:
+        return
+    if step.rows_out is None:
+        step.rows_out = len(frame)
+    profile.outputs[id(step.node)] = len(frame)
+    if step.rows_in is None:
+        # Filters and Derives fused into a row source report on their own; their input is the Scan's
+        for node in _chain(step.node.child):
+            if id(node) in profile.outputs:
+                step.rows_in = profile.outputs[id(node)]
+                break
+
+
+@contextmanager
+def profiling(memory=False):
+    """Run the enclosed query under a new Profile (nested calls share the outer one)."""
+    outer = current()
+    if outer is not None:
+        yield outer
+        return
+    profile = Profile(memory)
+    tracing = memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    _local.profile = profile
+    try:
+        yield profile
+    finally:
+        _local.profile = None
+        if tracing:
+            tracemalloc.stop()
+
+# ------------------ EXPLAIN ------------------
+
+def _chain(plan):
+    node = plan
+    while node is not None:
+        yield node
+        node = node.child
+
+
+def query_shape(plan):
+    """Operator types from the root down, e.g. "Project<Filter<Scan": a low-cardinality label."""
+    return "<".join(type(node).__name__ for node in _chain(plan))
+
+
+def estimate_rows(plan, ds):
+    """Estimated output rows of every node of `plan`, by id(node)."""
+    # Not at module level: planner imports query_cache (through metric_registry), which imports this
+    from planner import Aggregate, Filter, Join, Limit, Scan, TopK, Values
+
+    stats = getattr(ds, "stats", None)
+    leaf_estimate = stats.leaf_selectivity if stats is not None else None
+    estimates = {}
+    rows = None
+    for node in reversed(list(_chain(plan))):
+        if isinstance(node, Scan):
+            rows = len(ds)
+            if node.sample is not None:
+                rows = rows * node.sample / 100
+        elif isinstance(node, Values):
+            rows = len(node.frame)
+        elif isinstance(node, Join):
+            rows = _join_rows(rows, node, ds)
+        elif isinstance(node, Filter):
+            rows = rows * estimate_selectivity(node.condition, leaf_estimate)
+        elif isinstance(node, Aggregate):
+            column = stats.get(node.group_col) if stats is not None else None
+            groups = column.distinct if column is not None else rows
+            rows = min(rows, groups)
+        elif isinstance(node, Limit):
+            rows = min(rows, node.n)
+        elif isinstance(node, TopK):
+            rows = min(rows, node.k)
+        estimates[id(node)] = int(round(rows))
+    return estimates
+
+
+def _join_rows(rows, node, ds):
+    """Estimated rows of an equi-join: |L| * |R| / max(distinct keys), from both tables' statistics."""
+    right = getattr(ds, "joined", {}).get(node.table)
+    if right is None:
+        return rows
+    distinct = []
+    for table, key in ((ds, node.left_key), (right, node.right_key)):
+        column = table.stats.get(key) if table.stats is not None else None
+        if column is not None and column.distinct:
+            distinct.append(column.distinct)
+    if not distinct:
+        return max(rows, len(right))
+    return rows * len(right) / max(distinct)
+
+
+def _step_labels(plan):
+    """(node, indented description) per operator, as `planner.format_plan` lays them out."""
+    return [(node, "  " * depth + node.describe()) for depth, node in enumerate(_chain(plan))]
+
+
+def explain(plan, ds):
+    """EXPLAIN: the plan, one row per operator, with estimated output rows."""
+    estimates = estimate_rows(plan, ds)
+    return pd.DataFrame(
+        [{"step": label, "est_rows": estimates[id(node)]} for node, label in _step_labels(plan)])
+
+
+def explain_analyze(plan, ds, profile):
+    """EXPLAIN ANALYZE: the plan with what each operator did in `profile`.
+
+    Operators that ran inside another one (e.g. a Filter answered with the
+    Scan's row positions) report their own share; blank cells mean the step
+    ran as part of its parent and has no separate figure.
+    """
+    estimates = estimate_rows(plan, ds)
+    rows = []
+    for node, label in _step_labels(plan):
+        step = profile.steps.get(id(node))
+        rows.append({
+            "step": label,
+            "est_rows": estimates[id(node)],
+            "rows_in": step.rows_in if step else None,
+            "rows_out": step.rows_out if step else None,
+            "time_ms": round(step.seconds * 1000, 3) if step else None,
+            "peak_kib": round(step.peak_bytes / 1024, 1) if step and step.peak_bytes is not None else None,
+            "detail": (step.detail or "") if step else "",
+        })
+    for name, seconds in profile.stages.items():
+        rows.append({"step": f"[{name}]", "time_ms": round(seconds * 1000, 3)})
+    frame = pd.DataFrame(rows, columns=["step", "est_rows", "rows_in", "rows_out", "time_ms", "peak_kib", "detail"])
+    for column in ("est_rows", "rows_in", "rows_out"):
+        frame[column] = frame[column].astype("Int64")
+    return frame.fillna({"detail": ""})
+
+# ------------------ Prometheus metrics ------------------
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, name, help_text, label, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}  # label value -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, seconds):
+        with self._lock:
+            series = self._series.get(value)
+            if series is None:
+                series = self._series[value] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += seconds
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {value: list(counts) for value, counts in self._series.items()}
+        for value, counts in sorted(series.items()):
+            label = f'{self.label}="{_escape(value)}"'
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {counts[-1]}')
+            lines.append(f"{self.name}_sum{{{label}}} {counts[-2]}")
+            lines.append(f"{self.name}_count{{{label}}} {counts[-1]}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Telemetry:
+    def __init__(self):
+        self.stages = Histogram("edsql_stage_seconds", "Wall time per execution stage.", "stage")
+        self.queries = Histogram("edsql_query_seconds", "Wall time per query, by plan shape.", "shape")
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def observe_stage(self, stage, seconds):
+        self.stages.observe(stage, seconds)
+
+    def observe_query(self, plan, profile, seconds):
+        """Add a finished query's profile to the histograms."""
+        by_type = {}
+        for step in profile.steps.values():
+            name = type(step.node).__name__
+            by_type[name] = by_type.get(name, 0.0) + step.seconds
+        for stage, stage_seconds in list(by_type.items()) + list(profile.stages.items()):
+            self.stages.observe(stage, stage_seconds)
+        self.queries.observe(query_shape(plan), seconds)
+
+    def count_error(self, kind):
+        with self._lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = [self.stages.render(), self.queries.render(),
+                 "# HELP edsql_query_errors_total Queries that failed, by error type.",
+                 "# TYPE edsql_query_errors_total counter"]
+        with self._lock:
+            errors = dict(self.errors)
+        for kind, count in sorted(errors.items()):
+            lines.append(f'edsql_query_errors_total{{type="{_escape(kind)}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+telemetry = Telemetry()
@@ -1,177 +1,117 @@
-from edsql_compiler import parser
+import sys
+from query_cache import is_edsql, parse_query, result_cache
+from executor import run_query, QueryError
+from catalog import Catalog, statement_table
+from metric_registry import registry as metrics
+from sampling import sample_cache
+from streaming import stream_query
+from batch import run_batch, load_script
+from downsampling import downsample, downsample_frame
+from pagination import EXPORT_FORMATS, export_chunks
 import pandas as pd
-import matplotlib.pyplot as plt
-import spacy
-from intent_classifier import classify_intent
-from matcher_utils import extract_entities
-from convert_to_edsql import convert_entities_to_edsql
-
-# Load NLP model and dataset
-nlp = spacy.load("en_core_web_sm")
-df = pd.read_csv("students.csv")
-
-import google.generativeai as genai
-
-# Setup Gemini with your API key
-genai.configure(api_key="API_KEY")
-
-model = genai.GenerativeModel("gemini-2.0-flash")
-
-def ask_gemini(nl_query):
-    prompt = f"""
-You are an expert in converting natural language to a custom SQL-like language called EDSQL.
-EDSQL has these rules:
-
-- SELECT ... FROM students;
-- SELECT name, grades FROM students WHERE grades > 80;
-- SELECT AVG(grades) FROM students GROUP BY class;
-- SELECT name, grades FROM students ORDER BY grades DESC LIMIT 5;
-- SELECT class FROM students PLOT PIE CHART;
-- SELECT name, grades FROM students PLOT BAR GRAPH;
-- SELECT PERFORMANCE_SCORE(grades, attendance) FROM students;
-
-Now convert the following natural language query to EDSQL:
-
-"{nl_query}"
-
-Only return the EDSQL code. No explanation.
-Only return valid EDSQL syntax without using '*'. List all columns explicitly. No explanation.
-
-"""
-
-    try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
-    except Exception as e:
-        print("Gemini fallback failed:", e)
-        return None
-
-
-def compute_custom_metric(df, metric_name):
-    if metric_name == 'PERFORMANCE_SCORE':
-        if 'grades' in df.columns and 'attendance' in df.columns:
-            return 0.6 * df['grades'] + 0.4 * df['attendance']
-        else:
-            raise KeyError("Missing 'grades' or 'attendance' for PERFORMANCE_SCORE")
-    raise KeyError(f"Unknown custom metric: {metric_name}")
+# The Gemini client is loaded on first use (see nlp_models.py)
+from nlp_models import get_gemini_model
+from translation import CachingTranslator, IntentTranslator, GeminiTranslator, TranslationCache
+
+# Tables named in FROM/JOIN are files in the data directory, loaded on first use
+catalog = Catalog(paths={"students": "students.csv"})
+catalog.on_reload(lambda ds: result_cache.invalidate(catalog.versions()))
+catalog.on_reload(lambda ds: metrics.invalidate(catalog.versions()))
+catalog.on_reload(lambda ds: sample_cache.invalidate(catalog.versions()))
+catalog.materialize("students", "class", "grades")
+
+# NL → EDSQL: canned intents first, then Gemini; answers persist across runs
+translator = CachingTranslator(
+    [IntentTranslator(), GeminiTranslator(get_gemini_model)],
+    TranslationCache(namespace="cli"),
+)
 
 def convert_to_edsql(nl_query):
-    intent = classify_intent(nl_query)
-
-    if intent == "average_query":
-        return 'SELECT AVG(grades) FROM students GROUP BY class;'
-    elif intent == "performance_query":
-        return 'SELECT PERFORMANCE_SCORE(grades, attendance) FROM students;'
-    elif intent == "plot_bar":
-        return 'SELECT name, grades FROM students PLOT BAR GRAPH;'
-    elif intent == "plot_line":
-        return 'SELECT name, grades FROM students PLOT LINE GRAPH;'
-    elif intent == "plot_pie":
-        return 'SELECT class FROM students PLOT PIE CHART;'
-    elif intent == "top_n_query":
-        return 'SELECT name, grades FROM students ORDER BY grades DESC LIMIT 5;'
-    elif intent == "conditional_query":
-        return 'SELECT name, grades FROM students WHERE grades > 80;'
-    else:
-        return ask_gemini(nl_query)
+    return translator.translate(nl_query)
 
-def execute_query(parsed_query):
-    _, select_list, table, where_clause, group_by_clause, plot_clause, order_clause, limit_clause, _ = parsed_query
-    result = df.copy()
-
-    # Step 1: Compute custom metrics if any
-    custom_metric_names = []
-    for sel in select_list:
-        if isinstance(sel, tuple) and sel[0] == 'CUSTOM_METRIC':
-            _, metric_name, col1, col2 = sel
-            result[metric_name] = compute_custom_metric(result, metric_name)
-            custom_metric_names.append(metric_name)
-
-    # Step 2: Check if WHERE clause depends on a custom metric
-    if where_clause:
-        column, op, value = where_clause[1][1:]
-        if column not in result.columns and column in custom_metric_names:
-            result[column] = compute_custom_metric(result, column)
-
-        if op == '>':
-            result = result[result[column] > value]
-        elif op == '<':
-            result = result[result[column] < value]
-        elif op == '=':
-            result = result[result[column] == value]
-
-    # Step 3: GROUP BY
-    if group_by_clause:
-        group_col = group_by_clause[1]
-        if isinstance(select_list[0], tuple) and select_list[0][0] == 'AVG':
-            result = result.groupby(group_col)[select_list[0][1]].mean().reset_index()
-
-    # Step 4: ORDER BY
-    if order_clause:
-        _, order_col, order_dir = order_clause
-        if order_col not in result.columns and order_col in custom_metric_names:
-            result[order_col] = compute_custom_metric(result, order_col)
-        result = result.sort_values(by=order_col, ascending=(order_dir.upper() == 'ASC'))
-
-    # Step 5: LIMIT
-    if limit_clause:
-        _, limit_val = limit_clause
-        result = result.head(int(limit_val))
-
-    # Step 6: Build final select column list
-    select_columns = []
-    for sel in select_list:
-        if isinstance(sel, tuple):
-            if sel[0] == 'CUSTOM_METRIC':
-                select_columns.append(sel[1])  # metric_name
-            else:
-                select_columns.append(sel[1])
-        else:
-            select_columns.append(sel)
-
-    # If 'name' not selected but exists in df and metric used, add it
-    if 'name' in df.columns and any(col in custom_metric_names for col in select_columns):
-        if 'name' not in select_columns:
-            select_columns.insert(0, 'name')
-
-    # Step 7: Select only required columns
+def execute_query(parsed_query, stream=False, export=None):
+    # Step 1: Plan the query (filter pushdown, column pruning, top-k) and execute it,
+    # either in memory or chunk by chunk straight from the CSV
     try:
-        result = result[select_columns]
-    except KeyError as e:
-        print(f"Error selecting columns: {e}")
-        print(f"Available columns: {result.columns.tolist()}")
+        if stream and parsed_query[0] == 'QUERY':
+            try:
+                path = catalog.path(statement_table(parsed_query))
+            except KeyError as e:
+                raise QueryError(f"Error in FROM clause: {e}") from e
+            result, plot_type = stream_query(parsed_query, path)
+        else:
+            result, plot_type = run_query(parsed_query, catalog.dataset_for(parsed_query), cache=result_cache)
+    except QueryError as e:
+        print(e, file=sys.stderr if export else sys.stdout)
         return
+    select_columns = list(result.columns)
 
-    # Step 8: Plot if needed
-    if plot_clause:
-        plot_type = plot_clause[1]
+    # Step 2: Plot if needed
+    if plot_type:
+        import matplotlib.pyplot as plt  # only plotting queries pay for pyplot
+        # Large results are reduced to a point budget first (see downsampling.py)
         if plot_type == 'BAR':
-            result.plot(kind='bar', x=select_columns[0], y=select_columns[1])
+            downsample_frame(result, select_columns[0], select_columns[1], 'BAR').plot(
+                kind='bar', x=select_columns[0], y=select_columns[1])
         elif plot_type == 'LINE':
-            result.plot(kind='line', x=select_columns[0], y=select_columns[1])
+            downsample_frame(result, select_columns[0], select_columns[1], 'LINE').plot(
+                kind='line', x=select_columns[0], y=select_columns[1])
         elif plot_type == 'PIE':
-            result[select_columns[0]].value_counts().plot(kind='pie', autopct='%1.1f%%')
+            counts = result[select_columns[0]].value_counts()
+            counts = counts[counts > 0]  # categoricals list unused categories too
+            _, labels, values = downsample(counts.index.to_numpy(), counts.to_numpy(), 'PIE')
+            pd.Series(values, index=labels).plot(kind='pie', autopct='%1.1f%%')
         plt.title(f"{plot_type.title()} Chart")
         plt.tight_layout()
         plt.show()
 
-    # Step 9: Show final result
+    # Step 3: Show final result, or write all of it to stdout chunk by chunk
+    if export:
+        for chunk in export_chunks(result, export):
+            sys.stdout.write(chunk)
+        return
     print("Result:")
     print(result)
 
 
+def run_script(path):
+    # Every statement of the script runs against one snapshot, sharing common work
+    for item in run_batch(load_script(path), catalog.default(), cache=result_cache):
+        print(item.statement)
+        if item.error:
+            print(item.error)
+        else:
+            print(item.result)
+        print()
+
+
 def main():
-    user_input = input("Enter EDSQL or NL query:\n")
-    if "select" not in user_input.lower():
+    # --batch PATH: run every statement of an .edsql script (no plots)
+    args = sys.argv[1:]
+    if "--batch" in args:
+        run_script(args[args.index("--batch") + 1])
+        return
+    # --stream: execute in bounded memory for datasets larger than RAM
+    stream = "--stream" in args
+    # --export csv|ndjson: write the whole result to stdout instead of a preview
+    export = args[args.index("--export") + 1] if "--export" in args else None
+    if export is not None and export not in EXPORT_FORMATS:
+        print(f"Unknown export format: {export} (expected {' or '.join(EXPORT_FORMATS)})")
+        return
+    # Exports keep stdout for the data
+    messages = sys.stderr if export else sys.stdout
+    print("Enter EDSQL or NL query:", file=messages)
+    user_input = input()
+    if not is_edsql(user_input):
         user_input = convert_to_edsql(user_input)
         if not user_input:
-            print("Sorry, couldn't understand your natural language query.")
+            print("Sorry, couldn't understand your natural language query.", file=messages)
             return
-        print("Converted to EDSQL:", user_input)
+        print("Converted to EDSQL:", user_input, file=messages)
 
-    parsed = parser.parse(user_input)
+    parsed = parse_query(user_input)
     if parsed:
-        execute_query(parsed)
+        execute_query(parsed, stream=stream, export=export)
     else:
         print("Parsing failed.")
 
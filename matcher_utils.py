@@ -1,25 +1,120 @@
-import spacy
-from spacy.matcher import Matcher
 import re
 
-nlp = spacy.load("en_core_web_sm")
-
-matcher = Matcher(nlp.vocab)
-
-# Patterns
-matcher.add("GRADE_COLUMN", [[{"LOWER": "grades"}]])
-matcher.add("ATTENDANCE_COLUMN", [[{"LOWER": "attendance"}]])
-matcher.add("CLASS_COLUMN", [[{"LOWER": "class"}]])
-
-matcher.add("GREATER_THAN", [[{"LOWER": {"in": ["greater", "more"]}}, {"LOWER": "than"}]])
-matcher.add("LESS_THAN", [[{"LOWER": {"in": ["less", "fewer"]}}, {"LOWER": "than"}]])
-matcher.add("EQUAL_TO", [[{"LOWER": "equal"}, {"LOWER": "to"}]])
-
-matcher.add("NUMERIC_VALUE", [[{"LIKE_NUM": True}]])
-
-# Extract fields
-def extract_entities(nl_query):
-    query = nl_query.lower()
+# ------------------ Vocabulary ------------------
+
+COLUMNS = ["grades", "attendance", "name", "class", "section"]
+OPERATORS = [("greater than", ">"), ("more than", ">"), ("less than", "<"), ("fewer than", "<"), ("equal to", "=")]
+AGGREGATIONS = [("AVG", ["average", "avg"]), ("SUM", ["sum", "total"]), ("MAX", ["max", "maximum"]), ("MIN", ["min", "minimum"])]
+GROUP_COLUMNS = ["class", "section"]
+PLOTS = [("bar graph", "BAR"), ("bar", "BAR"), ("line chart", "LINE"), ("line", "LINE"), ("pie chart", "PIE"), ("pie", "PIE")]
+
+# Intents, in priority order: (intent, whole-word phrases)
+INTENT_PHRASES = [
+    ("performance_query", ["performance score"]),
+    ("plot_bar", ["bar graph", "bar chart"]),
+    ("plot_line", ["line graph", "line chart"]),
+    ("plot_pie", ["pie chart", "distribution", "proportion"]),
+]
+CONDITION_WORDS = ["filter", "greater than", "less than", "above", "below", "more than", "under"]
+
+KEYWORDS = sorted(
+    set(COLUMNS) | {phrase for phrase, _ in OPERATORS} | {w for _, words in AGGREGATIONS for w in words}
+    | {f"by {col}" for col in GROUP_COLUMNS} | {kind for kind, _ in PLOTS}
+    | {p for _, phrases in INTENT_PHRASES for p in phrases} | set(CONDITION_WORDS)
+    | {"performance score", "top", "highest", "bottom", "lowest", "by",
+       "average", "mean", "grade", "score", "best"},
+    key=len, reverse=True,
+)
+
+
+def _trie_pattern(words):
+    """Regex alternation of `words` factored by common prefix, longest match first."""
+    branches = {}
+    for word in words:
+        branches.setdefault(word[:1], []).append(word[1:])
+    # An empty tail (a word ends here) makes the rest optional, tried greedily
+    alternatives = [re.escape(head) + _trie_pattern(tails) for head, tails in branches.items() if head]
+    pattern = "|".join(alternatives)
+    if "" in branches:
+        return f"(?:{pattern})?" if pattern else ""
+    return f"(?:{pattern})" if len(alternatives) > 1 else pattern
+
+
+# A zero-width lookahead is tried at every offset, so overlapping keywords are
+# all found in one pass; the (prefix-factored) alternation is greedy, so it
+# captures the longest keyword at each offset
+_SCANNER = re.compile("(?=(" + _trie_pattern(KEYWORDS) + "))")
+# Keywords that also start at an offset where `keyword` was matched
+_PREFIXES = {kw: [k for k in KEYWORDS if kw.startswith(k)] for kw in KEYWORDS}
+
+_NUMBER = re.compile(r" (\d+)")
+_SPACED_NUMBER = re.compile(r"\s+\d")
+
+# ------------------ Single-pass matcher ------------------
+
+def scan(query):
+    """{keyword: [start offsets]} for every (possibly overlapping) keyword in `query`."""
+    hits = {}
+    for match in _SCANNER.finditer(query):
+        start = match.start()
+        for keyword in _PREFIXES[match.group(1)]:
+            if keyword in hits:
+                hits[keyword].append(start)
+            else:
+                hits[keyword] = [start]
+    return hits
+
+
+def _is_word(char):
+    return char.isalnum() or char == "_"
+
+
+def _whole_words(query, hits, keyword):
+    """Offsets where `keyword` occurs as whole words (regex \\b on both sides)."""
+    if keyword not in hits:
+        return []
+    size, n = len(keyword), len(query)
+    return [
+        start for start in hits[keyword]
+        if (start == 0 or not _is_word(query[start - 1]))
+        and (start + size == n or not _is_word(query[start + size]))
+    ]
+
+
+def _has_whole_word(query, hits, keywords):
+    for keyword in keywords:
+        if keyword in hits and _whole_words(query, hits, keyword):
+            return True
+    return False
+
+
+def _intent(query, hits):
+    # (average|mean) ... (grade|score) as whole words, on one line
+    if ("average" in hits or "mean" in hits) and ("grade" in hits or "score" in hits):
+        seconds = _whole_words(query, hits, "grade") + _whole_words(query, hits, "score")
+        for word in ("average", "mean"):
+            for start in _whole_words(query, hits, word):
+                end = start + len(word)
+                for second in seconds:
+                    if second >= end and query.find("\n", end, second) == -1:
+                        return "average_query"
+
+    for intent, phrases in INTENT_PHRASES:
+        if _has_whole_word(query, hits, phrases):
+            return intent
+
+    for start in hits.get("top", ()):
+        if (start == 0 or not _is_word(query[start - 1])) and _SPACED_NUMBER.match(query, start + 3):
+            return "top_n_query"
+    if "best" in hits and _whole_words(query, hits, "best"):
+        return "top_n_query"
+
+    if _has_whole_word(query, hits, CONDITION_WORDS):
+        return "conditional_query"
+    return "unknown"
+
+
+def _entities(query, hits):
     entities = {
         "column": None,
         "operator": None,
@@ -34,73 +129,68 @@ def extract_entities(nl_query):
         "limit": None
     }
 
-    for col in ["grades", "attendance", "name", "class", "section"]:
-        if col in query:
+    for col in COLUMNS:
+        if col in hits:
             entities["column"] = col
             break
 
-    if "performance score" in query:
+    if "performance score" in hits:
         entities["custom_metric"] = "PERFORMANCE_SCORE"
         entities["column"] = "PERFORMANCE_SCORE"
 
     # Operator & value
-    for phrase, symbol in [("greater than", ">"), ("more than", ">"), ("less than", "<"), ("fewer than", "<"), ("equal to", "=")]:
-        if phrase in query:
+    for phrase, symbol in OPERATORS:
+        if phrase in hits:
             entities["operator"] = symbol
-            match = re.search(rf"{phrase} (\d+)", query)
-            if match:
-                entities["value"] = int(match.group(1))
+            for start in hits[phrase]:
+                match = _NUMBER.match(query, start + len(phrase))
+                if match:
+                    entities["value"] = int(match.group(1))
+                    break
             break
 
     # Aggregation
-    for agg in ["average", "avg", "sum", "total", "max", "maximum", "min", "minimum"]:
-        if agg in query:
-            if "average" in query or "avg" in query:
-                entities["aggregation"] = "AVG"
-            elif "sum" in query or "total" in query:
-                entities["aggregation"] = "SUM"
-            elif "max" in query or "maximum" in query:
-                entities["aggregation"] = "MAX"
-            elif "min" in query or "minimum" in query:
-                entities["aggregation"] = "MIN"
+    for code, words in AGGREGATIONS:
+        if words[0] in hits or words[1] in hits:
+            entities["aggregation"] = code
             break
 
     # Group by
-    for group_col in ["class", "section"]:
-        if f"group by {group_col}" in query or f"by {group_col}" in query:
+    for group_col in GROUP_COLUMNS:
+        if f"by {group_col}" in hits:
             entities["group_by"] = group_col
             break
-        
-    # Top/Highest
-    match = re.search(r"(top|highest) (\d+)", query)
-    if match:
-        entities["order"] = "DESC"
-        entities["limit"] = int(match.group(2))
 
-    # Bottom/Lowest
-    match = re.search(r"(bottom|lowest) (\d+)", query)
-    if match:
-        entities["order"] = "ASC"
-        entities["limit"] = int(match.group(2))
+    # Top/Highest, then Bottom/Lowest: the first "<word> <n>"
+    for words, order in (("top", "highest"), "DESC"), (("bottom", "lowest"), "ASC"):
+        if words[0] not in hits and words[1] not in hits:
+            continue
+        starts = sorted((start, len(word)) for word in words for start in hits.get(word, ()))
+        for start, size in starts:
+            match = _NUMBER.match(query, start + size)
+            if match:
+                entities["order"] = order
+                entities["limit"] = int(match.group(1))
+                break
 
     # Fallback: If order is given but no limit
-    if ("top" in query or "highest" in query) and entities["limit"] is None:
+    if ("top" in hits or "highest" in hits) and entities["limit"] is None:
         entities["order"] = "DESC"
         entities["limit"] = 1
-    elif ("bottom" in query or "lowest" in query) and entities["limit"] is None:
+    elif ("bottom" in hits or "lowest" in hits) and entities["limit"] is None:
         entities["order"] = "ASC"
         entities["limit"] = 1
 
     # Plot type
-    for kind, code in [("bar graph", "BAR"), ("bar", "BAR"), ("line chart", "LINE"), ("line", "LINE"), ("pie chart", "PIE"), ("pie", "PIE")]:
-        if kind in query:
+    for kind, code in PLOTS:
+        if kind in hits:
             entities["plot"] = code
             break
 
     # X and Y columns for plotting
-    if "by" in query:
-        parts = query.split("by")
-        if len(parts) == 2:
+    if "by" in hits:
+        if len(hits["by"]) == 1:
+            parts = query.split("by")
             entities["y"] = parts[0].strip().split()[-1]
             entities["x"] = parts[1].strip().split()[0]
     else:
@@ -111,4 +201,33 @@ def extract_entities(nl_query):
     return entities
 
 
+def analyze(nl_query):
+    """(intent, entities) for a question, from a single scan of its text."""
+    query = nl_query.lower()
+    hits = scan(query)
+    return _intent(query, hits), _entities(query, hits)
 
+
+def detect_intent(nl_query):
+    query = nl_query.lower()
+    return _intent(query, scan(query))
+
+
+def analyze_batch(nl_queries):
+    """`analyze` over many questions; repeated questions are analyzed once."""
+    seen = {}
+    results = []
+    for nl_query in nl_queries:
+        query = nl_query.lower()
+        result = seen.get(query)
+        if result is None:
+            result = seen[query] = analyze(query)
+        else:
+            result = (result[0], dict(result[1]))  # callers may modify their entities
+        results.append(result)
+    return results
+
+# Extract fields
+def extract_entities(nl_query):
+    query = nl_query.lower()
+    return _entities(query, scan(query))
@@ -0,0 +1,157 @@
+"""Materialized GROUP BY aggregates maintained from appended CSV rows.
+
+Declare an aggregate with `AggregateStore.declare(group_col, column)` (or
+`DatasetSource.materialize`). The store keeps per-group sum, count, min and
+max of `column` (plus the number of rows per group) for the whole file. On
+`refresh()` it reads only the bytes appended since the last refresh, folds
+them into the state, and remembers the new end offset.
+
+Appends are recognized by the bytes just before the previous end being
+unchanged; a shorter file or a different header/anchor triggers a full
+rebuild. The store also keeps the SHA-1 of the bytes it covers, which is the
+dataset version (see storage.file_hash) when those are the whole file. Given
+the version of the file it is refreshed for, `refresh` rebuilds from scratch
+if folding the tail does not reproduce it, so rewrites of existing rows are
+caught even when the anchor and the row count survive them.
+
+`answer(group_col, column, version)` returns the GROUP BY AVG result for the
+dataset of that version, or None if the state covers other data (the dataset
+and the file have diverged), in which case the executor scans as usual.
+"""
+import hashlib
+import io
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+ANCHOR_BYTES = 256
+_AGGS = {"sum": "sum", "count": "sum", "min": "min", "max": "max", "rows": "sum"}
+
+
+def _partials(frame, group_col, column):
+    """Per-group sum/count/min/max/rows of `column` in `frame`."""
+    grouped = frame.groupby(group_col)[column]
+    return pd.DataFrame({
+        "sum": grouped.sum(),
+        "count": grouped.count(),
+        "min": grouped.min(),
+        "max": grouped.max(),
+        "rows": grouped.size(),
+    })
+
+
+class AggregateStore:
+    def __init__(self, path):
+        self.path = path
+        self.declared = []
+        # (state, rows, version) replaced as a whole, so readers never mix two refreshes
+        self._snapshot = ({}, 0, None)
+        self._offset = 0
+        self._header = None
+        self._anchor = b""
+        self._digest = hashlib.sha1()  # of the bytes up to _offset
+        self._lock = threading.Lock()
+
+    def declare(self, group_col, column):
+        """Maintain GROUP BY `group_col` over `column` from the next refresh on."""
+        with self._lock:
+            if (group_col, column) not in self.declared:
+                self.declared.append((group_col, column))
+                self._reset()  # the new aggregate needs the whole file once
+
+    @property
+    def rows(self):
+        """Number of data rows the state covers."""
+        return self._snapshot[1]
+
+    @property
+    def version(self):
+        """Version of the data the state covers (see storage.file_hash)."""
+        return self._snapshot[2]
+
+    def _reset(self):
+        self._snapshot = ({}, 0, None)
+        self._offset, self._header, self._anchor = 0, None, b""
+        self._digest = hashlib.sha1()
+
+    def rebuild(self):
+        with self._lock:
+            self._reset()
+            return self._refresh()
+
+    def refresh(self, version=None):
+        """Fold rows appended since the last refresh into the state; returns the number read.
+
+        `version` is that of the file being refreshed for: if the folded state
+        does not match it, the file was rewritten and the state is rebuilt.
+        """
+        with self._lock:
+            if not self.declared:
+                return 0
+            carried = self._offset
+            added = self._refresh()
+            if version is not None and self.version != version and carried:
+                self._reset()
+                added = self._refresh()
+            return added
+
+    def _refresh(self):
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            header = f.readline()
+            if not self._appended(f, size, header):
+                self._reset()
+                self._header = header
+                self._offset = len(header)
+                self._digest.update(header)
+            f.seek(self._offset)
+            # Only whole lines; a partially written last line waits for the next refresh
+            tail = f.read(size - self._offset)
+            tail = tail[:tail.rfind(b"\n") + 1]
+        if not tail.strip():
+            self._snapshot = self._snapshot[:2] + (self._digest.hexdigest()[:16],)
+            return 0
+        digest = self._digest.copy()
+        digest.update(tail)
+        added = self._fold(tail, digest.hexdigest()[:16])
+        self._digest = digest
+        self._offset += len(tail)
+        self._anchor = (self._anchor + tail)[-ANCHOR_BYTES:]
+        return added
+
+    def _appended(self, f, size, header):
+        if self._header is None or header != self._header or size < self._offset:
+            return False
+        start = self._offset - len(self._anchor)
+        f.seek(start)
+        return f.read(len(self._anchor)) == self._anchor
+
+    def _fold(self, tail, version):
+        columns = {col for pair in self.declared for col in pair}
+        frame = pd.read_csv(io.BytesIO(self._header + tail), usecols=lambda col: col in columns)
+        state, rows, _ = self._snapshot
+        state = dict(state)
+        for group_col, column in self.declared:
+            part = _partials(frame, group_col, column)
+            old = state.get((group_col, column))
+            if old is not None:
+                part = pd.concat([old, part]).groupby(level=0).agg(_AGGS)
+            state[(group_col, column)] = part
+        self._snapshot = (state, rows + len(frame), version)
+        return len(frame)
+
+    def partials(self, group_col, column):
+        """Per-group sum/count/min/max/rows, or None if not materialized."""
+        return self._snapshot[0].get((group_col, column))
+
+    def answer(self, group_col, column, version):
+        """GROUP BY `group_col` AVG(`column`) if the state covers data of `version`, else None."""
+        state, _, covered = self._snapshot
+        part = state.get((group_col, column))
+        if part is None or version is None or covered != version:
+            return None
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = part["sum"].to_numpy(dtype=np.float64) / part["count"].to_numpy()
+        return pd.DataFrame({group_col: part.index.to_numpy(), column: means})
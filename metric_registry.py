@@ -0,0 +1,152 @@
+"""Registry of CUSTOM_METRIC definitions.
+
+A metric is a vectorized NumPy expression over named parameters, e.g.
+
+    register_metric("PERFORMANCE_SCORE", "0.6 * grades + 0.4 * attendance")
+
+Parameter names double as the default columns. `CUSTOM_METRIC(NAME, a, b)`
+binds the columns `a`, `b` positionally instead. Expressions may only use
+arithmetic, numeric constants, their parameters and the functions in
+`FUNCTIONS`; they are checked once at registration.
+
+Full derived columns are memoized per (dataset version, metric, input columns)
+in a memory-bounded LRU, together with a sorted index over them, so a metric
+used in SELECT, WHERE, GROUP BY and ORDER BY is computed once per dataset
+version.
+"""
+import ast
+import threading
+
+import numpy as np
+
+from indexes import SortedIndex
+from query_cache import LRUCache, is_current
+
+FUNCTIONS = {
+    "abs": np.abs, "sqrt": np.sqrt, "log": np.log, "exp": np.exp,
+    "minimum": np.minimum, "maximum": np.maximum, "clip": np.clip,
+    "round": np.round, "where": np.where,
+}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Name, ast.Load, ast.Constant, ast.Call,
+    ast.Compare, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.USub, ast.UAdd, ast.Gt, ast.Lt, ast.GtE, ast.LtE, ast.Eq, ast.NotEq,
+)
+
+
+def _compile(expression, params):
+    tree = ast.parse(expression, mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax in metric expression: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Only numeric constants are allowed, got {node.value!r}")
+        if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS):
+            raise ValueError(f"Unknown function in metric expression: {ast.unparse(node.func)}")
+        if isinstance(node, ast.Name) and node.id not in params and node.id not in FUNCTIONS:
+            raise ValueError(f"Unknown name in metric expression: {node.id}")
+    return compile(tree, f"<metric {expression}>", "eval")
+
+
+def _names_in_order(expression):
+    names = []
+    for node in ast.walk(ast.parse(expression, mode="eval")):
+        if isinstance(node, ast.Name) and node.id not in FUNCTIONS and node.id not in names:
+            names.append(node.id)
+    return names
+
+
+class Metric:
+    def __init__(self, name, expression, params=None):
+        self.name = name.upper()
+        self.expression = expression
+        self.params = tuple(params or _names_in_order(expression))
+        self._code = _compile(expression, self.params)
+
+    def bind(self, args=()):
+        """Input columns for a use of the metric: explicit args, else the defaults."""
+        args = tuple(args)
+        if args and len(args) != len(self.params):
+            raise ValueError(f"{self.name} takes {len(self.params)} columns, got {len(args)}")
+        return args or self.params
+
+    def evaluate(self, frame, columns):
+        missing = [col for col in columns if col not in frame.columns]
+        if missing:
+            raise KeyError(f"Missing {', '.join(map(repr, missing))} for {self.name}")
+        env = dict(FUNCTIONS)
+        env.update((param, frame[col].to_numpy(dtype=np.float64)) for param, col in zip(self.params, columns))
+        return np.asarray(eval(self._code, {"__builtins__": {}}, env), dtype=np.float64)
+
+
+class DerivedColumn:
+    """A metric evaluated over a whole dataset, with a lazily built sorted index."""
+
+    def __init__(self, values):
+        self.values = values
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = SortedIndex(None, self.values)
+        return self._index
+
+    @property
+    def nbytes(self):
+        # Budget for the index too (order array + sorted copy), even before it is built
+        return self.values.nbytes * 3
+
+
+class MetricRegistry:
+    def __init__(self, maxbytes=256 * 1024 * 1024):
+        self.metrics = {}
+        self.columns = LRUCache(maxsize=1024, maxbytes=maxbytes, sizeof=lambda col: col.nbytes)
+        self._lock = threading.Lock()
+
+    def register(self, name, expression, params=None):
+        metric = Metric(name, expression, params)
+        self.metrics[metric.name] = metric
+        # Definitions may have changed; drop anything memoized for this name
+        self.columns.discard_where(lambda key: key[1] == metric.name)
+        return metric
+
+    def get(self, name):
+        metric = self.metrics.get(str(name).upper())
+        if metric is None:
+            raise KeyError(f"Unknown custom metric: {name}")
+        return metric
+
+    def __contains__(self, name):
+        return str(name).upper() in self.metrics
+
+    def evaluate(self, frame, name, columns=None):
+        """Metric values for the rows of `frame` (no memoization)."""
+        metric = self.get(name)
+        return metric.evaluate(frame, metric.bind(columns or ()))
+
+    def derived(self, ds, name, columns=None):
+        """The memoized DerivedColumn of metric `name` over all rows of dataset `ds`."""
+        metric = self.get(name)
+        columns = metric.bind(columns or ())
+        if ds.version is None:
+            return DerivedColumn(metric.evaluate(ds.frame, columns))
+        key = (ds.version, metric.name, columns)
+        derived = self.columns.get(key)
+        if derived is None:
+            with self._lock:
+                derived = self.columns.get(key)
+                if derived is None:
+                    derived = DerivedColumn(metric.evaluate(ds.frame, columns))
+                    self.columns.put(key, derived)
+        return derived
+
+    def invalidate(self, keep_version=None):
+        self.columns.discard_where(lambda key: not is_current(key[0], keep_version))
+
+
+registry = MetricRegistry()
+register_metric = registry.register
+
+register_metric("PERFORMANCE_SCORE", "0.6 * grades + 0.4 * attendance")
@@ -0,0 +1,39 @@
+"""Process-wide LLM clients, created on first use.
+
+Importing and configuring the Gemini client takes seconds and structured
+EDSQL never needs it. Each getter here builds its object once, under a lock,
+and returns the same instance to every caller afterwards. (Entity and intent
+extraction need no NLP model; see matcher_utils.py.)
+"""
+import functools
+import os
+import threading
+
+GEMINI_MODEL = "gemini-2.0-flash"
+
+_instances = {}
+# Reentrant: one factory may call another
+_lock = threading.RLock()
+
+
+def _singleton(factory):
+    @functools.wraps(factory)
+    def get():
+        try:
+            return _instances[factory]
+        except KeyError:
+            pass
+        with _lock:
+            if factory not in _instances:
+                _instances[factory] = factory()
+            return _instances[factory]
+    get.loaded = lambda: factory in _instances
+    return get
+
+
+@_singleton
+def get_gemini_model():
+    """The shared Gemini model client; the key comes from GEMINI_API_KEY."""
+    import google.generativeai as genai
+    genai.configure(api_key=os.environ.get("GEMINI_API_KEY", "API_KEY"))
+    return genai.GenerativeModel(GEMINI_MODEL)
@@ -0,0 +1,87 @@
+"""Cursor pagination and chunked export of query results.
+
+A cursor is an opaque, URL-safe token naming a statement, the dataset
+version it ran against, a row offset and a page size. It holds no
+server-side state, so any web worker can serve the next page: the result is
+looked up in the result cache (or recomputed if it was evicted) and sliced.
+A cursor for an older dataset version is refused with `StaleCursor`, rather
+than silently paging through different data.
+
+`export_chunks` yields a result as CSV or NDJSON text `EXPORT_CHUNK_ROWS`
+rows at a time, so a response starts before the whole result is serialized
+and only one chunk of text is held in memory at a time.
+"""
+import base64
+import binascii
+import json
+from collections import namedtuple
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_CHUNK_ROWS = 10_000
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+Cursor = namedtuple("Cursor", "statement version offset page_size")
+Page = namedtuple("Page", "rows offset total next_cursor prev_cursor")
+
+
+class CursorError(ValueError):
+    """The token is not a cursor."""
+
+
+class StaleCursor(CursorError):
+    """The cursor was issued for a dataset version that is no longer current."""
+
+
+def page_size(value, default=PAGE_SIZE):
+    """`value` (e.g. a request argument) as a page size within 1..MAX_PAGE_SIZE."""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(cursor):
+    text = json.dumps(list(cursor), separators=(",", ":"))
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, version=None):
+    """The Cursor in `token`; raises StaleCursor if it was not issued for `version`."""
+    try:
+        text = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        statement, cursor_version, offset, size = json.loads(text)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise CursorError("Invalid cursor.") from None
+    if not (isinstance(statement, str) and isinstance(offset, int) and isinstance(size, int)) or offset < 0:
+        raise CursorError("Invalid cursor.")
+    if version is not None and cursor_version != version:
+        raise StaleCursor("The data changed since this page was served; run the query again.")
+    return Cursor(statement, cursor_version, offset, page_size(size))
+
+
+def paginate(result, statement, version, offset=0, size=PAGE_SIZE):
+    """The Page of `result` starting at row `offset`, with cursors to its neighbours."""
+    total = len(result)
+    rows = result.iloc[offset:offset + size]
+    next_cursor = prev_cursor = None
+    if offset + size < total:
+        next_cursor = encode_cursor(Cursor(statement, version, offset + size, size))
+    if offset > 0:
+        prev_cursor = encode_cursor(Cursor(statement, version, max(0, offset - size), size))
+    return Page(rows, offset, total, next_cursor, prev_cursor)
+
+
+def export_chunks(result, fmt, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Text chunks of `result` as CSV (with a header) or NDJSON (one object per row)."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "csv":
+        yield result.iloc[:0].to_csv(index=False)
+    for start in range(0, len(result), chunk_rows):
+        chunk = result.iloc[start:start + chunk_rows]
+        if fmt == "csv":
+            yield chunk.to_csv(index=False, header=False)
+        else:
+            yield chunk.to_json(orient="records", lines=True)
@@ -0,0 +1,243 @@
+"""Multi-core filter and GROUP BY AVG over row partitions of a dataset.
+
+The columns a query touches are published once per dataset into
+`multiprocessing.shared_memory` blocks (string and group columns as integer
+codes). Workers in a `ProcessPoolExecutor` attach to those blocks by name, so
+a partition costs a few bytes of pickling instead of a copy of its rows. Each
+worker filters its [start, stop) slice and returns either the matching row
+positions or per-group sum/count partials, which the parent merges.
+
+Datasets smaller than `min_rows` stay on the serial executor, where process
+start-up and merging would cost more than they save.
+"""
+import os
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MIN_ROWS = 1_000_000
+
+# ------------------ Shared columns ------------------
+
+class SharedColumn:
+    """One column copied into a shared memory block.
+
+    Non-numeric columns are stored as int32 codes into `categories` (sorted,
+    so code order is value order); -1 marks a missing value.
+    """
+
+    def __init__(self, series, encode=False):
+        if isinstance(series.dtype, pd.CategoricalDtype) and series.cat.categories.is_monotonic_increasing:
+            # Sorted categories (see schema.py): reuse the codes
+            values, self.categories = series.cat.codes.to_numpy().astype(np.int32), series.cat.categories
+        elif encode or not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+            codes, categories = pd.factorize(series, sort=True, use_na_sentinel=True)
+            values, self.categories = codes.astype(np.int32), categories
+        else:
+            values, self.categories = series.to_numpy(), None
+        self.dtype, self.length = values.dtype.str, len(values)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, values.dtype, buffer=self.shm.buf)[:] = values
+        self.name = self.shm.name
+
+    @property
+    def encoded(self):
+        return self.categories is not None
+
+    def spec(self):
+        return (self.name, self.dtype, self.length)
+
+    def code_of(self, value):
+        """Code for `value`, or -2 (matches nothing) if it does not occur."""
+        found = np.flatnonzero(self.categories == value)
+        return int(found[0]) if len(found) else -2
+
+    def release(self):
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedTable:
+    """Shared copies of a dataset's columns, published on first use."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.columns = {}
+        self._lock = threading.Lock()
+
+    def column(self, name, encode=False):
+        key = (name, encode)
+        with self._lock:
+            if key not in self.columns:
+                self.columns[key] = SharedColumn(self.frame[name], encode)
+            return self.columns[key]
+
+    def release(self):
+        with self._lock:
+            for column in self.columns.values():
+                column.release()
+            self.columns.clear()
+
+
+def shared_table(ds):
+    """The SharedTable of dataset `ds`; its blocks are unlinked when `ds` is collected."""
+    table = getattr(ds, "_shared_table", None)
+    if table is None:
+        table = SharedTable(ds.frame)
+        ds._shared_table = table
+        weakref.finalize(ds, table.release)
+    return table
+
+# ------------------ Worker side ------------------
+
+# Blocks this worker has attached to, oldest first; bounded so reloads do not pile up mappings
+_attached = {}
+_MAX_ATTACHED = 64
+
+def _attach(spec):
+    name, dtype, length = spec
+    shm = _attached.get(name)
+    if shm is None:
+        if len(_attached) >= _MAX_ATTACHED:
+            try:
+                _attached.pop(next(iter(_attached))).close()
+            except BufferError:
+                pass  # still viewed by a live array; the mapping goes away with it
+        shm = _attached[name] = shared_memory.SharedMemory(name=name)
+    return np.ndarray((length,), np.dtype(dtype), buffer=shm.buf)
+
+
+def _partition_mask(filters, start, stop):
+    mask = np.ones(stop - start, dtype=bool)
+    for spec, op, value in filters:
+        values = _attach(spec)[start:stop]
+        if op == '>':
+            mask &= values > value
+        elif op == '<':
+            mask &= values < value
+        else:
+            mask &= values == value
+    return mask
+
+
+def _scan_partition(filters, start, stop):
+    return np.flatnonzero(_partition_mask(filters, start, stop)) + start
+
+
+def _aggregate_partition(filters, group_spec, value_spec, n_groups, start, stop):
+    mask = _partition_mask(filters, start, stop)
+    groups = _attach(group_spec)[start:stop]
+    values = _attach(value_spec)[start:stop].astype(np.float64)
+    rows = mask & (groups >= 0)
+    keep = rows & ~np.isnan(values)
+    sums = np.bincount(groups[keep], weights=values[keep], minlength=n_groups)
+    counts = np.bincount(groups[keep], minlength=n_groups)
+    # Groups with rows but only missing values still appear (as NaN), like pandas
+    seen = np.bincount(groups[rows], minlength=n_groups)
+    return sums, counts, seen
+
+# ------------------ Parent side ------------------
+
+class ParallelExecutor:
+    def __init__(self, workers=None, min_rows=DEFAULT_MIN_ROWS, partitions=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_rows = min_rows
+        # One partition per worker unless told otherwise
+        self.partitions = partitions or self.workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def applies(self, ds):
+        return self.workers > 1 and len(ds.frame) >= self.min_rows
+
+    def _bounds(self, n_rows):
+        edges = np.linspace(0, n_rows, self.partitions + 1, dtype=np.int64)
+        return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+    def _filter_specs(self, table, conditions):
+        """Worker-side form of WHERE conditions, or None if one cannot run on shared columns."""
+        specs = []
+        for condition in conditions:
+            if condition[0] != 'CONDITION':
+                return None
+            _, column, op, value = condition
+            if column not in table.frame.columns or op not in ('>', '<', '='):
+                return None
+            shared = table.column(column)
+            if shared.encoded:
+                if op != '=' or not isinstance(value, str):
+                    return None
+                value = shared.code_of(value)
+            elif isinstance(value, str):
+                return None
+            specs.append((shared.spec(), op, value))
+        return specs
+
+    def filter_positions(self, ds, conditions):
+        """Sorted row positions matching every condition, or None if not applicable."""
+        table = shared_table(ds)
+        filters = self._filter_specs(table, conditions)
+        if filters is None:
+            return None
+        bounds = self._bounds(len(ds.frame))
+        futures = [self.pool.submit(_scan_partition, filters, a, b) for a, b in bounds]
+        parts = [f.result() for f in futures]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.intp)
+
+    def aggregate(self, ds, conditions, group_col, column):
+        """GROUP BY `group_col` AVG(`column`) as a DataFrame, or None if not applicable."""
+        frame = ds.frame
+        if group_col not in frame.columns or column not in frame.columns:
+            return None
+        if not pd.api.types.is_numeric_dtype(frame[column]) or pd.api.types.is_bool_dtype(frame[column]):
+            return None
+        table = shared_table(ds)
+        filters = self._filter_specs(table, conditions)
+        if filters is None:
+            return None
+        groups = table.column(group_col, encode=True)
+        values = table.column(column)
+        n_groups = len(groups.categories)
+
+        futures = [
+            self.pool.submit(_aggregate_partition, filters, groups.spec(), values.spec(), n_groups, a, b)
+            for a, b in self._bounds(len(frame))
+        ]
+        sums, counts, seen = np.zeros(n_groups), np.zeros(n_groups), np.zeros(n_groups)
+        for future in futures:
+            part_sums, part_counts, part_seen = future.result()
+            sums += part_sums
+            counts += part_counts
+            seen += part_seen
+
+        present = seen > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums[present] / counts[present]
+        return pd.DataFrame({group_col: groups.categories[present], column: means})
+
+
+# Process-wide executor used by `executor.py`; None disables parallel execution
+parallel_executor = ParallelExecutor(
+    workers=int(os.environ.get("EDSQL_WORKERS", "0")) or None,
+    min_rows=int(os.environ.get("EDSQL_PARALLEL_MIN_ROWS", DEFAULT_MIN_ROWS)),
+)
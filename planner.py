@@ -0,0 +1,351 @@
+"""Logical query plans for EDSQL.
+
+`build_plan` turns the parser's ('QUERY', ...) tuple into a tree of operators
+that mirrors the naive execution order; `optimize` then applies the rewrite
+rules below. The resulting tree is executed by `executor.execute_plan`.
+"""
+
+from expressions import condition_columns, conjuncts, format_condition
+from metric_registry import registry
+from sampling import DEFAULT_CONFIDENCE, ci_columns
+
+# ------------------ Operators ------------------
+
+class PlanNode:
+    clause = 'query'
+
+    def __init__(self, child=None):
+        self.child = child
+
+    def describe(self):
+        return type(self).__name__
+
+    def __repr__(self):
+        return format_plan(self)
+
+
+class Scan(PlanNode):
+    clause = 'FROM'
+
+    def __init__(self, table, columns=None, sample=None, strata=None):
+        super().__init__()
+        self.table = table
+        self.columns = columns  # None means every column of the table
+        self.sample = sample  # SAMPLE percent, or None for every row
+        self.strata = strata  # column the sample is stratified by
+
+    def describe(self):
+        cols = '*' if self.columns is None else ', '.join(self.columns)
+        if self.sample is None:
+            return f"Scan({self.table}: {cols})"
+        by = f" BY {self.strata}" if self.strata else ""
+        return f"Scan({self.table}: {cols}, SAMPLE {self.sample}%{by})"
+
+
+class Join(PlanNode):
+    """Inner equi-join of the rows so far with another table, hashing the smaller side (see joins.py)."""
+    clause = 'JOIN'
+
+    def __init__(self, child, table, left_key, right_key):
+        super().__init__(child)
+        self.table = table
+        self.left_key = left_key
+        self.right_key = right_key
+        self.columns = None  # columns read above the join, None for all
+
+    def describe(self):
+        return f"HashJoin({self.table} ON {self.left_key} = {self.right_key})"
+
+
+class Filter(PlanNode):
+    """Keeps the rows satisfying one conjunct of the WHERE clause (see expressions.py)."""
+    clause = 'WHERE'
+
+    def __init__(self, child, condition):
+        super().__init__(child)
+        self.condition = condition
+
+    @property
+    def columns(self):
+        return condition_columns(self.condition)
+
+    def describe(self):
+        return f"Filter({format_condition(self.condition)})"
+
+
+class Derive(PlanNode):
+    """Adds a CUSTOM_METRIC column computed from `inputs`."""
+    clause = 'CUSTOM_METRIC'
+
+    def __init__(self, child, name, inputs):
+        super().__init__(child)
+        self.name = name
+        self.inputs = list(inputs)
+
+    def describe(self):
+        return f"Derive({self.name} <- {', '.join(self.inputs)})"
+
+
+class Aggregate(PlanNode):
+    clause = 'GROUP BY'
+
+    def __init__(self, child, group_col, func, column, confidence=None):
+        super().__init__(child)
+        self.group_col = group_col
+        self.func = func
+        self.column = column
+        # Set over a sample: also report a confidence interval at this level
+        self.confidence = confidence
+
+    def describe(self):
+        ci = f", CI {self.confidence:.0%}" if self.confidence else ""
+        return f"Aggregate({self.func}({self.column}) BY {self.group_col}{ci})"
+
+
+class Sort(PlanNode):
+    clause = 'ORDER BY'
+
+    def __init__(self, child, column, ascending):
+        super().__init__(child)
+        self.column = column
+        self.ascending = ascending
+
+    def describe(self):
+        return f"Sort({self.column} {'ASC' if self.ascending else 'DESC'})"
+
+
+class TopK(PlanNode):
+    clause = 'ORDER BY'
+
+    def __init__(self, child, column, ascending, k):
+        super().__init__(child)
+        self.column = column
+        self.ascending = ascending
+        self.k = k
+
+    def describe(self):
+        return f"TopK({self.column} {'ASC' if self.ascending else 'DESC'}, k={self.k})"
+
+
+class Limit(PlanNode):
+    clause = 'LIMIT'
+
+    def __init__(self, child, n):
+        super().__init__(child)
+        self.n = n
+
+    def describe(self):
+        return f"Limit({self.n})"
+
+
+class Project(PlanNode):
+    clause = 'SELECT'
+
+    def __init__(self, child, columns):
+        super().__init__(child)
+        self.columns = columns  # may contain '*'
+
+    def describe(self):
+        return f"Project({', '.join(self.columns)})"
+
+
+class Plot(PlanNode):
+    clause = 'PLOT'
+
+    def __init__(self, child, kind):
+        super().__init__(child)
+        self.kind = kind
+
+    def describe(self):
+        return f"Plot({self.kind})"
+
+
+class Values(PlanNode):
+    """Rows that were already computed elsewhere (e.g. by the streaming executor)."""
+    clause = 'FROM'
+
+    def __init__(self, frame, label='values'):
+        super().__init__()
+        self.frame = frame
+        self.label = label
+
+    def describe(self):
+        return f"Values({self.label}: {len(self.frame)} rows)"
+
+
+def format_plan(node, indent=0):
+    lines = []
+    while node is not None:
+        lines.append("  " * indent + node.describe())
+        node, indent = node.child, indent + 1
+    return "\n".join(lines)
+
+
+def find_node(plan, node_type):
+    """First node of `node_type` on the path from the root, or None."""
+    node = plan
+    while node is not None:
+        if isinstance(node, node_type):
+            return node
+        node = node.child
+    return None
+
+# ------------------ AST -> logical plan ------------------
+
+def build_plan(parsed_query):
+    """Naive plan: join, derive metrics, filter, aggregate, sort, limit, project, plot."""
+    _, select_list, table, where_clause, group_by_clause, plot_clause, order_clause, limit_clause, _ = parsed_query[:9]
+    sample_clause = parsed_query[9] if len(parsed_query) > 9 else None
+    join_clause = parsed_query[10] if len(parsed_query) > 10 else None
+
+    node = scan = Scan(table, sample=sample_clause[1] if sample_clause else None)
+    for _, joined, left_key, right_key in join_clause or ():
+        node = Join(node, joined, left_key, right_key)
+
+    metric_names = []
+    def derive(name, args=()):
+        nonlocal node
+        if name in metric_names:
+            return
+        try:
+            inputs = registry.get(name).bind(args)
+        except (KeyError, ValueError):
+            inputs = args  # reported by the executor when the metric is evaluated
+        node = Derive(node, name, inputs)
+        metric_names.append(name)
+
+    def is_metric(column):
+        return column in metric_names or column in registry
+
+    for sel in select_list:
+        if isinstance(sel, tuple) and sel[0] == 'CUSTOM_METRIC':
+            derive(sel[1], sel[2:])
+
+    if where_clause:
+        for column in condition_columns(where_clause[1]):
+            if is_metric(column):
+                derive(column)
+        # One Filter per AND operand, so each can be pushed down and ordered on its own
+        for condition in conjuncts(where_clause[1]):
+            node = Filter(node, condition)
+
+    if group_by_clause and isinstance(select_list[0], tuple) and select_list[0][0] == 'AVG':
+        # Metrics can be grouped on or averaged like any other column
+        for column in (group_by_clause[1], select_list[0][1]):
+            if is_metric(column):
+                derive(column)
+        confidence = None
+        if scan.sample is not None:
+            # Stratify on the group key so every group gets sampled rows
+            scan.strata = None if is_metric(group_by_clause[1]) else group_by_clause[1]
+            confidence = DEFAULT_CONFIDENCE
+        node = Aggregate(node, group_by_clause[1], 'AVG', select_list[0][1], confidence)
+
+    if order_clause:
+        _, order_col, order_dir = order_clause
+        if is_metric(order_col) and not isinstance(node, Aggregate):
+            derive(order_col)
+        node = Sort(node, order_col, order_dir.upper() == 'ASC')
+
+    if limit_clause:
+        node = Limit(node, int(limit_clause[1]))
+
+    columns = []
+    for sel in select_list:
+        columns.append(sel[1] if isinstance(sel, tuple) else sel)
+    aggregate = find_node(node, Aggregate)
+    if aggregate is not None and aggregate.confidence and aggregate.column in columns:
+        at = columns.index(aggregate.column) + 1
+        columns[at:at] = ci_columns(aggregate.column)
+    # Metric rows are identified by student name when it is available
+    if aggregate is None and any(col in metric_names for col in columns) and 'name' not in columns:
+        columns.insert(0, 'name')
+    node = Project(node, columns)
+
+    if plot_clause:
+        node = Plot(node, plot_clause[1])
+    return node
+
+# ------------------ Rewrite rules ------------------
+
+def push_down_filters(node):
+    """Filter(Derive(x)) -> Derive(Filter(x)) unless the filter reads the derived column."""
+    if node is None:
+        return None
+    node.child = push_down_filters(node.child)
+    if isinstance(node, Filter) and isinstance(node.child, Derive) and node.child.name not in node.columns:
+        derive = node.child
+        node.child = derive.child
+        derive.child = push_down_filters(node)
+        return derive
+    return node
+
+
+def fuse_top_k(node):
+    """Limit(Sort(x)) -> TopK(x)."""
+    if node is None:
+        return None
+    node.child = fuse_top_k(node.child)
+    if isinstance(node, Limit) and isinstance(node.child, Sort):
+        sort = node.child
+        return TopK(sort.child, sort.column, sort.ascending, node.n)
+    return node
+
+
+def push_down_limits(node):
+    """Move Limit/TopK below Derive so metrics are only computed for the kept rows."""
+    if node is None:
+        return None
+    node.child = push_down_limits(node.child)
+    if isinstance(node, (Limit, TopK)) and isinstance(node.child, Derive):
+        if isinstance(node, Limit) or node.column != node.child.name:
+            derive = node.child
+            node.child = derive.child
+            derive.child = push_down_limits(node)
+            return derive
+    return node
+
+
+def prune_columns(node, required=None):
+    """Restrict the Scan to the columns some operator above it actually reads.
+
+    `required` is the set of columns the parent needs from `node`, or None for all.
+    """
+    if node is None:
+        return None
+    if isinstance(node, Scan):
+        node.columns = None if required is None else sorted(required)
+        return node
+    if isinstance(node, Values):
+        return node
+
+    if isinstance(node, Project):
+        child_required = None if '*' in node.columns else set(node.columns)
+    elif isinstance(node, Aggregate):
+        child_required = {node.group_col, node.column}
+    elif isinstance(node, Derive):
+        child_required = None if required is None else (required - {node.name}) | set(node.inputs)
+    elif isinstance(node, Filter):
+        child_required = None if required is None else required | set(node.columns)
+    elif isinstance(node, (Sort, TopK)):
+        child_required = None if required is None else required | {node.column}
+    elif isinstance(node, Join):
+        # Which side a column comes from is known once the tables are loaded; each side keeps what it has
+        node.columns = None if required is None else sorted(required)
+        child_required = None if required is None else required | {node.left_key, node.right_key}
+    else:
+        child_required = required
+    prune_columns(node.child, child_required)
+    return node
+
+
+RULES = [push_down_filters, fuse_top_k, push_down_limits, prune_columns]
+
+def optimize(plan, rules=None):
+    for rule in rules or RULES:
+        plan = rule(plan)
+    return plan
+
+
+def plan_query(parsed_query):
+    return optimize(build_plan(parsed_query))
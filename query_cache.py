@@ -0,0 +1,241 @@
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from edsql_compiler import errors as parse_errors, parser, reserved
+from instrumentation import telemetry
+
+# ------------------ Generic LRU ------------------
+
+class LRUCache:
+    """Bounded, thread-safe LRU mapping with hit/miss counters.
+
+    Besides the entry count, the cache can be bounded by an approximate memory
+    budget: pass `maxbytes` and a `sizeof(value)` function.
+    """
+
+    def __init__(self, maxsize=512, maxbytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if self.maxbytes is not None and size > self.maxbytes:
+                return  # would evict everything else and still not fit
+            if key in self._data:
+                self._bytes -= self._sizes.pop(key)
+            self._data[key] = value
+            self._sizes[key] = size
+            self._bytes += size
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize or (
+                self.maxbytes is not None and self._bytes > self.maxbytes
+            ):
+                old_key, _ = self._data.popitem(last=False)
+                self._bytes -= self._sizes.pop(old_key)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._bytes -= self._sizes.pop(key)
+            return self._data.pop(key)
+
+    def discard_where(self, predicate):
+        """Drop every entry whose key satisfies `predicate`."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+                self._bytes -= self._sizes.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "bytes": self._bytes,
+                "maxbytes": self.maxbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+# ------------------ Parse cache ------------------
+
+# String literals are kept verbatim, everything else is split into words/symbols
+_STRING_RE = re.compile(r'("[^"]*")')
+_WORD_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+def normalize_query(text):
+    """Canonical cache key: whitespace collapsed, keywords upper-cased."""
+    parts = []
+    for i, chunk in enumerate(_STRING_RE.split(text.strip())):
+        if i % 2:
+            parts.append(chunk)
+            continue
+        chunk = _WORD_RE.sub(
+            lambda m: m.group(0).upper() if m.group(0).upper() in reserved else m.group(0),
+            chunk,
+        )
+        parts.append(" ".join(chunk.split()))
+    return " ".join(p for p in parts if p)
+
+
+_ANALYZE_RE = re.compile(r'\s*ANALYZE(\s+\w+)?\s*;\s*$', re.IGNORECASE)
+
+def is_edsql(text):
+    """Whether `text` is an EDSQL statement rather than a natural-language question."""
+    return "select" in text.lower() or _ANALYZE_RE.match(text) is not None
+
+
+class ParseCache:
+    """Memoizes `parser.parse` on the normalized query text.
+
+    Cached ASTs are shared between callers and must be treated as read-only.
+    Failed parses are not cached so syntax errors are reported every time;
+    neither are parses PLY recovered from after an error.
+    """
+
+    def __init__(self, maxsize=512):
+        self.cache = LRUCache(maxsize)
+        # PLY's parser and lexer keep per-parse state, so parsing is serialized
+        self._parse_lock = threading.Lock()
+
+    def parse(self, text, strict=False):
+        """AST of `text`, or None. `strict` also rejects parses that recovered from an error."""
+        key = normalize_query(text)
+        parsed = self.cache.get(key)
+        if parsed is not None:
+            return parsed
+        start = time.perf_counter()
+        with self._parse_lock:
+            del parse_errors[:]
+            parsed = parser.parse(key)
+            clean = not parse_errors
+        telemetry.observe_stage("parse", time.perf_counter() - start)
+        if parsed and clean:
+            self.cache.put(key, parsed)
+        return parsed if clean or not strict else None
+
+    def stats(self):
+        return self.cache.stats()
+
+    def clear(self):
+        self.cache.clear()
+
+
+parse_cache = ParseCache()
+
+def parse_query(text):
+    """Drop-in replacement for `parser.parse` backed by the shared parse cache."""
+    return parse_cache.parse(text)
+
+
+def is_valid_edsql(text):
+    """Whether `text` parses as EDSQL without any syntax or lexing error."""
+    return bool(parse_cache.parse(text, strict=True))
+
+# ------------------ Result cache ------------------
+
+def canonical_ast(node):
+    """Hashable form of a parsed query (lists become tuples)."""
+    if isinstance(node, (list, tuple)):
+        return tuple(canonical_ast(item) for item in node)
+    return node
+
+
+def is_current(version, keep_versions):
+    """Whether an entry computed against dataset `version` is still valid.
+
+    `keep_versions` is the current version, or a set of them (one per loaded
+    table, see catalog.py). A statement over joined tables has the versions of
+    all of them joined by "+"; it stays current while each of them is.
+    """
+    if not isinstance(keep_versions, (set, frozenset)):
+        keep_versions = {keep_versions}
+    if version in keep_versions:
+        return True
+    return isinstance(version, str) and all(part in keep_versions for part in version.split("+"))
+
+
+def estimate_size(value):
+    """Rough in-memory size of a cached value, in bytes."""
+    if hasattr(value, "memory_usage"):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Query results keyed on (kind, dataset version, canonical AST).
+
+    `kind` separates different representations of the same result, e.g. the
+    result DataFrame and the HTML/PNG rendered from it. Entries of older
+    dataset versions can never be hit and are dropped by `invalidate`.
+    """
+
+    def __init__(self, maxsize=256, maxbytes=64 * 1024 * 1024):
+        self.cache = LRUCache(maxsize, maxbytes=maxbytes, sizeof=estimate_size)
+
+    @staticmethod
+    def key(kind, version, parsed_query):
+        return (kind, version, canonical_ast(parsed_query))
+
+    def get(self, kind, version, parsed_query):
+        return self.cache.get(self.key(kind, version, parsed_query))
+
+    def put(self, kind, version, parsed_query, value):
+        self.cache.put(self.key(kind, version, parsed_query), value)
+
+    def invalidate(self, keep_version=None):
+        """Drop every entry not computed against `keep_version` (or a set of current versions)."""
+        self.cache.discard_where(lambda key: not is_current(key[1], keep_version))
+
+    def stats(self):
+        return self.cache.stats()
+
+    def clear(self):
+        self.cache.clear()
+
+
+result_cache = ResultCache()
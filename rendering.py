@@ -0,0 +1,202 @@
+"""Chart rendering for the web app.
+
+Charts are drawn on standalone `matplotlib.figure.Figure` objects with the Agg
+canvas, never through the global `pyplot` state machine, so concurrent
+requests can render at the same time. Rendering runs on a bounded thread pool
+and finished charts are cached on (result content, plot type, format).
+
+Formats: "png" (base64 string), "svg" (markup) and "json" (a Chart.js
+config the browser renders itself, which skips server-side drawing entirely).
+
+Every format draws the result reduced to a point budget (see
+downsampling.py), so rendering time stays bounded however many rows the
+query returned.
+
+Request threads do not wait for matplotlib: `start` returns a chart id at
+once, and the page fetches the chart with `poll` (the app's /chart route)
+until it is ready. Cached charts are ready immediately.
+"""
+import base64
+import hashlib
+import io
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from downsampling import downsample
+from instrumentation import telemetry
+from query_cache import LRUCache
+
+FORMATS = ("png", "svg", "json")
+MAX_TICKS = 40
+
+# ------------------ Chart data ------------------
+
+def chart_series(result, plot_type):
+    """(positions, labels, values, x_label, y_label) to draw for `result`, downsampled."""
+    columns = result.columns
+    if plot_type == "PIE":
+        if result.shape[1] >= 2:
+            data = result.set_index(columns[0])[columns[1]]
+        else:
+            data = result[columns[0]].value_counts()
+            data = data[data > 0]  # categoricals list unused categories too
+        positions, labels, values = downsample(data.index.to_numpy(), data.to_numpy(), plot_type)
+        return positions, list(labels), values, None, None
+    positions, labels, values = downsample(result[columns[0]].to_numpy(), result[columns[1]].to_numpy(), plot_type)
+    return positions, list(labels), values, columns[0], columns[1]
+
+
+def _ticks(positions, labels):
+    """At most MAX_TICKS evenly spread (positions, labels) for the x axis."""
+    if len(labels) <= MAX_TICKS:
+        return positions, labels
+    keep = np.linspace(0, len(labels) - 1, MAX_TICKS).astype(np.intp)
+    return np.asarray(positions)[keep], [labels[i] for i in keep]
+
+
+def draw(result, plot_type):
+    """A new Figure with the chart; safe to call from any thread."""
+    positions, labels, values, x_label, y_label = chart_series(result, plot_type)
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    if plot_type == "BAR":
+        ax.bar(positions, values, label=y_label)
+    elif plot_type == "LINE":
+        ax.plot(positions, values, label=y_label)
+    elif plot_type == "PIE":
+        ax.pie(values, labels=[str(label) for label in labels], autopct='%1.1f%%')
+        ax.set_ylabel("")
+    else:
+        raise ValueError(f"Unknown plot type: {plot_type}")
+
+    if plot_type in ("BAR", "LINE"):
+        ticks, tick_labels = _ticks(positions, labels)
+        ax.set_xticks(ticks, [str(label) for label in tick_labels], rotation=90)
+        ax.set_xlabel(x_label)
+        ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+def _savefig(result, plot_type, fmt):
+    buf = io.BytesIO()
+    draw(result, plot_type).savefig(buf, format=fmt)
+    return buf.getvalue()
+
+
+def render_png(result, plot_type):
+    return base64.b64encode(_savefig(result, plot_type, "png")).decode()
+
+
+def render_svg(result, plot_type):
+    return _savefig(result, plot_type, "svg").decode()
+
+
+def chart_spec(result, plot_type):
+    """Chart.js configuration for client-side rendering."""
+    _, labels, values, _, y_label = chart_series(result, plot_type)
+    return {
+        "type": plot_type.lower(),
+        "data": {
+            "labels": [str(label) for label in labels],
+            "datasets": [{"label": str(y_label or ""), "data": [None if pd.isna(v) else float(v) for v in values]}],
+        },
+    }
+
+
+_RENDERERS = {"png": render_png, "svg": render_svg, "json": chart_spec}
+
+
+def _render(fmt, result, plot_type):
+    start = time.perf_counter()
+    payload = _RENDERERS[fmt](result, plot_type)
+    telemetry.observe_stage("render", time.perf_counter() - start)
+    return payload
+
+# ------------------ Pool + cache ------------------
+
+def result_fingerprint(result):
+    """Content hash of a result DataFrame (values, index and column names)."""
+    digest = hashlib.sha1(repr(list(result.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(result, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _payload_size(payload):
+    return len(payload) if isinstance(payload, str) else 64 * len(payload["data"]["labels"])
+
+
+class ChartRenderer:
+    def __init__(self, workers=None, max_pending=32, maxbytes=32 * 1024 * 1024):
+        self.pool = ThreadPoolExecutor(max_workers=workers or min(4, os.cpu_count() or 1),
+                                       thread_name_prefix="chart")
+        # Bounds queued + running renders; further callers wait for a slot
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.cache = LRUCache(maxsize=256, maxbytes=maxbytes, sizeof=_payload_size)
+        # chart id -> Future of the charts handed out by `start`, for `poll`
+        self.charts = LRUCache(maxsize=256)
+
+    def submit(self, result, plot_type, fmt="png"):
+        """Future resolving to the chart payload for `fmt`."""
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown chart format: {fmt}")
+        return self._submit((fmt, plot_type, result_fingerprint(result)), result, plot_type, fmt)
+
+    def _submit(self, key, result, plot_type, fmt):
+        cached = self.cache.get(key)
+        if cached is not None:
+            return _done(cached)
+
+        self.slots.acquire()
+        future = self.pool.submit(_render, fmt, result, plot_type)
+
+        def finish(done):
+            self.slots.release()
+            if done.exception() is None:
+                self.cache.put(key, done.result())
+        future.add_done_callback(finish)
+        return future
+
+    def render(self, result, plot_type, fmt="png", timeout=None):
+        return self.submit(result, plot_type, fmt).result(timeout)
+
+    def start(self, result, plot_type, fmt="png"):
+        """(chart id, Future) without waiting for the render; look the id up with `poll`."""
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown chart format: {fmt}")
+        key = (fmt, plot_type, result_fingerprint(result))
+        future = self._submit(key, result, plot_type, fmt)
+        chart_id = hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+        self.charts.put(chart_id, future)
+        return chart_id, future
+
+    def poll(self, chart_id):
+        """Payload of chart `chart_id`, or None while it renders.
+
+        Raises KeyError for an unknown (or long evicted) id, and the render's
+        own exception if it failed.
+        """
+        future = self.charts.get(chart_id)
+        if future is None:
+            raise KeyError(chart_id)
+        if not future.done():
+            return None
+        return future.result()
+
+
+def _done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+renderer = ChartRenderer()
@@ -0,0 +1,100 @@
+"""Approximate execution: reusable row samples and confidence intervals.
+
+`SELECT ... SAMPLE n PERCENT;` runs the query on an n% sample of the table
+instead of every row. Queries with GROUP BY use a sample stratified by the
+group column (n% of every group, at least two rows each), so small groups
+still get an estimate; other queries use a uniform sample.
+
+Samples are drawn without replacement with a seed derived from the dataset
+version, so the same query gives the same answer until the data changes, and
+each (version, percent, strata) sample is built once and kept in an LRU
+together with its indexes.
+
+GROUP BY AVG over a sample reports, next to the estimate, a normal-theory
+confidence interval (`<col>_ci_low`, `<col>_ci_high`, with finite population
+correction) and the number of sampled rows behind it (`<col>_n`).
+"""
+import hashlib
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from dataset import Dataset
+from query_cache import LRUCache, is_current
+
+DEFAULT_CONFIDENCE = 0.95
+MIN_PER_STRATUM = 2  # the fewest rows that give a variance estimate
+
+
+def ci_columns(column):
+    return [f"{column}_ci_low", f"{column}_ci_high", f"{column}_n"]
+
+
+def _seed(version, percent, strata):
+    text = f"{version}:{percent}:{strata}"
+    return int.from_bytes(hashlib.sha1(text.encode()).digest()[:8], "little")
+
+
+def sample_positions(frame, fraction, strata=None, seed=0):
+    """Sorted row positions of a sample of `fraction` of `frame` (per stratum if given)."""
+    rng = np.random.default_rng(seed)
+    n = len(frame)
+    if strata is None:
+        size = min(n, max(1, round(n * fraction)))
+        return np.sort(rng.choice(n, size=size, replace=False))
+    parts = []
+    groups = frame.groupby(strata, sort=True, dropna=False, observed=True).indices
+    for positions in groups.values():
+        size = min(len(positions), max(MIN_PER_STRATUM, round(len(positions) * fraction)))
+        parts.append(rng.choice(positions, size=size, replace=False))
+    return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.intp)
+
+
+class SampleCache:
+    """Samples of datasets, built once per (version, percent, strata)."""
+
+    def __init__(self, maxsize=16, maxbytes=256 * 1024 * 1024):
+        self.cache = LRUCache(maxsize, maxbytes=maxbytes,
+                              sizeof=lambda ds: int(ds.frame.memory_usage(deep=False).sum()))
+
+    def sample(self, ds, percent, strata=None):
+        """A Dataset holding the sample; the full dataset itself for 100 percent."""
+        if percent >= 100:
+            return ds
+        key = (ds.version, percent, strata)
+        sampled = self.cache.get(key) if ds.version is not None else None
+        if sampled is None:
+            positions = sample_positions(ds.frame, percent / 100, strata, _seed(ds.version, percent, strata))
+            frame = ds.frame.iloc[positions].reset_index(drop=True)
+            version = None if ds.version is None else f"{ds.version}~sample{percent}{strata or ''}"
+            sampled = Dataset(frame, ds.path, version)
+            sampled.name, sampled.joined = ds.name, ds.joined
+            if ds.version is not None:
+                self.cache.put(key, sampled)
+        return sampled
+
+    def invalidate(self, keep_version=None):
+        self.cache.discard_where(lambda key: not is_current(key[0], keep_version))
+
+    def stats(self):
+        return self.cache.stats()
+
+
+sample_cache = SampleCache()
+
+
+def estimate_means(frame, group_col, column, fraction, confidence=DEFAULT_CONFIDENCE):
+    """Per-group mean of `column` with a confidence interval, from sampled rows."""
+    stats = frame.groupby(group_col, observed=True)[column].agg(["mean", "std", "count"])
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    # Finite population correction for sampling a fraction without replacement
+    se = stats["std"] / np.sqrt(stats["count"]) * np.sqrt(max(0.0, 1 - fraction))
+    low, high, n = ci_columns(column)
+    return pd.DataFrame({
+        group_col: stats.index.to_numpy(),
+        column: stats["mean"].to_numpy(),
+        low: (stats["mean"] - z * se).to_numpy(),
+        high: (stats["mean"] + z * se).to_numpy(),
+        n: stats["count"].to_numpy(),
+    })
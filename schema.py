@@ -0,0 +1,87 @@
+"""Compact in-memory column types for loaded datasets.
+
+`read_csv` gives every string column the `object` dtype (an 8-byte pointer
+per row plus a Python string per value) and every number 64 bits.
+`compact_dtypes` rewrites a frame column by column:
+
+- strings with few distinct values (at most `CATEGORY_RATIO` of the rows)
+  become categoricals with sorted categories: one small integer code per row,
+  so equality and IN filters compare codes and GROUP BY groups on them;
+- integers shrink to the smallest signed type that holds their range;
+- floats become float32 only where that loses nothing.
+
+High-cardinality strings (e.g. names) stay `object`. `memory_report`
+compares the per-column footprint of two versions of a frame.
+"""
+import numpy as np
+import pandas as pd
+
+CATEGORY_RATIO = 0.5
+
+
+def use_categories(distinct, rows):
+    return rows > 0 and distinct <= max(1, rows * CATEGORY_RATIO)
+
+
+def code_dtype(n_categories):
+    """Smallest signed integer type for codes into `n_categories` values (-1 = missing)."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def compact_numeric(values):
+    """`values` (a numpy array) in the smallest dtype that represents it exactly."""
+    kind = values.dtype.kind
+    if kind in 'iu' and len(values):
+        lo, hi = values.min(), values.max()
+        for dtype in (np.int8, np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if info.min <= lo and hi <= info.max:
+                return values.astype(dtype)
+        return values
+    if kind == 'f' and values.dtype.itemsize > 4:
+        narrow = values.astype(np.float32)
+        if np.array_equal(narrow.astype(values.dtype), values, equal_nan=True):
+            return narrow
+    return values
+
+
+def compact_series(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_numeric_dtype(series):
+        return pd.Series(compact_numeric(series.to_numpy()), index=series.index, name=series.name)
+    if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+        distinct = series.nunique(dropna=True)
+        if use_categories(distinct, len(series)):
+            return series.astype("category")  # categories come out sorted
+    return series
+
+
+def compact_dtypes(frame):
+    """A copy of `frame` with compact column types (see the module docstring)."""
+    return pd.DataFrame({column: compact_series(frame[column]) for column in frame.columns}, copy=False)
+
+
+def is_categorical(values):
+    return isinstance(getattr(values, "dtype", None), pd.CategoricalDtype)
+
+
+def memory_report(before, after):
+    """Per-column dtype and bytes (strings included) of two versions of a frame, with totals."""
+    rows = []
+    for column in before.columns:
+        old = int(before[column].memory_usage(index=False, deep=True))
+        new = int(after[column].memory_usage(index=False, deep=True))
+        rows.append({"column": column, "before_dtype": str(before[column].dtype), "before_bytes": old,
+                     "after_dtype": str(after[column].dtype), "after_bytes": new})
+    report = pd.DataFrame(rows)
+    total = {"column": "TOTAL", "before_dtype": "", "before_bytes": int(report["before_bytes"].sum()),
+             "after_dtype": "", "after_bytes": int(report["after_bytes"].sum())}
+    report = pd.concat([report, pd.DataFrame([total])], ignore_index=True)
+    report["ratio"] = (report["before_bytes"] / report["after_bytes"].where(report["after_bytes"] > 0)).round(2)
+    return report
@@ -0,0 +1,341 @@
+"""Columnar on-disk copy of a CSV dataset, loaded through memory maps.
+
+The first load of `students.csv` converts it into one `.npy` file per column
+under `.students.columns/<content hash>/`. Later loads `np.load(mmap_mode='r')`
+those files and wrap them in a DataFrame without copying, so start-up does not
+re-parse text and every process reading the same version shares the page cache
+instead of holding a private copy.
+
+Numeric columns are stored in the smallest exact dtype (see schema.py).
+String columns are dictionary encoded (small integer codes + a sorted JSON
+list of values); low-cardinality ones load as categoricals straight over the
+mapped codes, the others are decoded with one vectorized take (the decoded
+strings are Python objects, private to each process). Conversion only reruns
+when the CSV content (or the on-disk format) changes.
+
+The conversion also writes what loading would otherwise rebuild in every
+process: the arrays behind the secondary indexes (see indexes.py) and the
+column statistics (see column_stats.py). Worker processes therefore attach
+to one published copy instead of each parsing, indexing and analyzing the
+file:
+
+- conversions are serialized by a lock file, so when several workers start
+  (or see the CSV change) at once, one converts and the others wait and
+  attach to its result;
+- a version directory is complete before it is renamed into place and never
+  modified afterwards; `CURRENT` is then replaced atomically, so a reader
+  sees either the old table or the new one, never a mix;
+- old versions are unlinked, not truncated, so processes still mapping them
+  keep reading valid data until they reload.
+
+`python storage.py students.csv --watch 2` runs a standalone publisher that
+republishes whenever the file changes, keeping conversions out of the
+request path of the web workers.
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import column_stats
+from indexes import DictionaryIndex, IndexSet, SortedIndex
+from schema import code_dtype, compact_numeric, use_categories
+
+try:
+    import fcntl
+except ImportError:  # e.g. Windows: concurrent conversions then race (see convert_csv)
+    fcntl = None
+
+MANIFEST = "manifest.json"
+CURRENT = "CURRENT"
+LOCK = ".lock"
+STATS = "stats.json"
+FORMAT = 3  # 2: compact numeric dtypes, sorted dictionaries; 3: persisted indexes and statistics
+
+
+def storage_dir(csv_path):
+    head, tail = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(head, f".{os.path.splitext(tail)[0]}.columns")
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _signature(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _read_current(root):
+    try:
+        with open(os.path.join(root, CURRENT)) as f:
+            version = f.read().strip()
+        with open(os.path.join(root, version, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _format_of(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f).get("format")
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, text):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+@contextlib.contextmanager
+def _conversion_lock(root):
+    """Hold the exclusive, cross-process lock on conversions into `root`."""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(root, LOCK), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _position_dtype(rows):
+    return np.int32 if rows < np.iinfo(np.int32).max else np.int64
+
+
+def _save_index(directory, i, values, entry):
+    """Save the index arrays of column `i` (stored as `values`) and describe them in `entry`."""
+    # Stable, so rows with equal values stay in row order; NaNs and missing codes sort to one end
+    order = np.argsort(values, kind='stable').astype(_position_dtype(len(values)))
+    if entry["kind"] == "dictionary":
+        counts = np.bincount(values[values >= 0], minlength=entry["size"])
+        offsets = np.concatenate([[len(values) - int(counts.sum())], counts]).cumsum()
+        entry["index"] = {"kind": "dictionary", "order": f"{i}.order.npy", "offsets": f"{i}.offsets.npy"}
+        np.save(os.path.join(directory, entry["index"]["offsets"]), offsets)
+    else:
+        entry["index"] = {"kind": "sorted", "order": f"{i}.order.npy", "sorted": f"{i}.sorted.npy",
+                          "valid": len(values) - int(pd.isna(values).sum())}
+        np.save(os.path.join(directory, entry["index"]["sorted"]), values[order])
+    np.save(os.path.join(directory, entry["index"]["order"]), order)
+
+
+def convert_csv(csv_path, version=None, previous_stats=None):
+    """Write the columnar copy of `csv_path` and make it current; returns its manifest.
+
+    `previous_stats` are those of the version being replaced: when the file
+    only had rows appended, they are extended rather than recomputed (see
+    column_stats.refresh).
+    """
+    root = storage_dir(csv_path)
+    os.makedirs(root, exist_ok=True)
+    version = version or file_hash(csv_path)
+    signature = _signature(csv_path)
+    frame = pd.read_csv(csv_path)
+
+    tmp_dir = tempfile.mkdtemp(dir=root, prefix=".tmp-")
+    os.chmod(tmp_dir, 0o755)  # readable by every worker process, like the CSV itself
+    columns = []
+    for i, column in enumerate(frame.columns):
+        series = frame[column]
+        entry = {"name": column, "file": f"{i}.npy"}
+        if pd.api.types.is_bool_dtype(series):
+            entry["kind"] = "numeric"
+            np.save(os.path.join(tmp_dir, entry["file"]), series.to_numpy())
+        elif pd.api.types.is_numeric_dtype(series):
+            entry["kind"] = "numeric"
+            values = compact_numeric(series.to_numpy())
+            np.save(os.path.join(tmp_dir, entry["file"]), values)
+            _save_index(tmp_dir, i, values, entry)
+        else:
+            codes, uniques = pd.factorize(series, sort=True, use_na_sentinel=True)
+            entry["kind"] = "dictionary"
+            entry["values"] = f"{i}.json"
+            entry["size"] = len(uniques)
+            codes = codes.astype(code_dtype(len(uniques)))
+            np.save(os.path.join(tmp_dir, entry["file"]), codes)
+            with open(os.path.join(tmp_dir, entry["values"]), "w") as f:
+                json.dump([str(value) for value in uniques], f)
+            _save_index(tmp_dir, i, codes, entry)
+        columns.append(entry)
+
+    manifest = {"version": version, "format": FORMAT, "source_signature": signature,
+                "rows": len(frame), "columns": columns}
+    # Statistics of the frame exactly as loading will see it (compact dtypes included)
+    stats = column_stats.refresh(previous_stats, _read_frame(tmp_dir, manifest))
+    with open(os.path.join(tmp_dir, STATS), "w") as f:
+        json.dump(stats.to_dict(), f)
+    manifest["stats"] = STATS
+    with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f)
+
+    final_dir = os.path.join(root, version)
+    if _format_of(final_dir) == FORMAT:
+        shutil.rmtree(tmp_dir)  # a concurrent conversion got there first
+    else:
+        if os.path.isdir(final_dir):
+            # Same content in an older format: move it aside; readers keep their mappings
+            stale = tempfile.mkdtemp(dir=root, prefix=".tmp-")
+            os.rename(final_dir, os.path.join(stale, version))
+            shutil.rmtree(stale, ignore_errors=True)
+        try:
+            os.rename(tmp_dir, final_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # lost a race with another converter
+    _write_atomic(os.path.join(root, CURRENT), version)
+    _remove_stale(root, keep=version)
+    return manifest
+
+
+def _remove_stale(root, keep):
+    for entry in os.listdir(root):
+        path = os.path.join(root, entry)
+        if entry != keep and os.path.isdir(path) and not entry.startswith(".tmp-"):
+            # Readers that still map the old files keep them alive until they unmap
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _is_fresh(manifest, csv_path):
+    return (manifest is not None and manifest.get("format") == FORMAT
+            and manifest["source_signature"] == _signature(csv_path))
+
+
+def ensure_columnar(csv_path):
+    """Manifest of an up-to-date columnar copy of `csv_path`, converting if needed."""
+    root = storage_dir(csv_path)
+    manifest = _read_current(root)
+    if _is_fresh(manifest, csv_path):
+        return manifest
+    os.makedirs(root, exist_ok=True)
+    with _conversion_lock(root):
+        # Another process may have published while this one waited for the lock
+        manifest = _read_current(root)
+        if _is_fresh(manifest, csv_path):
+            return manifest
+        version = file_hash(csv_path)
+        if manifest is not None and manifest.get("format") == FORMAT and version == manifest["version"]:
+            # mtime/size moved but the content did not: only record the new signature
+            manifest["source_signature"] = _signature(csv_path)
+            _write_atomic(os.path.join(root, version, MANIFEST), json.dumps(manifest))
+            return manifest
+        return convert_csv(csv_path, version, _previous_stats(csv_path, manifest))
+
+
+def _previous_stats(csv_path, manifest):
+    """Statistics of the current columnar copy, if it has readable ones."""
+    if manifest is None or manifest.get("format") != FORMAT:
+        return None
+    try:
+        return read_stats(csv_path, manifest)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _read_frame(directory, manifest):
+    data = {}
+    for entry in manifest["columns"]:
+        array = np.load(os.path.join(directory, entry["file"]), mmap_mode="r")
+        if entry["kind"] == "dictionary":
+            with open(os.path.join(directory, entry["values"])) as f:
+                values = json.load(f)
+            if use_categories(len(values), len(array)):
+                # Codes of a sorted dictionary are exactly a categorical's codes
+                array = pd.Categorical.from_codes(array, categories=values, validate=False)
+            else:
+                values = np.array(values + [np.nan], dtype=object)
+                array = values[array]  # code -1 picks the trailing NaN
+        data[entry["name"]] = array
+    # copy=False keeps one block per column, so numeric columns stay on the mmap
+    return pd.DataFrame(data, copy=False)
+
+
+def _version_dir(csv_path, manifest):
+    return os.path.join(storage_dir(csv_path), manifest["version"])
+
+
+def read_columnar(csv_path, manifest=None):
+    """Load the columnar copy of `csv_path` as a DataFrame backed by memory maps.
+
+    Returns (frame, version).
+    """
+    manifest = manifest or ensure_columnar(csv_path)
+    return _read_frame(_version_dir(csv_path, manifest), manifest), manifest["version"]
+
+
+def read_indexes(csv_path, manifest, frame):
+    """The IndexSet saved with `manifest`, over memory-mapped arrays.
+
+    `frame` is the table `read_columnar` loaded from the same manifest; it
+    supplies the dictionaries of string columns.
+    """
+    directory = _version_dir(csv_path, manifest)
+    def load(name):
+        return np.load(os.path.join(directory, name), mmap_mode="r")
+    indexes = {}
+    for entry in manifest["columns"]:
+        saved = entry.get("index")
+        if saved is None:
+            continue
+        column = entry["name"]
+        if saved["kind"] == "sorted":
+            indexes[column] = SortedIndex.from_arrays(column, load(saved["order"]), load(saved["sorted"]),
+                                                      saved["valid"])
+        else:
+            values = frame[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.cat.categories
+            else:
+                with open(os.path.join(directory, entry["values"])) as f:
+                    values = json.load(f)
+            indexes[column] = DictionaryIndex.from_arrays(column, values, load(saved["order"]),
+                                                          load(saved["offsets"]))
+    return IndexSet(indexes)
+
+
+def read_stats(csv_path, manifest):
+    """The column statistics saved with `manifest`, or None."""
+    if "stats" not in manifest:
+        return None
+    with open(os.path.join(_version_dir(csv_path, manifest), manifest["stats"])) as f:
+        return column_stats.TableStats.from_dict(json.load(f))
+
+
+def publish(csv_path, interval=None):
+    """Keep the columnar copy of `csv_path` current, checking every `interval` seconds (once if None)."""
+    while True:
+        manifest = ensure_columnar(csv_path)
+        print(f"{csv_path}: version {manifest['version']}, {manifest['rows']} rows", flush=True)
+        if interval is None:
+            return
+        while _is_fresh(_read_current(storage_dir(csv_path)), csv_path):
+            time.sleep(interval)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Publish the memory-mapped columnar copy of a CSV dataset.")
+    ap.add_argument("csv", nargs="?", default="students.csv")
+    ap.add_argument("--watch", type=float, default=None, metavar="SECONDS",
+                    help="keep running and republish when the file changes")
+    args = ap.parse_args()
+    try:
+        publish(args.csv, args.watch)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,123 @@
+"""Chunked execution for CSV files that do not fit in memory.
+
+The plan is split at the highest subtree made only of row-wise operators
+(Scan, Filter, Derive). That subtree runs on one `read_csv(chunksize=...)`
+chunk at a time and its output is folded into the blocking operator above it:
+
+- Aggregate keeps running per-group sum/count partials,
+- TopK keeps a bounded buffer of the best k rows seen so far,
+- Limit stops reading once enough rows have been produced,
+- anything else collects the (filtered) rows.
+
+The folded rows replace that operator with a `Values` node and the rest of the
+plan runs in memory with the regular executor, so results match in-memory
+execution while peak memory stays at one chunk plus the result.
+"""
+import pandas as pd
+
+from dataset import Dataset
+from executor import QueryError, execute_plan, check_clause, top_k
+from planner import Scan, Join, Filter, Derive, Aggregate, TopK, Limit, Plot, Values, find_node, plan_query
+
+DEFAULT_CHUNKSIZE = 100_000
+
+STREAMABLE = (Scan, Filter, Derive)
+
+
+def _is_streamable(node):
+    while node is not None:
+        if not isinstance(node, STREAMABLE):
+            return False
+        node = node.child
+    return True
+
+
+def _split(plan):
+    """(parent, subtree): `subtree` is the highest all-row-wise subtree, `parent` its consumer."""
+    parent, node = None, plan
+    while not _is_streamable(node):
+        parent, node = node, node.child
+    return parent, node
+
+
+def _chunks(subtree, path, chunksize):
+    scan = find_node(subtree, Scan)
+    usecols = None
+    if scan.columns is not None:
+        wanted = set(scan.columns)
+        usecols = lambda col: col in wanted
+    with pd.read_csv(path, chunksize=chunksize, usecols=usecols) as reader:
+        for chunk in reader:
+            yield execute_plan(subtree, Dataset(chunk, path, index=False))
+
+
+def _fold_aggregate(node, chunks):
+    partials = None
+    for frame in chunks:
+        part = check_clause(node, lambda: frame.groupby(node.group_col)[node.column].agg(['sum', 'count']))
+        partials = part if partials is None else partials.add(part, fill_value=0)
+    if partials is None:
+        return pd.DataFrame({node.group_col: [], node.column: []})
+    means = (partials['sum'] / partials['count']).rename(node.column)
+    return means.sort_index().rename_axis(node.group_col).reset_index()
+
+
+def _fold_top_k(node, chunks):
+    best = None
+    for frame in chunks:
+        # Earlier rows come first so ties resolve the same way as in memory
+        candidates = frame if best is None else pd.concat([best, frame])
+        best = check_clause(node, lambda: top_k(candidates, node.column, node.ascending, node.k))
+    return best
+
+
+def _fold_limit(node, chunks):
+    parts, remaining = [], node.n
+    for frame in chunks:
+        parts.append(frame.head(remaining))
+        remaining -= len(parts[-1])
+        if remaining <= 0:
+            break
+    return pd.concat(parts) if parts else None
+
+
+def execute_streaming(plan, path, chunksize=DEFAULT_CHUNKSIZE):
+    """Execute `plan` over the CSV at `path`, reading `chunksize` rows at a time."""
+    parent, subtree = _split(plan)
+    chunks = _chunks(subtree, path, chunksize)
+
+    if isinstance(parent, Aggregate):
+        folded, replace = _fold_aggregate(parent, chunks), parent
+    elif isinstance(parent, TopK):
+        folded, replace = _fold_top_k(parent, chunks), parent
+    elif isinstance(parent, Limit):
+        folded, replace = _fold_limit(parent, chunks), parent
+    else:
+        parts = list(chunks)
+        folded, replace = (pd.concat(parts) if parts else None), subtree
+    chunks.close()  # a Limit may stop early; release the file now
+
+    if folded is None:
+        # Empty file: run the untouched plan on an empty frame of the right shape
+        empty = pd.read_csv(path, nrows=0)
+        return execute_plan(plan, Dataset(empty, path, index=False))
+
+    values = Values(folded, 'streamed')
+    if replace is plan:
+        return execute_plan(values, None)
+    node = plan
+    while node.child is not replace:
+        node = node.child
+    node.child = values
+    return execute_plan(plan, None)
+
+
+def stream_query(parsed_query, path, chunksize=DEFAULT_CHUNKSIZE):
+    """Streaming counterpart of `executor.run_query`; returns (result, plot_type or None)."""
+    plan = plan_query(parsed_query)
+    if find_node(plan, Scan).sample is not None:
+        raise QueryError("Error in SAMPLE clause: not supported when streaming a file")
+    if find_node(plan, Join) is not None:
+        raise QueryError("Error in JOIN clause: not supported when streaming a file")
+    plot = find_node(plan, Plot)
+    return execute_streaming(plan, path, chunksize), (plot.kind if plot else None)
@@ -0,0 +1,56 @@
+"""Batches return what each statement returns on its own, sharing common work."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from batch import run_batch, split_statements  # noqa: E402
+from dataset import Dataset  # noqa: E402
+from executor import SharedWork, run_query  # noqa: E402
+from query_cache import parse_query  # noqa: E402
+
+rng = np.random.default_rng(0)
+STUDENTS = pd.DataFrame({
+    "name": [f"s{i}" for i in range(300)],
+    "class": rng.choice(["10A", "10B", "11A"], 300),
+    "grades": rng.integers(0, 101, 300),
+    "attendance": rng.integers(50, 101, 300),
+})
+
+SCRIPT = """
+-- weekly report; the ';' in "a;b" does not end a statement
+SELECT name, grades FROM students WHERE grades > 70 AND attendance > 80;
+SELECT AVG(grades) FROM students WHERE grades > 70 AND attendance > 80 GROUP BY class;
+SELECT AVG(attendance) FROM students WHERE grades > 70 AND attendance > 80 GROUP BY class;
+SELECT name FROM students WHERE name = "a;b";
+select name, grades from students where grades > 70 and attendance > 80;
+SELECT FROM;
+"""
+
+
+def test_split_statements_skips_comments_and_quoted_semicolons():
+    statements = split_statements(SCRIPT)
+    assert len(statements) == 6
+    assert statements[3] == 'SELECT name FROM students WHERE name = "a;b";'
+
+
+def test_batch_matches_individual_runs():
+    statements = split_statements(SCRIPT)
+    results = run_batch(statements, Dataset(STUDENTS), workers=4)
+    assert [r.statement for r in results] == statements
+    for r in results[:-1]:
+        alone, plot = run_query(parse_query(r.statement), Dataset(STUDENTS))
+        pd.testing.assert_frame_equal(r.result, alone)
+        assert (r.plot, r.error) == (plot, None)
+    assert results[-1].error == "Parsing failed."
+    assert results[4].result is results[0].result  # identical statements run once
+
+
+def test_common_filters_and_group_keys_are_computed_once():
+    shared = SharedWork()
+    run_batch(split_statements(SCRIPT)[:3], Dataset(STUDENTS), workers=1, shared=shared)
+    # One WHERE entry (reused twice) and one GROUP BY class entry (reused once)
+    assert shared.stats() == {"entries": 2, "hits": 3, "misses": 2}
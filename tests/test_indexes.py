@@ -0,0 +1,59 @@
+"""Index lookups return exactly the rows a scan selects, and queries use them."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dataset import Dataset  # noqa: E402
+from executor import run_query  # noqa: E402
+from expressions import evaluate  # noqa: E402
+from indexes import build_indexes  # noqa: E402
+from query_cache import parse_query  # noqa: E402
+
+rng = np.random.default_rng(0)
+grades = rng.integers(0, 101, 400).astype(float)
+grades[::17] = np.nan
+FRAME = pd.DataFrame({
+    "name": [f"s{i}" for i in range(400)],
+    "class": rng.choice(["10A", "10B", "11A", None], 400),
+    "grades": grades,
+})
+FRAMES = [FRAME, FRAME.astype({"class": "category"})]  # hash and dictionary indexes
+
+
+def where(text):
+    return parse_query(f"SELECT name FROM students WHERE {text};")[3][1]
+
+
+@pytest.mark.parametrize("frame", FRAMES, ids=["object", "category"])
+@pytest.mark.parametrize("text", [
+    "grades > 50", "grades >= 50", "grades < 20.5", "grades <= 0", "grades = 42",
+    "grades BETWEEN 10 AND 30", "grades IN (1, 2, 3, 99)",
+    'class = "10B"', 'class = "12Z"', 'class IN ("10A", "11A")',
+])
+def test_lookup_matches_scan(frame, text):
+    condition = where(text)
+    found = build_indexes(frame).lookup(condition)
+    assert found is not None
+    assert np.array_equal(found, np.flatnonzero(evaluate(frame, condition)))
+
+
+@pytest.mark.parametrize("text", [
+    "SELECT name, grades FROM students WHERE grades > 60 ORDER BY grades DESC;",
+    'SELECT name FROM students WHERE class = "10A" AND grades <= 30;',
+    "SELECT name, grades FROM students ORDER BY grades ASC LIMIT 10;",
+])
+def test_indexed_queries_match_scans(text):
+    indexed, _ = run_query(parse_query(text), Dataset(FRAME))
+    scanned, _ = run_query(parse_query(text), Dataset(FRAME, index=False))
+    pd.testing.assert_frame_equal(indexed.reset_index(drop=True), scanned.reset_index(drop=True))
+
+
+def test_explain_analyze_reports_index_use():
+    text = "EXPLAIN ANALYZE SELECT name FROM students WHERE grades > 90 ORDER BY grades DESC;"
+    plan, _ = run_query(parse_query(text), Dataset(FRAME))
+    assert {"index", "sorted index"} <= set(plan["detail"])
@@ -0,0 +1,62 @@
+"""JOIN queries through a catalog: renamed right columns behave like any other column."""
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from catalog import Catalog  # noqa: E402
+from executor import run_query  # noqa: E402
+from query_cache import parse_query  # noqa: E402
+
+STUDENTS = pd.DataFrame({
+    "name": ["ann", "bob", "cid", "dee"],
+    "class": ["10A", "10A", "10B", "10B"],
+    "grades": [70, 85, 60, 95],
+})
+EXAMS = pd.DataFrame({
+    "student": ["ann", "ann", "bob", "dee", "eve"],
+    "score": [91, 40, 88, 97, 99],
+    "grades": [93, 45, 80, 96, 99],
+})
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    STUDENTS.to_csv(tmp_path / "students.csv", index=False)
+    EXAMS.to_csv(tmp_path / "exams.csv", index=False)
+    return Catalog(data_dir=str(tmp_path))
+
+
+def query(catalog, text):
+    parsed = parse_query(text)
+    assert parsed, text
+    result, _ = run_query(parsed, catalog.dataset_for(parsed))
+    return result.reset_index(drop=True)
+
+
+def expected():
+    merged = STUDENTS.merge(EXAMS, left_on="name", right_on="student", suffixes=("", "_r"))
+    return merged.rename(columns={"grades_r": "exams_grades"})
+
+
+def test_select_star_renames_clashing_right_column(catalog):
+    result = query(catalog, "SELECT * FROM students JOIN exams ON name = student;")
+    assert list(result.columns) == ["name", "class", "grades", "student", "score", "exams_grades"]
+
+
+def test_renamed_column_can_be_selected_filtered_and_ordered(catalog):
+    result = query(catalog, "SELECT name, exams_grades FROM students JOIN exams ON name = student "
+                            "WHERE exams_grades > 90 ORDER BY exams_grades DESC;")
+    ref = expected()
+    ref = ref[ref["exams_grades"] > 90].sort_values("exams_grades", ascending=False)
+    assert result.values.tolist() == ref[["name", "exams_grades"]].values.tolist()
+
+
+def test_renamed_column_alongside_left_column(catalog):
+    result = query(catalog, "SELECT grades, exams_grades FROM students JOIN exams ON name = student "
+                            "ORDER BY grades ASC;")
+    ref = expected().sort_values("grades", kind="stable")
+    assert result.values.tolist() == ref[["grades", "exams_grades"]].values.tolist()
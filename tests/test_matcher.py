@@ -0,0 +1,34 @@
+"""The single-pass NL matcher reproduces the recorded outputs of the previous code."""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from intent_classifier import classify_intent  # noqa: E402
+from matcher_utils import analyze, analyze_batch, extract_entities  # noqa: E402
+
+# (query, intent, entities) recorded from the substring/regex implementation;
+# entities is "IndexError" where that implementation raised it
+GOLDEN = json.loads((Path(__file__).parent / "nl_golden.json").read_text())
+
+
+@pytest.mark.parametrize("case", GOLDEN, ids=lambda case: repr(case["query"])[:40])
+def test_golden(case):
+    assert classify_intent(case["query"]) == case["intent"]
+    if case["entities"] == "IndexError":
+        with pytest.raises(IndexError):
+            analyze(case["query"])
+        return
+    assert analyze(case["query"]) == (case["intent"], case["entities"])
+    assert extract_entities(case["query"]) == case["entities"]
+
+
+def test_batch_matches_single_queries_and_copies_entities():
+    queries = ["Top 5 students by grades", "top 5 students by grades", "pie chart of class distribution"]
+    results = analyze_batch(queries)
+    assert results == [analyze(query) for query in queries]
+    results[0][1]["limit"] = 99
+    assert results[1][1]["limit"] == 5
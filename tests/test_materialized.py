@@ -0,0 +1,73 @@
+"""Materialized GROUP BY AVG follows appends and in-place edits of the CSV."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dataset import Dataset, DatasetSource  # noqa: E402
+from executor import run_query  # noqa: E402
+from materialized import AggregateStore  # noqa: E402
+from query_cache import parse_query  # noqa: E402
+
+QUERY = parse_query("SELECT AVG(grades), class FROM students GROUP BY class;")
+EXPLAIN = parse_query("EXPLAIN ANALYZE SELECT AVG(grades), class FROM students GROUP BY class;")
+
+
+def students(rows, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "name": [f"s{seed}_{i}" for i in range(rows)],
+        "class": rng.choice(["10A", "10B", "11A"], rows),
+        "grades": rng.integers(10, 100, rows),
+    })
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "students.csv"
+    students(200, 0).to_csv(path, index=False)
+    source = DatasetSource(str(path))
+    source.materialize("class", "grades")
+    return source
+
+
+def check(source):
+    """The materialized answer is used and equals a scan of the current file."""
+    ds = source.current()
+    result, _ = run_query(QUERY, ds)
+    scanned, _ = run_query(QUERY, Dataset(pd.read_csv(source.path)))
+    assert result["class"].astype(str).tolist() == scanned["class"].astype(str).tolist()
+    np.testing.assert_allclose(result["grades"], scanned["grades"])
+    assert "materialized" in run_query(EXPLAIN, ds)[0]["detail"].tolist()
+
+
+def test_appended_rows_are_folded_in(source):
+    check(source)
+    students(50, 1).to_csv(source.path, mode="a", header=False, index=False)
+    store = source.aggregates
+    assert store.refresh() == 50  # only the appended rows are read
+    assert store.rows == 250
+    check(source)
+
+
+def test_in_place_edit_rebuilds_the_state(source):
+    check(source)
+    frame = pd.read_csv(source.path)
+    frame.loc[0, "grades"] = 99 if frame.loc[0, "grades"] != 99 else 98  # same size, same tail
+    frame.to_csv(source.path, index=False)
+    check(source)
+
+
+def test_answer_requires_the_covered_version(tmp_path):
+    path = tmp_path / "students.csv"
+    students(20, 0).to_csv(path, index=False)
+    store = AggregateStore(str(path))
+    store.declare("class", "grades")
+    store.refresh()
+    assert store.answer("class", "grades", store.version) is not None
+    assert store.answer("class", "grades", "other") is None
+    assert store.answer("class", "attendance", store.version) is None
@@ -0,0 +1,41 @@
+"""ORDER BY gives ties the same order in memory, through an index and when streaming."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dataset import Dataset  # noqa: E402
+from executor import run_query  # noqa: E402
+from query_cache import parse_query  # noqa: E402
+from streaming import stream_query  # noqa: E402
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        "name": [f"s{i}" for i in range(500)],
+        "attendance": rng.integers(0, 5, 500),  # many ties
+        "grades": rng.integers(0, 101, 500),
+    })
+    path = tmp_path / "students.csv"
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("text", [
+    "SELECT name, attendance FROM students ORDER BY attendance DESC;",
+    "SELECT name, attendance FROM students ORDER BY attendance ASC;",
+    "SELECT name, attendance FROM students WHERE grades > 50 ORDER BY attendance DESC;",
+])
+def test_ties_keep_row_order_on_every_path(csv_path, text):
+    parsed = parse_query(text)
+    frame = pd.read_csv(csv_path)
+    indexed, _ = run_query(parsed, Dataset(frame))
+    scanned, _ = run_query(parsed, Dataset(frame, index=False))
+    streamed, _ = stream_query(parsed, csv_path, chunksize=64)
+    assert indexed["name"].tolist() == scanned["name"].tolist() == streamed["name"].tolist()
@@ -0,0 +1,91 @@
+"""Cursor pages cover a result exactly once; exports stream the same rows in chunks."""
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app as webapp  # noqa: E402
+from catalog import Catalog  # noqa: E402
+from pagination import CursorError, StaleCursor, decode_cursor, export_chunks, paginate  # noqa: E402
+
+rng = np.random.default_rng(0)
+STUDENTS = pd.DataFrame({
+    "name": [f"s{i}" for i in range(250)],
+    "class": rng.choice(["10A", "10B"], 250),
+    "grades": rng.integers(0, 101, 250),
+    "attendance": rng.uniform(50, 100, 250).round(2),
+})
+STATEMENT = "SELECT name, grades FROM students WHERE grades > 20 ORDER BY grades DESC;"
+
+
+def test_cursors_walk_every_row_once():
+    rows, cursor, offset = [], None, 0
+    while True:
+        page = paginate(STUDENTS, STATEMENT, "v1", offset, 40)
+        rows.append(page.rows)
+        if page.next_cursor is None:
+            break
+        cursor = decode_cursor(page.next_cursor, "v1")
+        assert (cursor.statement, cursor.offset - offset) == (STATEMENT, 40)
+        offset = cursor.offset
+    pd.testing.assert_frame_equal(pd.concat(rows), STUDENTS)
+    assert decode_cursor(page.prev_cursor).offset == offset - 40
+
+
+def test_cursor_errors():
+    token = paginate(STUDENTS, STATEMENT, "v1", 0, 40).next_cursor
+    with pytest.raises(StaleCursor):
+        decode_cursor(token, "v2")
+    with pytest.raises(CursorError):
+        decode_cursor("not-a-cursor")
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 64, 10_000])
+def test_export_chunks_match_the_in_memory_result(chunk_rows):
+    csv = list(export_chunks(STUDENTS, "csv", chunk_rows))
+    assert len(csv) == 1 + -(-len(STUDENTS) // chunk_rows)  # header, then one chunk per slice
+    assert "".join(csv) == STUDENTS.to_csv(index=False)
+    lines = "".join(export_chunks(STUDENTS, "ndjson", chunk_rows)).splitlines()
+    assert [json.loads(line) for line in lines] == STUDENTS.to_dict(orient="records")
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    path = tmp_path / "students.csv"
+    STUDENTS.to_csv(path, index=False)
+    monkeypatch.setattr(webapp, "catalog", Catalog(paths={"students": str(path)}))
+    return webapp.app.test_client(), path
+
+
+def test_pages_are_stable_until_the_data_changes(client):
+    client, path = client
+    first = client.get("/results", query_string={"query": STATEMENT, "page_size": 30}).get_json()
+    expected = STUDENTS[STUDENTS.grades > 20].sort_values("grades", ascending=False, kind="stable")
+    pages, reply = [first["data"]], first
+    while reply["next_cursor"]:
+        again = client.get("/results", query_string={"cursor": reply["next_cursor"]}).get_json()
+        reply = client.get("/results", query_string={"cursor": reply["next_cursor"]}).get_json()
+        assert reply["data"] == again["data"]
+        pages.append(reply["data"])
+    assert [row[0] for page in pages for row in page] == expected["name"].tolist()
+
+    STUDENTS.iloc[:100].to_csv(path, index=False)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert client.get("/results", query_string={"cursor": first["next_cursor"]}).status_code == 410
+
+
+def test_export_route_streams_the_result(client):
+    client, _ = client
+    reply = client.get("/export", query_string={"query": STATEMENT, "format": "csv"})
+    assert reply.is_streamed and reply.mimetype == "text/csv"
+    exported = pd.read_csv(io.StringIO(reply.get_data(as_text=True)))
+    assert len(exported) == int((STUDENTS.grades > 20).sum())
+    assert client.get("/export", query_string={"query": STATEMENT, "format": "xml"}).status_code == 400
@@ -0,0 +1,42 @@
+"""The parse cache keys on normalized text and keeps only clean parses."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from edsql_compiler import parser  # noqa: E402
+from query_cache import LRUCache, ParseCache, normalize_query  # noqa: E402
+
+QUERY = 'SELECT name FROM students WHERE class = "10a";'
+
+
+def test_normalization_keeps_identifiers_and_string_literals():
+    text = '  select   name from students\n where class = "10a" ; '
+    assert normalize_query(text) == 'SELECT name FROM students WHERE class = "10a" ;'
+    assert normalize_query('SELECT Name FROM students;') != normalize_query('SELECT name FROM students;')
+    assert normalize_query('SELECT name FROM students WHERE class = "10A";') != normalize_query(QUERY)
+
+
+def test_equivalent_texts_share_one_cached_ast():
+    cache = ParseCache()
+    first = cache.parse(QUERY)
+    assert first == parser.parse(QUERY)
+    assert cache.parse('select name   from students where class = "10a";') is first
+    assert (cache.stats()["hits"], cache.stats()["size"]) == (1, 1)
+
+
+def test_failed_and_recovered_parses_are_not_cached():
+    cache = ParseCache()
+    assert not cache.parse("SELECT FROM;")
+    assert cache.parse("junk SELECT name FROM students;", strict=True) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.stats()["evictions"] == 1
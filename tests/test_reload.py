@@ -0,0 +1,76 @@
+"""Cached results follow the dataset version; the dataset reloads when its file changes."""
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dataset import DatasetSource, load_csv_dataset, load_dataset  # noqa: E402
+from executor import run_query  # noqa: E402
+from query_cache import ResultCache, parse_query  # noqa: E402
+from storage import storage_dir  # noqa: E402
+
+QUERY = parse_query("SELECT name, grades FROM students WHERE grades > 80;")
+STUDENTS = pd.DataFrame({
+    "name": ["ann", "bob", "cid", "dee"],
+    "class": ["10A", "10A", "10B", "10B"],
+    "grades": [70, 85, 60, 95],
+})
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "students.csv"
+    STUDENTS.to_csv(path, index=False)
+    return path
+
+
+def rewrite(path, frame):
+    """Write `frame` to `path` and move the mtime on, as a later edit would."""
+    frame.to_csv(path, index=False)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def test_results_are_reused_until_the_version_changes(csv_path):
+    source, cache = DatasetSource(str(csv_path)), ResultCache()
+    source.on_reload(lambda ds: cache.invalidate(ds.version))
+    first, _ = run_query(QUERY, source.current(), cache)
+    assert run_query(QUERY, source.current(), cache)[0] is first
+
+    edited = STUDENTS.copy()
+    edited.loc[0, "grades"] = 99
+    rewrite(csv_path, edited)
+    second, _ = run_query(QUERY, source.current(), cache)
+    assert second["name"].tolist() == ["ann", "bob", "dee"]
+    assert cache.stats()["size"] == 1  # the stale entry was dropped on reload
+
+
+def test_touching_the_file_keeps_the_version(csv_path):
+    source = DatasetSource(str(csv_path))
+    version = source.version
+    rewrite(csv_path, STUDENTS)
+    assert source.version == version
+
+
+def same_frame(columnar, parsed):
+    # Compared by value: the columnar arrays are memory maps, the parsed ones plain arrays
+    assert columnar.frame.dtypes.equals(parsed.frame.dtypes)
+    assert columnar.frame.astype(object).equals(parsed.frame.astype(object))
+
+
+def test_columnar_copy_round_trips_and_follows_in_place_edits(csv_path):
+    columnar = load_dataset(str(csv_path))
+    assert os.path.isdir(storage_dir(str(csv_path)))
+    same_frame(columnar, load_csv_dataset(str(csv_path)))
+
+    edited = STUDENTS.copy()
+    edited.loc[2, "class"] = "11C"  # same size, new category
+    rewrite(csv_path, edited)
+    reloaded = load_dataset(str(csv_path))
+    assert reloaded.version != columnar.version
+    assert reloaded.frame["class"].astype(str).tolist() == edited["class"].tolist()
+    same_frame(reloaded, load_csv_dataset(str(csv_path)))
@@ -0,0 +1,58 @@
+"""Charts are handed out by id and fetched once rendered, without blocking the request."""
+import sys
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app as webapp  # noqa: E402
+import rendering  # noqa: E402
+from catalog import Catalog  # noqa: E402
+from rendering import ChartRenderer  # noqa: E402
+
+RESULT = pd.DataFrame({"class": ["10A", "10B"], "grades": [70.0, 85.0]})
+QUERY = "SELECT class, AVG(grades) FROM students GROUP BY class PLOT BAR GRAPH;"
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    """Renders wait until the returned event is set."""
+    release = threading.Event()
+    render = rendering._render
+    monkeypatch.setattr(rendering, "_render", lambda *args: release.wait(5) and render(*args))
+    yield release
+    release.set()
+
+
+def test_start_returns_before_the_chart_is_drawn(gate):
+    renderer = ChartRenderer(workers=1)
+    chart_id, future = renderer.start(RESULT, "BAR", "json")
+    assert not future.done()
+    assert renderer.poll(chart_id) is None
+    gate.set()
+    future.result(5)
+    assert renderer.poll(chart_id)["type"] == "bar"
+    assert renderer.start(RESULT, "BAR", "json")[1].done()  # cached charts are ready at once
+    with pytest.raises(KeyError):
+        renderer.poll("unknown")
+
+
+def test_page_polls_the_chart_route(tmp_path, monkeypatch, gate):
+    path = tmp_path / "students.csv"
+    pd.DataFrame({"name": ["ann", "bob"], "class": ["10A", "10B"], "grades": [70, 85]}).to_csv(path, index=False)
+    monkeypatch.setattr(webapp, "catalog", Catalog(paths={"students": str(path)}))
+    monkeypatch.setattr(webapp, "renderer", ChartRenderer(workers=1))
+    monkeypatch.setattr(webapp.app, "template_folder", str(Path(webapp.__file__).parent))  # index.html sits at the root
+    client = webapp.app.test_client()
+
+    page = client.post("/", data={"query": QUERY, "chart_format": "json"}).get_data(as_text=True)
+    url = page.split('data-url="')[1].split('"')[0]
+    assert client.get(url).status_code == 202
+    gate.set()
+    webapp.renderer.charts.get(url.rsplit("/", 1)[1]).result(5)
+    reply = client.get(url)
+    assert reply.status_code == 200 and reply.get_json()["status"] == "done"
+    assert client.get("/chart/unknown").status_code == 404
@@ -0,0 +1,60 @@
+"""SAMPLE n PERCENT: sample sizes, confidence intervals and repeatable answers."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dataset import Dataset  # noqa: E402
+from executor import QueryError, run_query  # noqa: E402
+from query_cache import parse_query  # noqa: E402
+
+rng = np.random.default_rng(0)
+STUDENTS = pd.DataFrame({
+    "name": [f"s{i}" for i in range(5_000)],
+    "class": rng.choice(["10A", "10B", "11A", "12C"], 5_000, p=[0.5, 0.3, 0.199, 0.001]),
+    "grades": rng.normal(70, 12, 5_000),
+})
+COLUMNS = ["grades", "grades_ci_low", "grades_ci_high", "grades_n", "class"]
+
+
+def query(text, version="v1"):
+    return run_query(parse_query(text), Dataset(STUDENTS, version=version))[0]
+
+
+def test_group_means_come_with_confidence_intervals():
+    result = query("SELECT AVG(grades), class FROM students GROUP BY class SAMPLE 20 PERCENT;")
+    assert list(result.columns) == COLUMNS
+    exact = STUDENTS.groupby("class")["grades"].agg(["mean", "count"])
+    assert result["class"].tolist() == exact.index.tolist()  # the tiny group is sampled too
+    assert (result["grades_n"].to_numpy() >= np.maximum(2, np.round(exact["count"] * 0.2) - 1)).all()
+    low, high = result["grades_ci_low"].to_numpy(), result["grades_ci_high"].to_numpy()
+    assert (low <= result["grades"]).all() and (result["grades"] <= high).all()
+    assert ((low <= exact["mean"].to_numpy()) & (exact["mean"].to_numpy() <= high)).sum() >= 3
+
+
+def test_same_version_gives_the_same_answer():
+    text = "SELECT AVG(grades), class FROM students GROUP BY class SAMPLE 10 PERCENT;"
+    pd.testing.assert_frame_equal(query(text), query(text))
+    assert not query(text).equals(query(text, version="v2"))
+
+
+def test_full_sample_is_exact():
+    result = query("SELECT AVG(grades), class FROM students GROUP BY class SAMPLE 100 PERCENT;")
+    exact = STUDENTS.groupby("class")["grades"].mean().to_numpy()
+    np.testing.assert_allclose(result["grades"], exact)
+    np.testing.assert_allclose(result["grades_ci_low"], exact)
+    np.testing.assert_allclose(result["grades_ci_high"], exact)
+
+
+def test_uniform_sample_size():
+    assert len(query("SELECT name FROM students SAMPLE 10 PERCENT;")) == 500
+
+
+@pytest.mark.parametrize("percent", ["0", "150"])
+def test_percent_out_of_range(percent):
+    with pytest.raises(QueryError, match="SAMPLE clause"):
+        query(f"SELECT name FROM students SAMPLE {percent} PERCENT;")
@@ -0,0 +1,58 @@
+"""Column statistics on the columnar load path: refreshed from appended rows."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import column_stats  # noqa: E402
+from dataset import load_dataset  # noqa: E402
+
+ROWS = column_stats.EXACT_ROWS + 5_000  # big enough to be refreshed rather than rebuilt
+
+
+def students(rows, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "name": [f"s{seed}_{i}" for i in range(rows)],
+        "class": rng.choice(["10A", "10B", "11A"], rows),
+        "grades": rng.integers(0, 101, rows),
+    })
+
+
+@pytest.fixture
+def analyzed(monkeypatch):
+    """Row counts of the frames `column_stats.analyze` is called on."""
+    calls = []
+    analyze = column_stats.analyze
+    monkeypatch.setattr(column_stats, "analyze", lambda frame: calls.append(len(frame)) or analyze(frame))
+    return calls
+
+
+def test_append_extends_the_stored_statistics(tmp_path, analyzed):
+    path = tmp_path / "students.csv"
+    students(ROWS, 0).to_csv(path, index=False)
+    assert load_dataset(str(path)).stats.rows == ROWS
+    assert analyzed == [ROWS]
+
+    extra = students(1_000, 1)
+    extra.loc[0, "grades"] = 250  # new maximum, only in the appended rows
+    extra.to_csv(path, mode="a", header=False, index=False)
+    stats = load_dataset(str(path)).stats
+    assert analyzed == [ROWS, 1_000]
+    assert stats.rows == ROWS + 1_000
+    assert stats.get("grades").max == 250
+
+
+def test_in_place_edit_is_analyzed_from_scratch(tmp_path, analyzed):
+    path = tmp_path / "students.csv"
+    frame = students(ROWS, 0)
+    frame.to_csv(path, index=False)
+    load_dataset(str(path))
+    frame.loc[0, "grades"] = 0 if frame.loc[0, "grades"] else 1
+    frame.to_csv(path, index=False)
+    assert load_dataset(str(path)).stats.rows == ROWS
+    assert analyzed == [ROWS, ROWS]
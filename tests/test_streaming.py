@@ -0,0 +1,51 @@
+"""Chunked streaming execution returns what in-memory execution returns."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dataset import Dataset  # noqa: E402
+from executor import QueryError, run_query  # noqa: E402
+from query_cache import parse_query  # noqa: E402
+from streaming import stream_query  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def csv_path(tmp_path_factory):
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({
+        "name": [f"s{i}" for i in range(1_000)],
+        "class": rng.choice(["10A", "10B", "11A"], 1_000),
+        "grades": rng.integers(0, 101, 1_000),
+        "attendance": rng.uniform(50, 100, 1_000).round(1),
+    })
+    path = tmp_path_factory.mktemp("data") / "students.csv"
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("text", [
+    "SELECT name, grades FROM students WHERE grades > 50 AND attendance < 80;",
+    "SELECT AVG(grades), class FROM students GROUP BY class;",
+    'SELECT AVG(attendance), class FROM students WHERE class != "11A" GROUP BY class;',
+    "SELECT name, grades FROM students ORDER BY grades DESC LIMIT 25;",
+    "SELECT name FROM students WHERE grades BETWEEN 10 AND 20 LIMIT 7;",
+    "SELECT * FROM students;",
+])
+@pytest.mark.parametrize("chunksize", [7, 97, 5_000])
+def test_streaming_matches_in_memory(csv_path, text, chunksize):
+    parsed = parse_query(text)
+    expected, plot = run_query(parsed, Dataset(pd.read_csv(csv_path)))
+    streamed, streamed_plot = stream_query(parsed, csv_path, chunksize=chunksize)
+    pd.testing.assert_frame_equal(streamed.reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False)
+    assert streamed_plot == plot
+
+
+def test_sample_is_refused(csv_path):
+    with pytest.raises(QueryError, match="SAMPLE clause"):
+        stream_query(parse_query("SELECT name FROM students SAMPLE 10 PERCENT;"), csv_path)
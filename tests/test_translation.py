@@ -0,0 +1,80 @@
+"""NL → EDSQL translators and the two-tier translation cache."""
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import translation  # noqa: E402
+from dataset import Dataset  # noqa: E402
+from executor import run_query  # noqa: E402
+from query_cache import parse_query  # noqa: E402
+from translation import (  # noqa: E402
+    CachingTranslator, IntentTranslator, StubTranslator, TranslationCache, normalize_nl,
+)
+
+STUDENTS = pd.DataFrame({
+    "name": ["ann", "bob", "cid", "dee"],
+    "class": ["10A", "10A", "10B", "10B"],
+    "section": ["A", "B", "A", "B"],
+    "grades": [70, 85, 60, 95],
+    "attendance": [90, 75, 80, 99],
+})
+
+SELECT = "SELECT name, grades FROM students WHERE grades > 80;"
+
+
+@pytest.mark.parametrize("intent", sorted(IntentTranslator.QUERIES))
+def test_canned_queries_parse_and_run(intent):
+    parsed = parse_query(IntentTranslator.QUERIES[intent])
+    assert parsed
+    result, _ = run_query(parsed, Dataset(STUDENTS))
+    assert len(result)
+
+
+def test_unparseable_reply_is_returned_but_not_cached():
+    llm = StubTranslator(lambda q: "Sure! Here is the query: SELECT name FROM students;")
+    translator = CachingTranslator([llm])
+    edsql, name, cached = translator.translate_with_source("names please")
+    assert (name, cached) == ("stub", False) and edsql.startswith("Sure!")
+    translator.translate("names please")
+    assert llm.calls == 2
+    assert translator.cache.get(normalize_nl("names please")) is None
+
+
+def test_falls_through_to_a_translator_whose_reply_parses():
+    bad, good = StubTranslator(lambda q: "not edsql", name="bad"), StubTranslator(lambda q: SELECT, name="good")
+    translator = CachingTranslator([bad, good])
+    assert translator.translate_with_source("top students") == (SELECT, "good", False)
+    assert translator.translate_with_source("Top students?") == (SELECT, "good", True)
+    assert (bad.calls, good.calls) == (1, 1)
+
+
+def test_memory_miss_falls_back_to_sqlite(tmp_path):
+    path = str(tmp_path / "translations.sqlite3")
+    first = TranslationCache(path=path)
+    first.put("top students", SELECT, "gemini")
+    first.close()
+
+    second = TranslationCache(path=path)
+    assert second.memory.get("top students") is None
+    assert second.get("top students") == (SELECT, "gemini")
+    assert second.memory.get("top students") is not None  # promoted to the memory tier
+    assert second.stats()["disk"]["gemini"]["hits"] == 1
+    second.close()
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(translation.time, "time", lambda: now[0])
+    cache = TranslationCache(path=str(tmp_path / "translations.sqlite3"), ttl=60)
+    cache.put("top students", SELECT, "gemini")
+    now[0] += 59
+    assert cache.get("top students") == (SELECT, "gemini")
+    now[0] += 2
+    assert cache.get("top students") is None
+    cache.memory.clear()
+    assert cache.get("top students") is None  # gone from disk as well
+    cache.close()
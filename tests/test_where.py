@@ -0,0 +1,74 @@
+"""Compound WHERE conditions: parsing, results against pandas, and conjunct order."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dataset import Dataset  # noqa: E402
+from executor import run_query  # noqa: E402
+from expressions import conjuncts, evaluate, predicate_rank  # noqa: E402
+from query_cache import parse_query  # noqa: E402
+
+FRAME = pd.DataFrame({
+    "class": ["10A", "10B", "11A", "12B", "9C", None],
+    "grades": [97, 40, 60, 80, 99, 70],
+})
+
+rng = np.random.default_rng(0)
+STUDENTS = pd.DataFrame({
+    "name": [f"s{i}" for i in range(300)],
+    "class": rng.choice(["10A", "10B", "11A"], 300),
+    "grades": rng.integers(0, 101, 300),
+    "attendance": rng.uniform(50, 100, 300).round(1),
+})
+
+
+def where(text):
+    return parse_query(f"SELECT class FROM students WHERE {text};")[3][1]
+
+
+@pytest.mark.parametrize("text", [
+    'class > "10B" OR grades > 95',
+    'NOT class <= "10B" AND grades > 50',
+    'class BETWEEN "10A" AND "11B" OR NOT grades < 70',
+    'class IN ("9C", "12B") OR class != "10A"',
+])
+def test_compound_condition_on_categorical(text):
+    compact = FRAME.astype({"class": "category"})
+    assert np.array_equal(evaluate(compact, where(text)), evaluate(FRAME, where(text)))
+
+
+def test_precedence_is_not_then_and_then_or():
+    assert where('grades > 1 OR grades < 2 AND NOT class = "3"') == (
+        'OR', ('CONDITION', 'grades', '>', 1),
+        ('AND', ('CONDITION', 'grades', '<', 2), ('NOT', ('CONDITION', 'class', '=', '3'))),
+    )
+    assert where('(grades > 1 OR grades < 2) AND grades BETWEEN 1.5 AND 2.5') == (
+        'AND', ('OR', ('CONDITION', 'grades', '>', 1), ('CONDITION', 'grades', '<', 2)),
+        ('CONDITION', 'grades', 'BETWEEN', (1.5, 2.5)),
+    )
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('grades > 60 AND attendance >= 75.5', (STUDENTS.grades > 60) & (STUDENTS.attendance >= 75.5)),
+    ('class = "10A" OR grades < 10', (STUDENTS["class"] == "10A") | (STUDENTS.grades < 10)),
+    ('NOT class IN ("10A", "10B") AND grades BETWEEN 40 AND 60',
+     ~STUDENTS["class"].isin(["10A", "10B"]) & STUDENTS.grades.between(40, 60)),
+    ('(grades > 90 OR attendance < 55.0) AND NOT class = "11A"',
+     ((STUDENTS.grades > 90) | (STUDENTS.attendance < 55.0)) & (STUDENTS["class"] != "11A")),
+])
+def test_query_matches_pandas(text, expected):
+    parsed = parse_query(f"SELECT name FROM students WHERE {text};")
+    for ds in (Dataset(STUDENTS), Dataset(STUDENTS, index=False)):
+        result, _ = run_query(parsed, ds)
+        assert result["name"].tolist() == STUDENTS.loc[expected, "name"].tolist()
+
+
+def test_selective_cheap_conjuncts_go_first():
+    condition = where('(grades > 1 OR grades < 2) AND attendance > 50 AND class = "10A"')
+    ordered = sorted(conjuncts(condition), key=predicate_rank)
+    assert [c[0] if c[0] != 'CONDITION' else c[2] for c in ordered] == ['=', '>', 'OR']
@@ -0,0 +1,295 @@
+"""Natural language → EDSQL translation with a two-tier cache.
+
+A `Translator` turns a question into EDSQL (or None if it cannot). The rule
+based translators are cheap; `GeminiTranslator` is a paid network call. A
+`CachingTranslator` tries its translators in order and remembers the first
+answer in a `TranslationCache`:
+
+- an in-memory LRU in front of
+- a SQLite table that survives restarts,
+
+keyed on the normalized question. Each entry records which translator
+produced it and when, so entries can expire (`ttl`) or be dropped per
+translator. Failed translations, and replies that do not parse as EDSQL
+(e.g. free-form LLM text), are not cached.
+
+Tests can swap the LLM for `StubTranslator`.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from query_cache import LRUCache, is_valid_edsql
+
+DEFAULT_DB = os.environ.get("EDSQL_TRANSLATION_DB", ".edsql_translations.sqlite3")
+DEFAULT_TTL = 30 * 24 * 3600  # seconds
+
+# ------------------ Normalization ------------------
+
+_SPACE_RE = re.compile(r"\s+")
+
+def normalize_nl(text):
+    """Cache key for a question: lower case, single spaces, no trailing punctuation."""
+    return _SPACE_RE.sub(" ", text).strip().lower().rstrip("?.! ")
+
+# ------------------ Translators ------------------
+
+class Translator:
+    """Base class: `translate(nl_query)` returns EDSQL text or None."""
+
+    name = "translator"
+
+    def translate(self, nl_query):
+        raise NotImplementedError
+
+
+class IntentTranslator(Translator):
+    """Canned EDSQL for each intent recognized by `classify_intent`."""
+
+    name = "intent"
+
+    QUERIES = {
+        "average_query": 'SELECT AVG(grades) FROM students GROUP BY class;',
+        "performance_query": 'SELECT CUSTOM_METRIC(PERFORMANCE_SCORE, grades, attendance) FROM students;',
+        "plot_bar": 'SELECT name, grades FROM students PLOT BAR GRAPH;',
+        "plot_line": 'SELECT name, grades FROM students PLOT LINE GRAPH;',
+        "plot_pie": 'SELECT class FROM students PLOT PIE CHART;',
+        "top_n_query": 'SELECT name, grades FROM students ORDER BY grades DESC LIMIT 5;',
+        "conditional_query": 'SELECT name, grades FROM students WHERE grades > 80;',
+    }
+
+    def translate(self, nl_query):
+        from intent_classifier import classify_intent
+        return self.QUERIES.get(classify_intent(nl_query))
+
+
+class EntityTranslator(Translator):
+    """EDSQL assembled from the entities `extract_entities` finds."""
+
+    name = "entities"
+
+    def translate(self, nl_query):
+        from convert_to_edsql import convert_entities_to_edsql
+        return convert_entities_to_edsql(nl_query)
+
+
+GEMINI_PROMPT = """
+You are an expert in converting natural language to a custom SQL-like language called EDSQL.
+EDSQL has these rules:
+
+- SELECT ... FROM students;
+- SELECT name, grades FROM students WHERE grades > 80;
+- SELECT AVG(grades) FROM students GROUP BY class;
+- SELECT name, grades FROM students ORDER BY grades DESC LIMIT 5;
+- SELECT class FROM students PLOT PIE CHART;
+- SELECT name, grades FROM students PLOT BAR GRAPH;
+- SELECT CUSTOM_METRIC(PERFORMANCE_SCORE, grades, attendance) FROM students;
+
+Now convert the following natural language query to EDSQL:
+
+"{nl_query}"
+
+Only return the EDSQL code. No explanation.
+Only return valid EDSQL syntax without using '*'. List all columns explicitly. No explanation.
+
+"""
+
+
+class GeminiTranslator(Translator):
+    """Asks the Gemini model; `get_model` returns the client (created on first use)."""
+
+    name = "gemini"
+
+    def __init__(self, get_model=None):
+        if get_model is None:
+            from nlp_models import get_gemini_model as get_model
+        self.get_model = get_model
+
+    def translate(self, nl_query):
+        try:
+            response = self.get_model().generate_content(GEMINI_PROMPT.format(nl_query=nl_query))
+            return response.text.strip()
+        except Exception as e:
+            print("Gemini fallback failed:", e)
+            return None
+
+
+class StubTranslator(Translator):
+    """Local stand-in for the LLM: answers from a dict (by normalized question) or a function."""
+
+    name = "stub"
+
+    def __init__(self, answers=None, name=None):
+        self.answers = answers or {}
+        self.name = name or self.name
+        self.calls = 0
+
+    def translate(self, nl_query):
+        self.calls += 1
+        if callable(self.answers):
+            return self.answers(nl_query)
+        return self.answers.get(normalize_nl(nl_query))
+
+# ------------------ Cache ------------------
+
+class TranslationCache:
+    """Memory LRU over a SQLite store of (question → EDSQL, translator, created).
+
+    `namespace` keeps pipelines with different translators apart in one file.
+    `path=None` keeps the cache in memory only.
+    """
+
+    def __init__(self, path=DEFAULT_DB, namespace="default", maxsize=1024, ttl=DEFAULT_TTL, max_rows=100_000):
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.memory = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS translations (
+                    namespace TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    edsql TEXT NOT NULL,
+                    translator TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (namespace, question)
+                )""")
+            self._db.commit()
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, question):
+        """(edsql, translator) for a normalized question, or None."""
+        now = time.time()
+        entry = self.memory.get(question)
+        if entry is not None:
+            if not self._expired(entry[2], now):
+                return entry[:2]
+            self.memory.pop(question)
+        if self._db is None:
+            return None
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT edsql, translator, created FROM translations WHERE namespace = ? AND question = ?",
+                (self.namespace, question),
+            ).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[2], now):
+                self._db.execute("DELETE FROM translations WHERE namespace = ? AND question = ?",
+                                 (self.namespace, question))
+                self._db.commit()
+                return None
+            self._db.execute(
+                "UPDATE translations SET hits = hits + 1, last_used = ? WHERE namespace = ? AND question = ?",
+                (now, self.namespace, question),
+            )
+            self._db.commit()
+        self.memory.put(question, row)
+        return row[:2]
+
+    def put(self, question, edsql, translator):
+        now = time.time()
+        self.memory.put(question, (edsql, translator, now))
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (self.namespace, question, edsql, translator, now, now),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        # Least recently used rows beyond `max_rows`; expired rows go as well
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM translations WHERE namespace = ? AND created < ?",
+                             (self.namespace, time.time() - self.ttl))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM translations WHERE namespace = ?",
+                                    (self.namespace,)).fetchone()
+        if count > self.max_rows:
+            self._db.execute(
+                """DELETE FROM translations WHERE namespace = ? AND question IN (
+                       SELECT question FROM translations WHERE namespace = ?
+                       ORDER BY last_used LIMIT ?)""",
+                (self.namespace, self.namespace, count - self.max_rows),
+            )
+
+    def invalidate(self, translator=None):
+        """Drop every entry, or only those produced by `translator`.
+
+        The memory tier is emptied either way; it refills from disk.
+        """
+        self.memory.clear()
+        if self._db is None:
+            return
+        with self._lock:
+            if translator is None:
+                self._db.execute("DELETE FROM translations WHERE namespace = ?", (self.namespace,))
+            else:
+                self._db.execute("DELETE FROM translations WHERE namespace = ? AND translator = ?",
+                                 (self.namespace, translator))
+            self._db.commit()
+
+    def stats(self):
+        stats = {"memory": self.memory.stats()}
+        if self._db is not None:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT translator, COUNT(*), SUM(hits) FROM translations WHERE namespace = ? GROUP BY translator",
+                    (self.namespace,),
+                ).fetchall()
+            stats["disk"] = {translator: {"entries": n, "hits": hits or 0} for translator, n, hits in rows}
+        return stats
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
+
+
+class CachingTranslator(Translator):
+    """Tries `translators` in order; answers are cached under the normalized question."""
+
+    name = "cached"
+
+    def __init__(self, translators, cache=None):
+        self.translators = list(translators)
+        self.cache = cache if cache is not None else TranslationCache(path=None)
+
+    def translate_with_source(self, nl_query):
+        """(edsql, translator name, cached?); edsql is None if no translator could answer.
+
+        The first reply that parses is cached and returned. If every reply
+        fails to parse, the first one is returned uncached, so the caller
+        reports the parse error.
+        """
+        question = normalize_nl(nl_query)
+        hit = self.cache.get(question)
+        if hit is not None:
+            return hit[0], hit[1], True
+        rejected = None
+        for translator in self.translators:
+            edsql = translator.translate(nl_query)
+            if not edsql:
+                continue
+            if is_valid_edsql(edsql):
+                self.cache.put(question, edsql, translator.name)
+                return edsql, translator.name, False
+            rejected = rejected or (edsql, translator.name, False)
+        return rejected or (None, None, False)
+
+    def translate(self, nl_query):
+        return self.translate_with_source(nl_query)[0]